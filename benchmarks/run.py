@@ -0,0 +1,230 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from src.components import ERC4626, Fund
+from src.engine import VectorEngine, run_vectorized
+from src.fixedpoint import FixedPointVault
+from src.simulation import PROTOCOLS, USDC, initialize_vaults, run_simulation
+from benchmarks.trees import build_tree, portals
+
+
+##################   OPERATIONS   ################
+##################################################
+
+# Each benchmark takes its config and returns (setup, operation, ops): setup
+# builds fresh state, operation runs on it, ops is how many operations it did.
+
+
+def bench_deposit(config):
+    def setup():
+        fund, vaults = build_tree(config["width"], config["depth"], config["seed"])
+        return fund
+
+    def operation(fund):
+        for i in range(config["repeat"]):
+            fund.deposit(1_000 + i)
+
+    return setup, operation, config["repeat"]
+
+
+def rebalance_bench(method, batched=False):
+    def bench(config):
+        def setup():
+            fund, vaults = build_tree(config["width"], config["depth"], config["seed"])
+            return fund
+
+        def operation(fund):
+            for i in range(config["repeat"]):
+                fund.deposit(10_000 + i)
+                for portal in portals(fund):
+                    if batched:
+                        with portal.batch(leg_cost=config["cost"]):
+                            getattr(portal, method)()
+                    else:
+                        getattr(portal, method)(config["cost"])
+
+        return setup, operation, config["repeat"]
+
+    return bench
+
+
+def main_funds(config, vault_cls=ERC4626):
+    rng = random.Random(config["seed"])
+    vaults = initialize_vaults(PROTOCOLS, rng, vault_cls=vault_cls)
+
+    funds = [Fund(f"Fund {i}", USDC, 0, 0, 10, 1) for i in range(4)]
+    for fund in funds:
+        for vault, ratio in zip(vaults, PROTOCOLS[0]["ratios"]):
+            fund.add_vault(vault, ratio)
+        fund.deposit(1000)
+        fund.simple_rebalance()
+
+    strategies = ["smart", "simple", "smart", "simple"]
+    costs = [config["cost"], config["cost"], 0, 0]
+    return funds, strategies, costs, rng
+
+
+def day_loop_bench(vault_cls):
+    # day_loop vs fixed_point_day_loop is the overhead of integer accounting
+    def bench(config):
+        def operation(state):
+            funds, strategies, costs, rng = state
+            run_simulation(funds, strategies, costs, config["days"], rng)
+
+        return lambda: main_funds(config, vault_cls), operation, config["days"]
+
+    return bench
+
+
+def bench_engine_day_loop(config):
+    def setup():
+        funds, strategies, costs, rng = main_funds(config)
+        return VectorEngine.from_funds(funds, strategies, costs), rng
+
+    def operation(state):
+        engine, rng = state
+        run_vectorized(engine, config["days"], rng)
+
+    return setup, operation, config["days"]
+
+
+BENCHMARKS = {
+    "portal_deposit": bench_deposit,
+    "simple_rebalance": rebalance_bench("simple_rebalance"),
+    "smart_rebalance": rebalance_bench("smart_rebalance"),
+    "optimal_rebalance": rebalance_bench("optimal_rebalance"),
+    "horizon_rebalance": rebalance_bench("horizon_rebalance"),
+    "batched_smart_rebalance": rebalance_bench("smart_rebalance", batched=True),
+    "day_loop": day_loop_bench(ERC4626),
+    "fixed_point_day_loop": day_loop_bench(FixedPointVault),
+    "engine_day_loop": bench_engine_day_loop,
+}
+
+DEFAULT_CONFIG = {
+    "width": 3,
+    "depth": 2,
+    "repeat": 1_000,
+    "days": 365 * 5,
+    "cost": 0.005811,
+    "seed": 42,
+}
+
+
+###################   RUNNER   ###################
+##################################################
+
+
+def measure(bench, config, rounds=3):
+    setup, operation, ops = bench(config)
+
+    seconds = float("inf")
+    for _ in range(rounds):
+        state = setup()
+        start = time.perf_counter()
+        operation(state)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    # separate pass, tracemalloc slows the timed rounds down
+    state = setup()
+    tracemalloc.start()
+    operation(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "ops": ops,
+        "seconds": seconds,
+        "ops_per_sec": ops / seconds if seconds > 0 else float("inf"),
+        "peak_bytes": peak,
+    }
+
+
+def run(config=None, names=None, rounds=3):
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    names = names or list(BENCHMARKS)
+    return {
+        "meta": {
+            "config": config,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": {name: measure(BENCHMARKS[name], config, rounds) for name in names},
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    regressions = {}
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["ops_per_sec"]
+        change = result["ops_per_sec"] / before - 1
+        if change < -threshold:
+            regressions[name] = change
+    return regressions
+
+
+def report(results, baseline=None):
+    lines = []
+    for name, result in results["results"].items():
+        line = (
+            f"{name:>24}: {result['ops_per_sec']:12,.1f} ops/sec  "
+            f"peak {result['peak_bytes'] / 1024:10,.1f} KiB"
+        )
+        if baseline and name in baseline["results"]:
+            before = baseline["results"][name]["ops_per_sec"]
+            line += f"  {(result['ops_per_sec'] / before - 1) * 100:+6.1f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark rebalance hot paths")
+    parser.add_argument("--width", type=int, default=DEFAULT_CONFIG["width"])
+    parser.add_argument("--depth", type=int, default=DEFAULT_CONFIG["depth"])
+    parser.add_argument("--repeat", type=int, default=DEFAULT_CONFIG["repeat"])
+    parser.add_argument("--days", type=int, default=DEFAULT_CONFIG["days"])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS))
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    config = {
+        "width": args.width,
+        "depth": args.depth,
+        "repeat": args.repeat,
+        "days": args.days,
+    }
+    results = run(config, args.only, args.rounds)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["config"] != results["meta"]["config"]:
+            print("warning: baseline was run with a different config")
+
+    print(report(results, baseline))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        regressions = compare(baseline, results, args.threshold)
+        for name, change in regressions.items():
+            print(f"REGRESSION {name}: {change * 100:+.1f}%")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import random
+
+from src.components import Fund, Portal
+from src.simulation import USDC, create_portals, initialize_vaults
+
+
+def even_ratios(count):
+    base, extra = divmod(100, count)
+    return [base + 1 if i < extra else base for i in range(count)]
+
+
+def build_tree(width, depth, seed=0, reserveRatio=10, maxDelta=1):
+    # depth 1: fund -> vaults, depth 2: fund -> portals -> vaults, and each
+    # extra level adds `width` portals that all hold the level below
+    if width < 1 or depth < 1:
+        raise ValueError("Width and depth must be at least 1")
+
+    rng = random.Random(seed)
+    protocols = [
+        {"name": f"Protocol {i}", "vaults": width, "ratios": even_ratios(width)}
+        for i in range(width if depth > 1 else 1)
+    ]
+    vaults = initialize_vaults(protocols, rng)
+
+    if depth == 1:
+        children = vaults
+    else:
+        children = list(create_portals(vaults, protocols).values())
+
+    for level in range(depth - 2):
+        parents = []
+        for i in range(width):
+            portal = Portal(f"Level {level} Portal {i}", USDC, 0, 0)
+            for child, ratio in zip(children, even_ratios(len(children))):
+                portal.add_vault(child, ratio)
+            parents.append(portal)
+        children = parents
+
+    fund = Fund("Benchmark Fund", USDC, 0, 0, reserveRatio, maxDelta)
+    for child, ratio in zip(children, even_ratios(len(children))):
+        fund.add_vault(child, ratio * (100 - reserveRatio) / 100)
+
+    return fund, vaults
+
+
+def portals(root):
+    found, seen = [], set()
+    stack = [root]
+    while stack:
+        portal = stack.pop()
+        if portal in seen:
+            continue
+        seen.add(portal)
+        found.append(portal)
+        stack.extend(v for v in portal.sub_vaults if isinstance(v, Portal))
+    return found
@@ -0,0 +1,71 @@
+import argparse
+import gc
+import tracemalloc
+
+from src.components import ERC4626
+from src.store import VaultStore
+
+USDC = "USDC"
+
+
+class DictVault:
+    # attribute layout of ERC4626 before it gained __slots__
+    def __init__(self, name, depositAsset, totalShares, totalAssets):
+        self.name = name
+        self.depositAsset = depositAsset
+        self.totalShares = totalShares
+        self.totalAssets = totalAssets
+
+
+def vault_args(count):
+    for i in range(count):
+        yield f"0x{i:040x}", USDC, float(i) + 0.5, float(i) + 0.25
+
+
+def build_objects(cls, count):
+    return [cls(*args) for args in vault_args(count)]
+
+
+def build_store(count):
+    store = VaultStore(count)
+    names, _, shares, assets = zip(*vault_args(count))
+    store.extend(names, USDC, shares, assets)
+    return store
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    result = build(count)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / count, peak / count
+
+
+def run(count):
+    layouts = {
+        "dict": lambda n: build_objects(DictVault, n),
+        "slots": lambda n: build_objects(ERC4626, n),
+        "store": build_store,
+    }
+    return {name: measure(build, count) for name, build in layouts.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory per vault by layout")
+    parser.add_argument("--vaults", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    results = run(args.vaults)
+    baseline = results["dict"][0]
+    print(f"{args.vaults:,} vaults")
+    for name, (current, peak) in results.items():
+        print(
+            f"{name:>6}: {current:8.1f} bytes/vault "
+            f"(peak {peak:8.1f}, {baseline / current:4.1f}x smaller than dict)"
+        )
+
+
+if __name__ == "__main__":
+    main()
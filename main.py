@@ -1,19 +1,19 @@
 from src.components import *
 from src.simulation import *
+from src.engine import VectorEngine, run_vectorized
+from src.metrics import Metrics
 import random
+import sys
 
-random.seed(42)
 USDC = "USDC"
+SEED = 42
 
-protocols = [
-    {"name": "Centrifuge", "vaults": 3, "ratios": [40, 30, 30]},
-    {"name": "Morpho", "vaults": 2, "ratios": [60, 40]},
-    {"name": "Yearn", "vaults": 2, "ratios": [50, 50]},
-]
+protocols = PROTOCOLS
 
 
-def main():
-    initialized_vaults = initialize_vaults(protocols)
+def main(vectorized=False, metrics=False):
+    rng = random.Random(SEED)
+    initialized_vaults = initialize_vaults(protocols, rng)
 
     fund1 = Fund("Smart Fund with Gas Cost", USDC, 0, 0, 10, 1)
     fund2 = Fund("Simple Fund with Gas Cost", USDC, 0, 0, 10, 1)
@@ -30,22 +30,22 @@ def main():
     days = 365 * 5
     transaction_cost = 0.005811
 
-    for day in range(days):
-        daily_deposit = random.randint(1_000, 100_000)
-
-        for fund in [fund1, fund2, fund3, fund4]:
-            fund.deposit(daily_deposit)
-
-        fund1.smart_rebalance(transaction_cost)
-        fund2.simple_rebalance(transaction_cost)
-        fund3.smart_rebalance()
-        fund4.simple_rebalance()
-
-        for vault in fund1.sub_vaults:
-            daily_interest = random.randint(1, 10) / 365 / 10
-            vault.earn_interest(daily_interest)
-
     funds = [fund1, fund2, fund3, fund4]
+    strategies = ["smart", "simple", "smart", "simple"]
+    costs = [transaction_cost, transaction_cost, 0, 0]
+
+    # the engine pays off for large populations of funds; for four funds the
+    # object loop is faster
+    if vectorized:
+        engine = VectorEngine.from_funds(funds, strategies, costs)
+        kpis = Metrics.from_engine(engine).observe_engine(engine)
+        on_step = (lambda day: kpis.observe_engine(engine)) if metrics else None
+        run_vectorized(engine, days, rng, on_step)
+        engine.sync()
+    else:
+        kpis = Metrics.from_funds(funds).observe_funds(funds)
+        on_step = (lambda day: kpis.observe_funds(funds)) if metrics else None
+        run_simulation(funds, strategies, costs, days, rng, on_step)
 
     fund_names = [
         "Smart Fund with Gas Cost",
@@ -74,8 +74,12 @@ def main():
             f"Delta %: {(fund.totalAssets - fund1.totalAssets) / fund.totalAssets * 100:.18f}"
         )
 
+    if metrics:
+        print("\nStrategy KPIs:")
+        print(kpis.report())
+
     print("\n")
 
 
 if __name__ == "__main__":
-    main()
+    main(vectorized="--vectorized" in sys.argv, metrics="--metrics" in sys.argv)
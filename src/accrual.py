@@ -0,0 +1,43 @@
+import numpy as np
+
+from src.components import Portal, growth_factor
+
+
+def tree(root):
+    # portals in post-order (children before parents) and the leaf vaults
+    portals, leaves, seen = [], [], set()
+
+    def visit(node):
+        if node in seen:
+            return
+        seen.add(node)
+        if isinstance(node, Portal):
+            for child in node.sub_vaults:
+                visit(child)
+            portals.append(node)
+        else:
+            leaves.append(node)
+
+    visit(root)
+    return portals, leaves
+
+
+def accrue_tree(root, periods, rates, revalue=True):
+    # Advance every leaf vault under root by `periods` periods in one pass.
+    # rates is a constant percent, a schedule of shape (periods,), or a
+    # schedule per vault of shape (periods, vaults) in leaf order.
+    portals, leaves = tree(root)
+
+    rates = np.asarray(rates, dtype=float)
+    if rates.ndim == 2 and rates.shape[1] != len(leaves):
+        raise ValueError("Rate schedule does not match the number of vaults")
+    growth = np.broadcast_to(growth_factor(periods, rates), len(leaves))
+
+    for vault, factor in zip(leaves, growth.tolist()):
+        vault.totalAssets *= factor
+
+    if revalue:
+        for portal in portals:
+            portal.update_total_assets()
+
+    return leaves
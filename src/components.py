@@ -1,17 +1,71 @@
+import math
 import random
 
+import numpy as np
+
+from src.costs import leg_cost
+from src.horizon import HorizonPlanner
+from src.optimizer import optimal_plan
+
 
 ##################   ERC4626   ###################
 ##################################################
 
 
 class ERC4626:
+    __slots__ = (
+        "name",
+        "depositAsset",
+        "_totalShares",
+        "_totalAssets",
+        "_version",
+        "_holders",
+    )
+
     def __init__(self, name, depositAsset, totalShares, totalAssets):
+        self._version = 0
+        self._holders = None  # created by the first holder, keeps vaults small
         self.name = name
         self.depositAsset = depositAsset
         self.totalShares = totalShares
         self.totalAssets = totalAssets
 
+    # any change to the totals changes the value of every position held in this
+    # vault: the version counts changes, and the portals whose cached value is
+    # current (holders, a dict as ordered set) are told once, then dropped until
+    # they revalue the position
+    @property
+    def totalAssets(self):
+        return self._totalAssets
+
+    @totalAssets.setter
+    def totalAssets(self, value):
+        self._totalAssets = value
+        self._version += 1
+        if self._holders:
+            self._notify()
+
+    @property
+    def totalShares(self):
+        return self._totalShares
+
+    @totalShares.setter
+    def totalShares(self, value):
+        self._totalShares = value
+        self._version += 1
+        if self._holders:
+            self._notify()
+
+    def _hold(self, portal):
+        if self._holders is None:
+            self._holders = {}
+        self._holders[portal] = None
+
+    def _notify(self):
+        for portal in self._holders:
+            portal._dirty[self] = None
+        self._holders.clear()
+
     def deposit(self, assets):
         shares = self.convert_to_shares(assets)
         self.totalAssets += assets
@@ -49,17 +103,17 @@ class ERC4626:
         assets = s * b / t if t > 0 else s
         return assets
 
-    def seed(self):
-        starting_balance = random.uniform(1_000, 1_000_000)
+    def seed(self, rng=random):
+        starting_balance = rng.uniform(1_000, 1_000_000)
         self.totalAssets = starting_balance
         self.totalShares = starting_balance
-        operations = random.randint(1, 10)
+        operations = rng.randint(1, 10)
 
         for i in range(operations):
             if i % 2 == 0:
-                self.deposit(random.randint(1, 10))
+                self.deposit(rng.randint(1, 10))
             else:
-                self.earn_interest(random.uniform(0, 1))
+                self.earn_interest(rng.uniform(0, 1))
 
         return self.totalAssets
 
@@ -67,6 +121,22 @@ class ERC4626:
         amount = self.totalAssets * percent / 100
         self.totalAssets += amount
 
+    def accrue(self, periods, percent):
+        # closed form of `periods` earn_interest calls; percent may also be a
+        # schedule with one rate per period
+        self.totalAssets *= growth_factor(periods, percent)
+        return self.totalAssets
+
+
+def growth_factor(periods, percent):
+    if np.ndim(percent) == 0:
+        return (1 + percent / 100) ** periods
+
+    percent = np.asarray(percent, dtype=float)
+    if len(percent) != periods:
+        raise ValueError("Rate schedule length does not match periods")
+    return np.prod(1 + percent / 100, axis=0)
+
 
 ###################   PORTAL   ###################
 ##################################################
@@ -82,23 +152,69 @@ class Portal(ERC4626):
         self.reserveRatio = reserveRatio
         self.maxDelta = maxDelta
 
+        # valuation cache: last value of each position, their running sum and
+        # the positions whose shares, prices or vault totals changed since the
+        # last update (dict as ordered set, see ERC4626._notify)
+        self._values = {}
+        self._invested = 0
+        self._dirty = {}
+        self._batch = None
+        self.oracle = None  # set by PriceOracle.attach for multi-asset funds
+        self.planner = None  # HorizonPlanner of horizon_rebalance
+        self.cost_paid = 0  # transaction and swap costs charged so far
+
     def add_vault(self, vault, ratio):
         if vault not in self.sub_vaults:
             self.sub_vaults[vault] = {"shares": 0, "ratio": ratio}
+            self._values[vault] = 0
+            vault._hold(self)
 
     def invest(self, vault, assets, cost=0):
+        # cost is a flat amount or a cost model, see src/costs.py
         if vault in self.sub_vaults:
-            shares = vault.deposit(assets - cost)
+            cost = leg_cost(cost, vault, assets)
+            if self._batch is not None:
+                self._batch.add(vault, assets, cost)
+                return None
+
+            shares = self._buy(vault, assets - cost)
             self.sub_vaults[vault]["shares"] += shares
+            self._dirty[vault] = None
             self.cash -= assets
+            self.cost_paid += cost
             self.update_total_assets()
             return shares
         else:
             raise ValueError("Vault not found in investments")
 
+    def _buy(self, vault, assets):
+        # assets are in this portal's asset; other assets go through a swap
+        asset = vault.depositAsset
+        if self.oracle is not None and asset != self.depositAsset:
+            assets = self.oracle.swap_in(vault, assets, self)
+        return vault.deposit(assets)
+
+    def _sell(self, vault, shares, cost=0):
+        if isinstance(vault, Portal):
+            assets = vault.withdraw(shares, cost)
+        else:
+            assets = vault.withdraw(shares)
+        asset = vault.depositAsset
+        if self.oracle is not None and asset != self.depositAsset:
+            assets = self.oracle.swap_out(vault, assets, self)
+        return assets
+
+    def batch(self, fixed_cost=0, leg_cost=0):
+        if self._batch is not None:
+            raise ValueError("Batch already open")
+        self._batch = Batch(self, fixed_cost, leg_cost)
+        return self._batch
+
     def value_position(self, vault):
         if vault in self.sub_vaults:
             assets = vault.convert_to_assets(self.sub_vaults[vault]["shares"])
+            if self.oracle is not None and vault.depositAsset != self.depositAsset:
+                assets *= self.oracle.rate(vault.depositAsset, self.depositAsset)
             return assets
 
     def value_portal_investments(self):
@@ -107,10 +223,47 @@ class Portal(ERC4626):
             total_investments += self.value_position(vault)
         return total_investments
 
+    def _stale(self, vault):
+        return vault in self._dirty
+
     def update_total_assets(self):
-        self.totalAssets = self.value_portal_investments() + self.cash
+        # only the stale positions are revalued
+        for vault in self._dirty:
+            value = self.value_position(vault)
+            self._invested += value - self._values[vault]
+            self._values[vault] = value
+            vault._hold(self)
+        self._dirty.clear()
+
+        self.totalAssets = self._invested + self.cash
         return self.totalAssets
 
+    def invalidate_valuations(self):
+        # call after editing sub_vaults shares directly
+        self._values = dict.fromkeys(self.sub_vaults, 0)
+        self._invested = 0
+        self._dirty = dict.fromkeys(self.sub_vaults)
+
+    def verify_valuations(self, rel_tol=1e-9, abs_tol=1e-6):
+        # after an update every cached value, and the totals, must agree with a
+        # full recompute
+        self.update_total_assets()
+        for vault in self.sub_vaults:
+            if not math.isclose(
+                self._values[vault],
+                self.value_position(vault),
+                rel_tol=rel_tol,
+                abs_tol=abs_tol,
+            ):
+                return False
+
+        return math.isclose(
+            self.totalAssets,
+            self.value_portal_investments() + self.cash,
+            rel_tol=rel_tol,
+            abs_tol=abs_tol,
+        )
+
     def simple_rebalance(self, cost=0):
         required_reserve = self.totalAssets * self.reserveRatio / 100
         available_cash = max(0, self.cash - required_reserve)
@@ -150,6 +303,20 @@ class Portal(ERC4626):
                     self.invest(vault, available_cash, cost)
                     break
 
+    def optimal_rebalance(self, cost=0, horizon=30, yields=None, time_budget=0.05):
+        plan = optimal_plan(self, cost, horizon, yields, time_budget)
+        return plan.execute(self)
+
+    def horizon_rebalance(self, cost=0, day=None):
+        # invests all available cash on the days the rolling-horizon plan
+        # picks; set self.planner first to change its forecasts or horizon.
+        # day defaults to the day after the last call, for daily loops
+        if self.planner is None:
+            self.planner = HorizonPlanner()
+        day = self.planner.day if day is None else day
+        if self.planner.decide(self, cost, day):
+            self.simple_rebalance(cost)
+
     #### OVERRIDES ####
 
     def deposit(self, assets):
@@ -158,9 +325,127 @@ class Portal(ERC4626):
         self.update_total_assets()
         return shares
 
-    # implement withdrawals later when you want to test that logic
-    def withdraw(self):
-        pass
+    def withdraw(self, shares, cost=0):
+        # pays from cash first, then liquidates positions; cost (flat or a
+        # cost model) is charged per liquidation leg and borne by the
+        # redeemer, so remaining holders keep their price per share
+        if shares > self.totalShares:
+            raise ValueError("Insufficient shares")
+
+        self.update_total_assets()
+        assets = self.convert_to_assets(shares)
+        from_cash = min(self.cash, assets)
+        self.cash -= from_cash
+        paid = from_cash + self._liquidate(assets - from_cash, cost)
+
+        self.totalShares -= shares
+        self.update_total_assets()
+        return paid
+
+    def process_withdrawals(self, queue, cost=0):
+        # a whole redemption queue in one pass: the shares are redeemed
+        # together and the proceeds split pro rata, so the liquidation legs
+        # and their costs are shared instead of paid per request
+        queue = np.asarray(queue, dtype=float)
+        total = queue.sum()
+        if total <= 0:
+            return np.zeros(len(queue))
+        paid = self.withdraw(total, cost)
+        return queue * (paid / total)
+
+    def _liquidate(self, amount, cost=0):
+        # largest positions first, so a flat cost per leg is paid as few
+        # times as possible; nested portals liquidate their own positions
+        paid = 0
+        positions = sorted(self._values.items(), key=lambda x: x[1], reverse=True)
+        for vault, value in positions:
+            if amount <= 0:
+                break
+            if value <= 0:
+                continue
+
+            data = self.sub_vaults[vault]
+            taken = min(amount, value)
+            shares = (
+                data["shares"] if taken >= value else data["shares"] * taken / value
+            )
+            received = self._sell(vault, shares, cost)
+            # a leg never pays out less than nothing
+            fee = min(leg_cost(cost, vault, received), received)
+
+            data["shares"] -= shares
+            self._dirty[vault] = None
+            paid += received - fee
+            self.cost_paid += fee
+            amount -= taken
+
+        return paid
+
+
+####################   BATCH   ###################
+##################################################
+
+
+class Batch:
+    # Collects the invest calls made while open and executes them on commit
+    # as one transaction: a fixed cost for the batch, spread over the legs by
+    # amount (evenly when they are all empty), plus leg_cost per vault and any
+    # cost passed to invest. A cost larger than its leg is paid from cash.
+    # Invests into the same vault are merged into one leg, and the portal
+    # revalues once.
+    def __init__(self, portal, fixed_cost=0, leg_cost=0):
+        self.portal = portal
+        self.fixed_cost = fixed_cost
+        self.leg_cost = leg_cost
+        self.legs = {}
+
+    def add(self, vault, assets, cost=0):
+        leg = self.legs.setdefault(vault, [0, 0])
+        leg[0] += assets
+        leg[1] += cost
+
+    @property
+    def transaction_cost(self):
+        if not self.legs:
+            return 0
+        extra = sum(cost for assets, cost in self.legs.values())
+        return self.fixed_cost + self.leg_cost * len(self.legs) + extra
+
+    def commit(self):
+        portal = self.portal
+        portal._batch = None
+
+        total = sum(assets for assets, cost in self.legs.values())
+        shares = {}
+        for vault, (assets, extra) in self.legs.items():
+            if total:
+                fixed_share = self.fixed_cost * assets / total
+            else:
+                fixed_share = self.fixed_cost / len(self.legs)
+            cost = fixed_share + self.leg_cost + extra
+            invested = max(assets - cost, 0)
+
+            shares[vault] = portal._buy(vault, invested)
+            portal.sub_vaults[vault]["shares"] += shares[vault]
+            portal._dirty[vault] = None
+            portal.cash -= invested + cost
+            portal.cost_paid += cost
+
+        portal.update_total_assets()
+        return shares
+
+    def cancel(self):
+        self.portal._batch = None
+        return self.legs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.cancel()
 
 
 ####################   FUND   ####################
@@ -0,0 +1,136 @@
+import bisect
+import functools
+import math
+
+import numpy as np
+
+
+# A cost is either a flat amount per leg or a model called as
+# model(vault, assets) returning the cost of moving `assets` through `vault`.
+# Models also provide curve(vault, sizes), the same cost for an array of sizes.
+
+
+def leg_cost(cost, vault, assets):
+    if callable(cost):
+        return cost(vault, assets)
+    return cost
+
+
+def _lookup(values, vault, default):
+    # per-vault parameters may be given as one value or a dict keyed by name
+    if isinstance(values, dict):
+        return values.get(vault.name, default)
+    return values
+
+
+##################   COST MODELS   ###############
+##################################################
+
+
+class FlatCost:
+    def __init__(self, amount):
+        self.amount = amount
+
+    def __call__(self, vault, assets):
+        return self.amount
+
+    def curve(self, vault, sizes):
+        return np.full(np.shape(sizes), float(self.amount))
+
+
+class AMMCost:
+    # Constant product pool with `liquidity` of the deposit asset on each side:
+    # swapping a into the pool returns L * a / (L + a), so price impact costs
+    # a^2 / (L + a), plus the pool fee on the amount and a fixed gas cost.
+    def __init__(self, liquidity, fee=0.003, gas=0, default_liquidity=math.inf):
+        self.liquidity = liquidity
+        self.fee = fee
+        self.gas = gas
+        self.default_liquidity = default_liquidity
+
+    def __call__(self, vault, assets):
+        if assets <= 0:
+            return 0
+        liquidity = _lookup(self.liquidity, vault, self.default_liquidity)
+        impact = assets * assets / (liquidity + assets)
+        return impact + self.fee * assets + self.gas
+
+    def curve(self, vault, sizes):
+        sizes = np.asarray(sizes, dtype=float)
+        liquidity = _lookup(self.liquidity, vault, self.default_liquidity)
+        cost = sizes * sizes / (liquidity + sizes) + self.fee * sizes + self.gas
+        return np.where(sizes > 0, cost, 0.0)
+
+
+class OrderBookCost:
+    # levels are (depth, slippage) pairs from the best price outwards: the
+    # first `depth` of size fills at `slippage` (fraction of the amount), the
+    # next level's depth at its slippage and so on. Orders larger than the
+    # book fill the rest at the last level.
+    def __init__(self, levels, gas=0):
+        if not levels:
+            raise ValueError("Order book needs at least one level")
+        depths = np.array([depth for depth, slippage in levels], dtype=float)
+        self.slippage = np.array([slippage for depth, slippage in levels], dtype=float)
+        self.gas = gas
+
+        self.bounds = np.cumsum(depths)
+        # cost of filling every level below each bound
+        self.filled = np.concatenate([[0.0], np.cumsum(depths * self.slippage)])
+        self._bounds = self.bounds.tolist()
+        self._filled = self.filled.tolist()
+        self._slippage = self.slippage.tolist()
+
+    def __call__(self, vault, assets):
+        if assets <= 0:
+            return 0
+        k = min(bisect.bisect_left(self._bounds, assets), len(self._bounds) - 1)
+        start = self._bounds[k - 1] if k else 0
+        return self._filled[k] + (assets - start) * self._slippage[k] + self.gas
+
+    def curve(self, vault, sizes):
+        sizes = np.asarray(sizes, dtype=float)
+        k = np.minimum(np.searchsorted(self.bounds, sizes), len(self.bounds) - 1)
+        start = np.where(k > 0, self.bounds[k - 1], 0)
+        cost = self.filled[k] + (sizes - start) * self.slippage[k] + self.gas
+        return np.where(sizes > 0, cost, 0.0)
+
+
+###################   CACHE   ####################
+##################################################
+
+
+class CachedCost:
+    # Rounds amounts up to a multiple of `step` and memoises the model, so
+    # optimizers calling it for many candidate legs only evaluate each size
+    # once. precompute fills a per-vault table for sizes up to a limit with
+    # one vectorised curve call; sizes past the table go through an LRU cache.
+    def __init__(self, model, step=1.0, maxsize=4096):
+        self.model = model
+        self.step = step
+        self._tables = {}
+        self._cached = functools.lru_cache(maxsize)(self._evaluate)
+
+    def _evaluate(self, vault, k):
+        return self.model(vault, k * self.step)
+
+    def precompute(self, vault, upto):
+        sizes = np.arange(math.ceil(upto / self.step) + 1) * self.step
+        self._tables[vault] = self.model.curve(vault, sizes).tolist()
+
+    def __call__(self, vault, assets):
+        if assets <= 0:
+            return 0
+        k = math.ceil(assets / self.step)
+        table = self._tables.get(vault)
+        if table is not None and k < len(table):
+            return table[k]
+        return self._cached(vault, k)
+
+    def curve(self, vault, sizes):
+        return np.array([self(vault, size) for size in np.ravel(sizes)]).reshape(
+            np.shape(sizes)
+        )
+
+    def cache_info(self):
+        return self._cached.cache_info()
@@ -0,0 +1,352 @@
+import random
+
+import numpy as np
+
+from src.components import Portal, growth_factor
+from src.fixedpoint import FixedPointVault
+from src.simulation import daily_draws
+
+SIMPLE = 0
+SMART = 1
+STRATEGIES = {"simple": SIMPLE, "smart": SMART}
+
+
+################   VECTOR ENGINE   ################
+##################################################
+
+# State of N funds investing in M vaults, held as arrays so a whole population
+# of funds advances one day per call. Vault totals are stored per universe
+# (U x M); funds that share vault objects (as in main.py) share universe 0.
+# The Portal / Fund classes remain the reference implementation.
+
+
+class VectorEngine:
+    def __init__(
+        self,
+        vault_assets,
+        vault_shares,
+        ratios,
+        reserveRatio,
+        maxDelta,
+        strategies,
+        costs,
+        universe=None,
+        order=None,
+    ):
+        self.vault_assets = np.array(vault_assets, dtype=float, ndmin=2)
+        self.vault_shares = np.array(vault_shares, dtype=float, ndmin=2)
+        self.ratios = np.array(ratios, dtype=float, ndmin=2)
+
+        n, m = self.ratios.shape
+        if self.vault_assets.shape[1] != m or self.vault_shares.shape[1] != m:
+            raise ValueError("Vault and ratio dimensions do not match")
+
+        self.universe = (
+            np.zeros(n, dtype=np.intp)
+            if universe is None
+            else np.asarray(universe, dtype=np.intp)
+        )
+        # per-fund iteration order over vault columns (sub_vaults insertion order)
+        self.order = (
+            np.tile(np.arange(m), (n, 1))
+            if order is None
+            else np.asarray(order, dtype=np.intp)
+        )
+
+        self.reserveRatio = np.broadcast_to(np.asarray(reserveRatio, float), n).copy()
+        self.maxDelta = np.broadcast_to(np.asarray(maxDelta, float), n).copy()
+        self.costs = np.broadcast_to(np.asarray(costs, float), n).copy()
+        self.strategies = np.array(
+            [STRATEGIES[s] if isinstance(s, str) else s for s in strategies],
+            dtype=np.int8,
+        )
+        if self.strategies.shape != (n,):
+            raise ValueError("One strategy per fund is required")
+
+        self.shares = np.zeros((n, m))
+        self.cash = np.zeros(n)
+        self.totalAssets = np.zeros(n)
+        self.totalShares = np.zeros(n)
+        self.cost_paid = np.zeros(n)
+
+        self.funds = None
+        self.vaults = None
+
+    @property
+    def num_funds(self):
+        return self.ratios.shape[0]
+
+    @property
+    def num_vaults(self):
+        return self.ratios.shape[1]
+
+    @classmethod
+    def from_funds(cls, funds, strategies, costs):
+        # the engine works in float totals of one asset, without price oracles
+        vaults = []
+        for fund in funds:
+            if fund.oracle is not None:
+                raise ValueError("Multi-asset funds are not supported by the engine")
+            for vault in fund.sub_vaults:
+                if isinstance(vault, Portal):
+                    raise ValueError("Nested portals are not supported by the engine")
+                if isinstance(vault, FixedPointVault):
+                    raise ValueError(
+                        "Fixed point vaults are not supported by the engine"
+                    )
+                if vault not in vaults:
+                    vaults.append(vault)
+
+        column = {vault: j for j, vault in enumerate(vaults)}
+        n, m = len(funds), len(vaults)
+        ratios = np.zeros((n, m))
+        order = np.zeros((n, m), dtype=np.intp)
+
+        for i, fund in enumerate(funds):
+            held = [column[vault] for vault in fund.sub_vaults]
+            order[i] = held + [j for j in range(m) if j not in held]
+            for vault, data in fund.sub_vaults.items():
+                ratios[i, column[vault]] = data["ratio"]
+
+        engine = cls(
+            [[vault.totalAssets for vault in vaults]],
+            [[vault.totalShares for vault in vaults]],
+            ratios,
+            [fund.reserveRatio for fund in funds],
+            [fund.maxDelta for fund in funds],
+            strategies,
+            costs,
+            order=order,
+        )
+
+        for i, fund in enumerate(funds):
+            for vault, data in fund.sub_vaults.items():
+                engine.shares[i, column[vault]] = data["shares"]
+            engine.cash[i] = fund.cash
+            engine.totalAssets[i] = fund.totalAssets
+            engine.totalShares[i] = fund.totalShares
+            engine.cost_paid[i] = fund.cost_paid
+
+        engine.funds = list(funds)
+        engine.vaults = vaults
+        return engine
+
+    def sync(self):
+        if self.funds is None:
+            raise ValueError("Engine was not built from fund objects")
+
+        for j, vault in enumerate(self.vaults):
+            vault.totalAssets = float(self.vault_assets[0, j])
+            vault.totalShares = float(self.vault_shares[0, j])
+
+        for i, fund in enumerate(self.funds):
+            for j, vault in enumerate(self.vaults):
+                if vault in fund.sub_vaults:
+                    fund.sub_vaults[vault]["shares"] = float(self.shares[i, j])
+            fund.invalidate_valuations()
+            fund.cash = float(self.cash[i])
+            fund.totalAssets = float(self.totalAssets[i])
+            fund.totalShares = float(self.totalShares[i])
+            fund.cost_paid = float(self.cost_paid[i])
+
+        return self.funds
+
+    #### VAULT MATH ####
+
+    def share_prices(self):
+        assets = self.vault_assets[self.universe]
+        shares = self.vault_shares[self.universe]
+        safe = np.where(shares > 0, shares, 1)
+        return np.where(shares > 0, assets / safe, 1.0)
+
+    def positions(self):
+        return self.shares * self.share_prices()
+
+    def revalue(self):
+        self.totalAssets = self.positions().sum(axis=1) + self.cash
+        return self.totalAssets
+
+    def _invest(self, mask, cols, amounts):
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return
+
+        cols = cols[rows]
+        amounts = amounts[rows]
+        net = amounts - self.costs[rows]
+        universe = self.universe[rows]
+
+        b = self.vault_assets[universe, cols]
+        t = self.vault_shares[universe, cols]
+        safe = np.where(b > 0, b, 1)
+        new_shares = np.where(b > 0, net * t / safe, net)
+        price = np.where(t > 0, b / np.where(t > 0, t, 1), 1.0)
+
+        np.add.at(self.vault_assets, (universe, cols), net)
+        np.add.at(self.vault_shares, (universe, cols), new_shares)
+
+        self.shares[rows, cols] += new_shares
+        self.cash[rows] -= amounts
+        self.cost_paid[rows] += self.costs[rows]
+        self.totalAssets[rows] += new_shares * price - amounts
+
+    #### FUND OPERATIONS ####
+
+    def deposit(self, assets):
+        assets = np.broadcast_to(np.asarray(assets, dtype=float), self.num_funds)
+        a = assets
+        b = self.totalAssets
+        t = self.totalShares
+
+        shares = np.where(b > 0, a * t / np.where(b > 0, b, 1), a)
+        self.cash += assets
+        self.totalShares += shares
+        self.revalue()
+        return shares
+
+    def withdraw(self, shares, cost=0):
+        # pays redemptions from cash first, then liquidates the largest
+        # positions first with cost per leg borne by the redeemer, like
+        # Portal.withdraw; cost is a flat amount, one for all funds or one
+        # per fund, as the engine takes no cost models
+        if callable(cost):
+            raise ValueError("Cost models are not supported by the engine")
+        cost = np.asarray(cost, dtype=float)
+        shares = np.broadcast_to(np.asarray(shares, dtype=float), self.num_funds)
+        if np.any(shares > self.totalShares + 1e-9):
+            raise ValueError("Insufficient shares")
+
+        b = self.totalAssets
+        t = self.totalShares
+        assets = np.where(t > 0, shares * b / np.where(t > 0, t, 1), shares)
+
+        from_cash = np.minimum(assets, self.cash)
+        self.cash -= from_cash
+        shortfall = assets - from_cash
+        paid = from_cash
+
+        rows = np.arange(self.num_funds)
+        prices = self.share_prices()
+        largest = np.argsort(-(self.shares * prices), axis=1, kind="stable")
+        for k in range(self.num_vaults):
+            if not np.any(shortfall > 0):
+                break
+            cols = largest[:, k]
+            price = prices[rows, cols]
+            held = self.shares[rows, cols]
+            taken = np.minimum(shortfall, held * price)
+            redeemed = np.where(price > 0, taken / np.where(price > 0, price, 1), 0)
+
+            universe = self.universe
+            np.add.at(self.vault_assets, (universe, cols), -taken)
+            np.add.at(self.vault_shares, (universe, cols), -redeemed)
+            self.shares[rows, cols] -= redeemed
+            shortfall = shortfall - taken
+            paid = paid + np.maximum(taken - cost, 0)
+            self.cost_paid += np.minimum(taken, cost)
+
+        self.totalShares -= shares
+        self.revalue()
+        return paid
+
+    def _available_cash(self, mask):
+        required_reserve = self.totalAssets * self.reserveRatio / 100
+        available_cash = np.maximum(0, self.cash - required_reserve)
+        return np.where(mask, available_cash, 0)
+
+    def simple_rebalance(self, mask=None):
+        mask = np.ones(self.num_funds, bool) if mask is None else mask
+        available_cash = self._available_cash(mask)
+        active = available_cash > 0
+        if not active.any():
+            return
+
+        rows = np.arange(self.num_funds)
+        prices = self.share_prices()
+
+        for k in range(self.num_vaults):
+            cols = self.order[:, k]
+            target = self.totalAssets * self.ratios[rows, cols] / 100
+            current = self.shares[rows, cols] * prices[rows, cols]
+            needed = np.maximum(0, target - current)
+
+            amounts = np.minimum(needed, available_cash)
+            invest = active & (amounts > 0)
+            self._invest(invest, cols, amounts)
+            available_cash = available_cash - np.where(invest, amounts, 0)
+
+    def smart_rebalance(self, mask=None):
+        mask = np.ones(self.num_funds, bool) if mask is None else mask
+        available_cash = self._available_cash(mask)
+        active = available_cash > 0
+        if not active.any():
+            return
+
+        rows = np.arange(self.num_funds)
+        total = self.totalAssets[:, None]
+        delta = total * self.ratios / 100 - self.positions()
+        candidate = (
+            (delta > 0)
+            & (delta > total * self.maxDelta[:, None] / 100)
+            & active[:, None]
+        )
+        amounts = np.where(candidate, np.minimum(delta, available_cash[:, None]), 0)
+
+        # stable descending sort in sub_vaults order, non-candidates last
+        ordered = np.take_along_axis(amounts, self.order, axis=1)
+        is_candidate = np.take_along_axis(candidate, self.order, axis=1)
+        key = np.where(is_candidate, -ordered, np.inf)
+        ranking = np.take_along_axis(
+            self.order, np.argsort(key, axis=1, kind="stable"), axis=1
+        )
+
+        done = ~active
+        for k in range(self.num_vaults):
+            cols = ranking[:, k]
+            live = ~done & candidate[rows, cols]
+            amount = amounts[rows, cols]
+
+            full = live & (available_cash >= amount)
+            partial = live & ~full
+            invested = np.where(full, amount, available_cash)
+            self._invest(live, cols, invested)
+
+            available_cash = available_cash - np.where(live, invested, 0)
+            done |= partial | ~live
+
+    def rebalance(self):
+        self.simple_rebalance(self.strategies == SIMPLE)
+        self.smart_rebalance(self.strategies == SMART)
+
+    def earn_interest(self, percent):
+        percent = np.asarray(percent, dtype=float)
+        self.vault_assets += self.vault_assets * percent / 100
+
+    def accrue(self, periods, percent):
+        # percent is a constant, a schedule (periods,) or (periods, ...) that
+        # broadcasts against the (universes, vaults) totals
+        self.vault_assets *= growth_factor(periods, percent)
+
+    def step(self, deposits, interest):
+        self.deposit(deposits)
+        self.rebalance()
+        self.earn_interest(interest)
+
+
+def run_vectorized(engine, days, rng=random, on_step=None):
+    # like run_simulation, interest is drawn for the first fund's vaults only;
+    # from_funds puts them in the leading columns
+    if engine.funds is None:
+        count = engine.num_vaults
+    else:
+        count = len(engine.funds[0].sub_vaults)
+    interest = np.zeros(engine.num_vaults)
+
+    for day in range(days):
+        daily_deposit, interest[:count] = daily_draws(rng, count)
+        engine.step(daily_deposit, interest)
+
+        if on_step is not None:
+            on_step(day)
+
+    return engine
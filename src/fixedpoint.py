@@ -0,0 +1,125 @@
+import math
+
+from src.components import ERC4626, growth_factor
+
+
+##################   FIXED POINT   ###############
+##################################################
+
+# Opt-in vault that keeps its totals as integer base units (wei-style, 10**-6
+# of a token for USDC) and rounds like an on-chain ERC4626: always in the
+# vault's favour. Amounts still go in and come out as tokens, so Portals and
+# Funds work unchanged, but every conversion is done on Python ints. Token
+# amounts are exact while the base units fit in a float (2**53, about 9e9 USDC
+# at 6 decimals). Python ints are used rather than int64 arrays because
+# assets * shares overflows int64 for realistic totals.
+
+
+def mul_div(x, y, denominator, round_up=False):
+    if round_up:
+        return -(-x * y // denominator)
+    return x * y // denominator
+
+
+class FixedPointVault(ERC4626):
+    __slots__ = ("decimals", "scale")
+
+    def __init__(self, name, depositAsset, totalShares, totalAssets, decimals=6):
+        self.decimals = decimals
+        self.scale = 10**decimals
+        super().__init__(name, depositAsset, totalShares, totalAssets)
+
+    def to_units(self, amount):
+        if isinstance(amount, int):
+            return amount * self.scale
+        return int(round(amount * self.scale))
+
+    def from_units(self, units):
+        return units / self.scale
+
+    # totals are stored in base units and read back as tokens
+    @property
+    def totalAssets(self):
+        return self._totalAssets / self.scale
+
+    @totalAssets.setter
+    def totalAssets(self, value):
+        self._totalAssets = self.to_units(value)
+        self._version += 1
+        if self._holders:
+            self._notify()
+
+    @property
+    def totalShares(self):
+        return self._totalShares / self.scale
+
+    @totalShares.setter
+    def totalShares(self, value):
+        self._totalShares = self.to_units(value)
+        self._version += 1
+        if self._holders:
+            self._notify()
+
+    def _set_units(self, assets, shares):
+        self._totalAssets = assets
+        self._totalShares = shares
+        self._version += 1
+        if self._holders:
+            self._notify()
+
+    #### UNIT MATH ####
+
+    def preview_deposit(self, assets):
+        # shares minted for `assets` units, rounded down
+        b, t = self._totalAssets, self._totalShares
+        if b == 0 and t == 0:
+            return assets
+        return mul_div(assets, t, b) if b > 0 else assets
+
+    def preview_mint(self, shares):
+        # assets needed to mint `shares` units, rounded up
+        b, t = self._totalAssets, self._totalShares
+        return mul_div(shares, b, t, round_up=True) if t > 0 else shares
+
+    def preview_withdraw(self, assets):
+        # shares burnt to withdraw `assets` units, rounded up
+        b, t = self._totalAssets, self._totalShares
+        return mul_div(assets, t, b, round_up=True) if b > 0 else assets
+
+    def preview_redeem(self, shares):
+        # assets paid for redeeming `shares` units, rounded down
+        b, t = self._totalAssets, self._totalShares
+        return mul_div(shares, b, t) if t > 0 else shares
+
+    #### OVERRIDES ####
+
+    def deposit(self, assets):
+        units = self.to_units(assets)
+        shares = self.preview_deposit(units)
+        self._set_units(self._totalAssets + units, self._totalShares + shares)
+        return self.from_units(shares)
+
+    def withdraw(self, shares):
+        units = self.to_units(shares)
+        if units > self._totalShares:
+            raise ValueError("Insufficient shares")
+
+        assets = self.preview_redeem(units)
+        self._set_units(self._totalAssets - assets, self._totalShares - units)
+        return self.from_units(assets)
+
+    def convert_to_shares(self, assets):
+        return self.from_units(self.preview_deposit(self.to_units(assets)))
+
+    def convert_to_assets(self, shares):
+        return self.from_units(self.preview_redeem(self.to_units(shares)))
+
+    def earn_interest(self, percent):
+        # interest is credited in whole units, rounded down
+        interest = math.floor(self._totalAssets * percent / 100)
+        self._set_units(self._totalAssets + interest, self._totalShares)
+
+    def accrue(self, periods, percent):
+        growth = growth_factor(periods, percent)
+        self._set_units(math.floor(self._totalAssets * growth), self._totalShares)
+        return self.totalAssets
@@ -0,0 +1,246 @@
+import math
+
+import numpy as np
+
+from src.costs import leg_cost
+from src.optimizer import DEFAULT_DAILY_YIELD
+
+# mean of the daily deposit draws in main.py
+DEFAULT_DAILY_DEPOSIT = 50_500
+
+
+##################   FORECAST   ##################
+##################################################
+
+
+def _window(values, day, length):
+    # values is a constant or an array over days (the last day repeats); rows
+    # may carry a second axis, e.g. one yield per vault
+    if np.ndim(values) == 0:
+        return np.full(length, float(values))
+    values = np.asarray(values, dtype=float)
+    index = np.minimum(np.arange(day, day + length), len(values) - 1)
+    return values[index]
+
+
+##################   PLAN   ######################
+##################################################
+
+
+class HorizonPlan:
+    def __init__(self, start, days, pools, objective, idle_cost):
+        self.start = start
+        self.days = days  # rebalance days, absolute
+        self.pools = pools  # (horizon,) investable cash expected before each day
+        self.objective = objective  # transaction plus idle cost of the plan
+        self.idle_cost = idle_cost  # cost of never rebalancing in the horizon
+
+    @property
+    def saved(self):
+        return self.idle_cost - self.objective
+
+    def expected_pool(self, day):
+        k = day - self.start
+        return self.pools[k] if 0 <= k < len(self.pools) else None
+
+    def shift(self, start):
+        # the same plan relative to another start day, for cache hits
+        offset = start - self.start
+        days = [day + offset for day in self.days]
+        return HorizonPlan(start, days, self.pools, self.objective, self.idle_cost)
+
+    def __repr__(self):
+        return (
+            f"HorizonPlan(start={self.start}, days={self.days}, "
+            f"objective={self.objective:,.4f}, saved={self.saved:,.4f})"
+        )
+
+
+##################   PLANNER   ###################
+##################################################
+
+# Decides each day whether to rebalance, planning over the next `horizon`
+# days. Cash that arrives on day j and is invested on day t gives up the
+# yield of days j..t-1; every rebalance pays one leg per vault. With the
+# rebalance days as order points this is a Wagner-Whitin lot sizing problem,
+# solved exactly by a backward DP over (last rebalance, next rebalance) pairs
+# in O(horizon^2) numpy work.
+#
+# Re-solving every day is avoided twice over:
+# - warm start: while the cash on hand is within `tolerance` of what the
+#   current plan expected and the plan is less than `refresh` days old, its
+#   next decisions stand
+# - cache: plans are kept by the forecast window and the cash on hand
+#   rounded to `tolerance` (relative), so states that barely differ share a
+#   solve; with stationary forecasts most days are cache hits
+
+
+class HorizonPlanner:
+    def __init__(
+        self,
+        horizon=30,
+        deposits=DEFAULT_DAILY_DEPOSIT,
+        yields=DEFAULT_DAILY_YIELD,
+        tolerance=0.01,
+        refresh=None,
+        cache_size=4096,
+    ):
+        self.horizon = horizon
+        self.deposits = deposits  # forecast per day, constant or (days,)
+        self.yields = yields  # percent per day: constant, (days,), (days, vaults)
+        self.tolerance = tolerance
+        self.refresh = horizon // 2 if refresh is None else refresh
+        self.cache_size = cache_size
+
+        self.day = 0  # the day after the last decision
+        self.plan = None
+        self.cache = {}
+        self.solves = 0
+        self.reused = 0
+        self.cache_hits = 0
+
+    def set_forecast(self, deposits=None, yields=None):
+        # new forecasts invalidate the current plan; cached plans are keyed
+        # by the forecast window itself
+        if deposits is not None:
+            self.deposits = deposits
+        if yields is not None:
+            self.yields = yields
+        self.plan = None
+
+    #### INPUTS ####
+
+    def _inputs(self, portal, day):
+        vaults = list(portal.sub_vaults)
+        ratios = np.array([portal.sub_vaults[v]["ratio"] for v in vaults], float)
+        weights = ratios / ratios.sum() if ratios.sum() > 0 else ratios
+
+        # reserve is kept back from every deposit
+        investable = 1 - portal.reserveRatio / 100
+        flows = _window(self.deposits, day, self.horizon) * investable
+        rates = _window(self.yields, day, self.horizon)
+        if rates.ndim == 2:
+            rates = rates @ weights
+        return vaults, weights, flows, rates / 100
+
+    def _setup(self, vaults, weights, cost, pools):
+        # cost of investing each pool pro rata to the target ratios
+        if not callable(cost):
+            legs = int(np.count_nonzero(weights))
+            return np.where(pools > 0, cost * legs, 0.0)
+
+        total = np.zeros(pools.shape)
+        for vault, weight in zip(vaults, weights.tolist()):
+            if weight > 0:
+                sizes = pools * weight
+                if hasattr(cost, "curve"):
+                    total += cost.curve(vault, sizes)
+                else:
+                    total += np.vectorize(lambda a: leg_cost(cost, vault, a))(sizes)
+        return np.where(pools > 0, total, 0.0)
+
+    #### SOLVER ####
+
+    def solve(self, portal, cost=0, pool=None, day=None):
+        day = self.day if day is None else day
+        if pool is None:
+            pool = available_cash(portal)
+        vaults, weights, flows, rates = self._inputs(portal, day)
+        self.solves += 1
+
+        H = self.horizon
+        q = flows.copy()
+        q[0] = pool  # today's deposit is already in the cash
+        R = np.concatenate(([0.0], np.cumsum(rates)))  # yield of days < t
+        Q = np.concatenate(([0.0], np.cumsum(q)))
+        W = np.concatenate(([0.0], np.cumsum(q * R[:-1])))
+
+        # row i is the last rebalance s = i - 1 (row 0: none yet), column t
+        # the next one; cash of days s+1..t is invested on day t
+        i = np.arange(H + 1)[:, None]
+        t = np.arange(H)[None, :]
+        valid = t >= i
+        pools = np.where(valid, Q[t + 1] - Q[i], 0.0)
+        held = np.where(valid, R[t] * pools - (W[t + 1] - W[i]), 0.0)
+        setup = self._setup(vaults, weights, cost, pools)
+        step = np.where(valid, setup + held, np.inf)
+        terminal = R[H] * (Q[H] - Q[:-1]) - (W[H] - W[:-1])
+        terminal = np.append(terminal, 0.0)  # rebalance on the last day
+
+        value = np.zeros(H + 1)
+        choice = np.full(H + 1, -1)
+        value[H] = terminal[H]
+        for row in range(H - 1, -1, -1):
+            totals = step[row] + value[1:]
+            best = int(np.argmin(totals))
+            if totals[best] < terminal[row]:
+                value[row], choice[row] = totals[best], best
+            else:
+                value[row] = terminal[row]
+
+        days, pools_before, row = [], np.zeros(H), 0
+        while choice[row] >= 0:
+            days.append(int(choice[row]))
+            row = choice[row] + 1
+        last = -1
+        for k in range(H):
+            pools_before[k] = Q[k + 1] - Q[last + 1]
+            if k in days:
+                last = k
+
+        return HorizonPlan(
+            day, [day + k for k in days], pools_before, value[0], terminal[0]
+        )
+
+    #### DECISIONS ####
+
+    def _key(self, portal, cost, pool, day):
+        vaults, weights, flows, rates = self._inputs(portal, day)
+        bucket = round(math.log1p(pool) / math.log1p(self.tolerance))
+        cost_key = cost if not callable(cost) else id(cost)
+        return (bucket, flows.tobytes(), rates.tobytes(), weights.tobytes(), cost_key)
+
+    def _current(self, pool, day):
+        if self.plan is None or day - self.plan.start >= self.refresh:
+            return None
+        expected = self.plan.expected_pool(day)
+        if expected is None:
+            return None
+        if abs(pool - expected) > self.tolerance * max(pool, expected, 1.0):
+            return None
+        return self.plan
+
+    def decide(self, portal, cost, day):
+        # True if the portal should rebalance on `day`; asking again on the
+        # same day gives the same answer, and self.day moves on to the next
+        pool = available_cash(portal)
+        self.day = day + 1
+        if pool <= 0:
+            return False
+
+        plan = self._current(pool, day)
+        if plan is not None:
+            self.reused += 1
+        else:
+            key = self._key(portal, cost, pool, day)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                plan = cached.shift(day)
+            else:
+                plan = self.solve(portal, cost, pool, day)
+                if len(self.cache) >= self.cache_size:
+                    self.cache.pop(next(iter(self.cache)))
+                self.cache[key] = plan
+            self.plan = plan
+
+        if day in plan.days:
+            # after investing, the rest of the plan expects an empty pool
+            self.plan = None if plan.days[-1] == day else plan
+            return True
+        return False
+
+
+def available_cash(portal):
+    required_reserve = portal.totalAssets * portal.reserveRatio / 100
+    return max(0, portal.cash - required_reserve)
@@ -0,0 +1,207 @@
+import functools
+import time
+
+from src.components import ERC4626
+from src.costs import leg_cost
+
+METHODS = (
+    "deposit",
+    "withdraw",
+    "convert_to_shares",
+    "convert_to_assets",
+    "earn_interest",
+    "accrue",
+    "invest",
+    "value_position",
+    "value_portal_investments",
+    "update_total_assets",
+    "simple_rebalance",
+    "smart_rebalance",
+    "optimal_rebalance",
+    "horizon_rebalance",
+    "process_withdrawals",
+)
+
+REBALANCES = (
+    "simple_rebalance",
+    "smart_rebalance",
+    "optimal_rebalance",
+    "horizon_rebalance",
+)
+
+
+##################   PROFILER   ##################
+##################################################
+
+# Opt-in instrumentation of the component API. enable() replaces the listed
+# methods on ERC4626 and every subclass with timing wrappers and disable()
+# puts the originals back, so nothing is left in the call path when it is
+# off. Inclusive time is kept per method and per (method, entity); self time
+# per call stack, which is what folded() exports for flamegraph.pl/speedscope.
+
+
+class Profiler:
+    def __init__(self, methods=METHODS, root=ERC4626, entity_frames=True):
+        self.methods = methods
+        self.root = root
+        self.entity_frames = entity_frames
+        self.enabled = False
+        self._originals = []
+        self.reset()
+
+    def reset(self):
+        self.calls = {}  # method -> [count, seconds]
+        self.entities = {}  # (method, entity) -> [count, seconds]
+        self.stacks = {}  # (frames...) -> [count, self seconds]
+        self.decisions = []
+        self._stack = []
+        self._children = []
+        self._paused = False
+
+    def _classes(self):
+        classes, pending = [], [self.root]
+        while pending:
+            cls = pending.pop()
+            if cls not in classes:
+                classes.append(cls)
+                pending.extend(cls.__subclasses__())
+        return classes
+
+    def enable(self):
+        if self.enabled:
+            return self
+        for cls in self._classes():
+            for name in self.methods:
+                if name in cls.__dict__:
+                    original = cls.__dict__[name]
+                    self._originals.append((cls, name, original))
+                    setattr(cls, name, self._wrap(cls, name, original))
+        self.enabled = True
+        return self
+
+    def disable(self):
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals = []
+        self.enabled = False
+        return self
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def _wrap(self, cls, name, func):
+        label = f"{cls.__name__}.{name}"
+        profiler = self
+
+        @functools.wraps(func)
+        def wrapper(entity, *args, **kwargs):
+            if profiler._paused:
+                return func(entity, *args, **kwargs)
+            if name == "invest":
+                profiler._record_decision(entity, *args, **kwargs)
+
+            frame = f"{label} {entity.name}" if profiler.entity_frames else label
+            profiler._stack.append(frame)
+            profiler._children.append(0.0)
+            start = time.perf_counter()
+            try:
+                return func(entity, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = profiler._children.pop()
+                stack = tuple(profiler._stack)
+                profiler._stack.pop()
+                if profiler._children:
+                    profiler._children[-1] += elapsed
+                profiler._add(profiler.calls, label, elapsed)
+                profiler._add(profiler.entities, (label, entity.name), elapsed)
+                profiler._add(profiler.stacks, stack, elapsed - children)
+
+        return wrapper
+
+    @staticmethod
+    def _add(table, key, seconds):
+        entry = table.get(key)
+        if entry is None:
+            table[key] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def _record_decision(self, portal, vault, assets, cost=0):
+        method = next(
+            (f for f in reversed(self._stack) if f.split()[0].endswith(REBALANCES)),
+            None,
+        )
+        if method is None or vault not in portal.sub_vaults:
+            return
+
+        # look at the portal without counting the calls it takes
+        self._paused = True
+        try:
+            target = portal.totalAssets * portal.sub_vaults[vault]["ratio"] / 100
+            delta = target - portal.value_position(vault)
+            paid = leg_cost(cost, vault, assets)
+        finally:
+            self._paused = False
+
+        self.decisions.append(
+            {
+                "portal": portal.name,
+                "method": method.split()[0].split(".")[1],
+                "vault": vault.name,
+                "delta": delta,
+                "amount": assets,
+                "cost": paid,
+            }
+        )
+
+    #### EXPORT ####
+
+    def folded(self):
+        # one "frame;frame;frame weight" line per stack, weight in microseconds
+        lines = []
+        for stack, (count, seconds) in self.stacks.items():
+            frames = ";".join(frame.replace(";", ":") for frame in stack)
+            lines.append(f"{frames} {max(1, round(seconds * 1e6))}")
+        return "\n".join(sorted(lines))
+
+    def write_folded(self, path):
+        with open(path, "w") as f:
+            f.write(self.folded() + "\n")
+
+    def report(self, top=10):
+        lines = [f"{'method':>32} {'calls':>10} {'total ms':>10} {'us/call':>9}"]
+        for label, (count, seconds) in sorted(
+            self.calls.items(), key=lambda x: x[1][1], reverse=True
+        ):
+            lines.append(
+                f"{label:>32} {count:>10,} {seconds * 1e3:>10.2f} "
+                f"{seconds / count * 1e6:>9.2f}"
+            )
+
+        lines.append(f"\ntop {top} entities by time:")
+        ranked = sorted(self.entities.items(), key=lambda x: x[1][1], reverse=True)
+        for (label, entity), (count, seconds) in ranked[:top]:
+            lines.append(
+                f"{label:>32} {entity:<24} {count:>8,} {seconds * 1e3:>9.2f} ms"
+            )
+
+        if self.decisions:
+            invested = sum(d["amount"] for d in self.decisions)
+            paid = sum(d["cost"] for d in self.decisions)
+            lines.append(
+                f"\n{len(self.decisions):,} rebalance legs, "
+                f"{invested:,.2f} invested, {paid:,.4f} cost paid"
+            )
+        return "\n".join(lines)
+
+
+def profile(run, *args):
+    # profile one call, e.g. profile(run_simulation, funds, ...)
+    with Profiler() as profiler:
+        result = run(*args)
+    return profiler, result
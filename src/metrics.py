@@ -0,0 +1,168 @@
+import numpy as np
+
+KPIS = (
+    "twr",
+    "annualized_return",
+    "idle_cash",
+    "excess_idle_cash",
+    "cost_paid",
+    "tracking_error",
+    "max_drawdown",
+)
+
+
+##################   METRICS   ###################
+##################################################
+
+# KPIs of N funds kept as running aggregates, one O(funds x vaults) update
+# per step and nothing stored per step:
+#   twr                 time-weighted return, from the fund's price per share
+#                       (deposits and withdrawals move shares, not the price)
+#   idle_cash           mean cash / totalAssets
+#   excess_idle_cash    mean idle cash above the reserveRatio
+#   cost_paid           cumulative transaction cost
+#   tracking_error      RMS over steps of the distance between the portfolio
+#                       weights and the target ratios, in percentage points
+#   max_drawdown        largest fall of the price per share from its peak
+# Positions are valued fresh for each observation without touching the
+# funds, so measuring a run does not change it. Observe once before the first
+# step to count that step's return.
+
+
+class Metrics:
+    def __init__(self, reserveRatio, names=None, periods_per_year=365):
+        self.reserve = np.array(reserveRatio, dtype=float, ndmin=1) / 100
+        n = len(self.reserve)
+        self.names = list(names) if names is not None else list(range(n))
+        self.periods_per_year = periods_per_year
+
+        self.steps = 0
+        self.first_price = np.ones(n)
+        self.price = np.ones(n)
+        self.peak = np.ones(n)
+        self.drawdown = np.zeros(n)
+        self.max_drawdown = np.zeros(n)
+        self.cost_paid = np.zeros(n)
+        self.tracking = np.zeros(n)
+        self._idle = np.zeros(n)
+        self._excess = np.zeros(n)
+        self._tracking = np.zeros(n)
+
+    @classmethod
+    def from_engine(cls, engine, names=None, periods_per_year=365):
+        if names is None and engine.funds is not None:
+            names = [fund.name for fund in engine.funds]
+        return cls(engine.reserveRatio, names, periods_per_year)
+
+    @classmethod
+    def from_funds(cls, funds, periods_per_year=365):
+        return cls(
+            [fund.reserveRatio for fund in funds],
+            [fund.name for fund in funds],
+            periods_per_year,
+        )
+
+    def update(self, positions, cash, totalShares, ratios, cost_paid):
+        # positions (funds, vaults) valued in the fund's asset, ratios in
+        # percent of totalAssets as in sub_vaults
+        total = positions.sum(axis=1) + cash
+        safe_total = np.where(total > 0, total, 1)
+        price = np.where(
+            totalShares > 0, total / np.where(totalShares > 0, totalShares, 1), 1.0
+        )
+
+        if self.steps == 0:
+            self.first_price = price.copy()
+            self.peak = price.copy()
+        self.steps += 1
+        self.price = price
+        self.peak = np.maximum(self.peak, price)
+        self.drawdown = 1 - price / self.peak
+        self.max_drawdown = np.maximum(self.max_drawdown, self.drawdown)
+
+        idle = np.where(total > 0, cash / safe_total, 0)
+        self._idle += idle
+        self._excess += np.maximum(0, idle - self.reserve)
+
+        weights = positions / safe_total[:, None]
+        self.tracking = np.sqrt(((weights - ratios / 100) ** 2).sum(axis=1)) * 100
+        self._tracking += self.tracking**2
+
+        self.cost_paid = np.array(cost_paid, dtype=float, ndmin=1)
+        return self
+
+    def observe_engine(self, engine):
+        return self.update(
+            engine.positions(),
+            engine.cash,
+            engine.totalShares,
+            engine.ratios,
+            engine.cost_paid,
+        )
+
+    def observe_funds(self, funds):
+        # funds may hold different vaults; each row lists its own positions
+        width = max(len(fund.sub_vaults) for fund in funds)
+        positions = np.zeros((len(funds), width))
+        ratios = np.zeros((len(funds), width))
+        for i, fund in enumerate(funds):
+            for j, (vault, data) in enumerate(fund.sub_vaults.items()):
+                positions[i, j] = fund.value_position(vault)
+                ratios[i, j] = data["ratio"]
+
+        return self.update(
+            positions,
+            np.array([fund.cash for fund in funds], dtype=float),
+            np.array([fund.totalShares for fund in funds], dtype=float),
+            ratios,
+            [fund.cost_paid for fund in funds],
+        )
+
+    #### KPIS ####
+
+    @property
+    def twr(self):
+        return self.price / np.where(self.first_price > 0, self.first_price, 1) - 1
+
+    @property
+    def annualized_return(self):
+        # steps are periods from the first observation
+        periods = max(self.steps - 1, 1)
+        return (1 + self.twr) ** (self.periods_per_year / periods) - 1
+
+    @property
+    def idle_cash(self):
+        return self._idle / max(self.steps, 1)
+
+    @property
+    def excess_idle_cash(self):
+        return self._excess / max(self.steps, 1)
+
+    @property
+    def tracking_error(self):
+        return np.sqrt(self._tracking / max(self.steps, 1))
+
+    def summary(self):
+        return {kpi: getattr(self, kpi) for kpi in KPIS}
+
+    def rows(self):
+        summary = self.summary()
+        return [
+            dict(name=name, **{kpi: float(summary[kpi][i]) for kpi in KPIS})
+            for i, name in enumerate(self.names)
+        ]
+
+    def report(self):
+        lines = [
+            f"{'fund':<30} {'TWR %':>9} {'ann. %':>8} {'idle %':>8} "
+            f"{'excess %':>9} {'cost':>10} {'track pp':>9} {'max DD %':>9}"
+        ]
+        for row in self.rows():
+            lines.append(
+                f"{str(row['name']):<30} {row['twr'] * 100:>9.3f} "
+                f"{row['annualized_return'] * 100:>8.3f} "
+                f"{row['idle_cash'] * 100:>8.3f} "
+                f"{row['excess_idle_cash'] * 100:>9.4f} {row['cost_paid']:>10.4f} "
+                f"{row['tracking_error']:>9.4f} {row['max_drawdown'] * 100:>9.4f}"
+            )
+        return "\n".join(lines)
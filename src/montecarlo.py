@@ -0,0 +1,211 @@
+import numpy as np
+
+from src.engine import VectorEngine
+
+
+##################   PATHS   #####################
+##################################################
+
+
+class Paths:
+    def __init__(self, index, vault_assets, deposits, withdrawals, yields):
+        self.index = index  # global path numbers of this chunk
+        self.vault_assets = vault_assets  # (paths, vaults) starting balances
+        self.deposits = deposits  # (paths, days)
+        self.withdrawals = withdrawals  # (paths, days) fraction of fund shares
+        self.yields = yields  # (paths, days, vaults) percent per day
+
+    def __len__(self):
+        return len(self.index)
+
+
+class PathGenerator:
+    # Draws the market in chunks of paths. Each path has its own generator
+    # spawned from the seed, so path i is the same whichever chunk it falls in,
+    # whatever the chunk size or number of paths and whichever order chunks
+    # are produced in. Defaults follow the draws in main.py.
+    def __init__(
+        self,
+        seed,
+        days,
+        num_vaults,
+        deposit_range=(1_000, 100_000),
+        interest_range=(1, 10),
+        withdrawal_probability=0.0,
+        max_withdrawal=0.05,
+        chunk_size=256,
+    ):
+        self.seed = seed
+        self.days = days
+        self.num_vaults = num_vaults
+        self.deposit_range = deposit_range
+        self.interest_range = interest_range
+        self.withdrawal_probability = withdrawal_probability
+        self.max_withdrawal = max_withdrawal
+        self.chunk_size = chunk_size
+
+    def _path(self, i):
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(i,)))
+        shape = (self.days, self.num_vaults)
+
+        starting_balance = rng.uniform(1_000, 1_000_000, self.num_vaults)
+        low, high = self.deposit_range
+        deposits = rng.integers(low, high, self.days, endpoint=True).astype(float)
+        low, high = self.interest_range
+        yields = rng.integers(low, high, shape, endpoint=True) / 365 / 10
+
+        withdrawals = np.zeros(self.days)
+        if self.withdrawal_probability > 0:
+            hit = rng.random(self.days) < self.withdrawal_probability
+            withdrawals[hit] = rng.uniform(0, self.max_withdrawal, hit.sum())
+        return starting_balance, deposits, withdrawals, yields
+
+    def chunk(self, k, size=None):
+        size = self.chunk_size if size is None else size
+        start = k * self.chunk_size
+        index = np.arange(start, start + size)
+
+        draws = [self._path(i) for i in index.tolist()]
+        starting_balance, deposits, withdrawals, yields = map(np.array, zip(*draws))
+        return Paths(index, starting_balance, deposits, withdrawals, yields)
+
+    def chunks(self, num_paths):
+        for k, start in enumerate(range(0, num_paths, self.chunk_size)):
+            yield self.chunk(k, min(self.chunk_size, num_paths - start))
+
+
+###############   MONTE CARLO RUN   ###############
+##################################################
+
+
+class Strategy:
+    def __init__(self, name, method="smart", reserveRatio=10, maxDelta=1, cost=0):
+        self.name = name
+        self.method = method
+        self.reserveRatio = reserveRatio
+        self.maxDelta = maxDelta
+        self.cost = cost
+
+
+def run_chunk(paths, strategies, ratios, initial_deposit=1000):
+    # one engine per chunk: universe p holds path p's vaults and every
+    # strategy gets a fund in every universe, so all see the same market
+    p, s = len(paths), len(strategies)
+    engine = VectorEngine(
+        paths.vault_assets,
+        paths.vault_assets,
+        np.tile(ratios, (s * p, 1)),
+        np.repeat([x.reserveRatio for x in strategies], p),
+        np.repeat([x.maxDelta for x in strategies], p),
+        np.repeat([x.method for x in strategies], p),
+        0,
+        universe=np.tile(np.arange(p), s),
+    )
+
+    engine.deposit(initial_deposit)
+    engine.simple_rebalance()
+    engine.costs = np.repeat([x.cost for x in strategies], p).astype(float)
+
+    idle_cash = np.zeros(s * p)
+    days = paths.deposits.shape[1]
+    for day in range(days):
+        engine.deposit(np.tile(paths.deposits[:, day], s))
+        withdrawals = np.tile(paths.withdrawals[:, day], s)
+        if withdrawals.any():
+            engine.withdraw(engine.totalShares * withdrawals)
+        engine.rebalance()
+        engine.earn_interest(paths.yields[:, day, :])
+        idle_cash += engine.cash / engine.totalAssets
+
+    return (
+        engine.totalAssets.reshape(s, p),
+        (idle_cash / max(days, 1)).reshape(s, p),
+        engine.cost_paid.reshape(s, p),
+    )
+
+
+def run_monte_carlo(strategies, generator, num_paths, ratios):
+    ratios = np.asarray(ratios, dtype=float)
+    if len(ratios) != generator.num_vaults:
+        raise ValueError("One ratio per vault is required")
+
+    final_assets, cash_drag, cost_paid = [], [], []
+    for paths in generator.chunks(num_paths):
+        assets, drag, cost = run_chunk(paths, strategies, ratios)
+        final_assets.append(assets)
+        cash_drag.append(drag)
+        cost_paid.append(cost)
+
+    return MonteCarloResult(
+        [x.name for x in strategies],
+        np.concatenate(final_assets, axis=1),
+        np.concatenate(cash_drag, axis=1),
+        np.concatenate(cost_paid, axis=1),
+    )
+
+
+##################   RESULTS   ###################
+##################################################
+
+
+def describe(values, z=1.96):
+    mean = values.mean()
+    std = values.std(ddof=1) if len(values) > 1 else 0.0
+    half_width = z * std / np.sqrt(len(values))
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {
+        "mean": mean,
+        "std": std,
+        "ci_low": mean - half_width,
+        "ci_high": mean + half_width,
+        "p5": p5,
+        "p50": p50,
+        "p95": p95,
+    }
+
+
+class MonteCarloResult:
+    def __init__(self, names, final_assets, cash_drag, cost_paid):
+        self.names = names
+        self.final_assets = final_assets  # (strategies, paths)
+        self.cash_drag = cash_drag
+        self.cost_paid = cost_paid
+
+    def summary(self):
+        return {
+            name: {
+                "totalAssets": describe(self.final_assets[i]),
+                "cash_drag": describe(self.cash_drag[i]),
+                "cost_paid": describe(self.cost_paid[i]),
+            }
+            for i, name in enumerate(self.names)
+        }
+
+    def difference(self, name, baseline=None):
+        # paired over common paths, so the interval is much tighter than
+        # comparing two independent runs
+        baseline = self.names[0] if baseline is None else baseline
+        a = self.final_assets[self.names.index(name)]
+        b = self.final_assets[self.names.index(baseline)]
+        return describe(a - b)
+
+    def report(self):
+        lines = [f"{self.final_assets.shape[1]:,} paths"]
+        for name, stats in self.summary().items():
+            assets = stats["totalAssets"]
+            drag = stats["cash_drag"]
+            lines.append(
+                f"\n{name}:\n"
+                f"totalAssets mean {assets['mean']:,.2f} "
+                f"(95% CI {assets['ci_low']:,.2f} - {assets['ci_high']:,.2f}), "
+                f"p5 {assets['p5']:,.2f}, p95 {assets['p95']:,.2f}\n"
+                f"cash drag mean {drag['mean']:.6f} "
+                f"(95% CI {drag['ci_low']:.6f} - {drag['ci_high']:.6f})"
+            )
+            if name != self.names[0]:
+                delta = self.difference(name)
+                lines.append(
+                    f"vs {self.names[0]}: {delta['mean']:+,.2f} "
+                    f"(95% CI {delta['ci_low']:+,.2f} - {delta['ci_high']:+,.2f})"
+                )
+        return "\n".join(lines)
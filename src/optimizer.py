@@ -0,0 +1,209 @@
+import time
+
+import numpy as np
+
+from src.costs import leg_cost
+
+# mean of the daily interest draws in main.py, in percent per day
+DEFAULT_DAILY_YIELD = 5.5 / 365 / 10
+
+
+##################   REBALANCE PLAN   ############
+##################################################
+
+
+class RebalancePlan:
+    def __init__(
+        self, legs, available_cash, cost, gains, optimal=True, nodes=0, method=""
+    ):
+        self.legs = legs  # [(vault, amount)] in execution order
+        self.available_cash = available_cash
+        self.cost = cost  # flat amount per leg or a cost model
+        self.gains = gains  # expected yield per unit invested over the horizon
+        self.optimal = optimal
+        self.nodes = nodes
+        self.method = method
+
+    @property
+    def invested(self):
+        return sum(amount for vault, amount in self.legs)
+
+    @property
+    def idle_cash(self):
+        return self.available_cash - self.invested
+
+    @property
+    def transaction_cost(self):
+        return sum(leg_cost(self.cost, vault, amount) for vault, amount in self.legs)
+
+    @property
+    def expected_yield(self):
+        return sum(amount * self.gains[vault] for vault, amount in self.legs)
+
+    @property
+    def objective(self):
+        # maximising yield net of costs is the same as minimising transaction
+        # cost plus the yield the idle cash gives up
+        return self.transaction_cost - self.expected_yield
+
+    def execute(self, portal):
+        for vault, amount in self.legs:
+            portal.invest(vault, amount, self.cost)
+        return self
+
+    def __repr__(self):
+        return (
+            f"RebalancePlan({self.method}, legs={len(self.legs)}, "
+            f"invested={self.invested:,.2f}, objective={self.objective:,.4f})"
+        )
+
+
+###################   SOLVER   ###################
+##################################################
+
+
+def _rebalance_inputs(portal, horizon, yields):
+    required_reserve = portal.totalAssets * portal.reserveRatio / 100
+    available_cash = max(0, portal.cash - required_reserve)
+
+    gains = {}
+    deltas = {}
+    for vault, data in portal.sub_vaults.items():
+        rate = DEFAULT_DAILY_YIELD if yields is None else yields[vault]
+        gains[vault] = rate * horizon / 100
+        target_holdings = portal.totalAssets * data["ratio"] / 100
+        deltas[vault] = target_holdings - portal.value_position(vault)
+
+    return available_cash, deltas, gains
+
+
+def greedy_plan(portal, cost=0, horizon=30, yields=None):
+    # the decisions smart_rebalance would take, without executing them
+    available_cash, deltas, gains = _rebalance_inputs(portal, horizon, yields)
+    legs = []
+
+    if available_cash > 0:
+        threshold = portal.totalAssets * portal.maxDelta / 100
+        rebalances = {
+            vault: min(delta, available_cash)
+            for vault, delta in deltas.items()
+            if delta > 0 and delta > threshold
+        }
+        remaining = available_cash
+        for vault, amount in sorted(
+            rebalances.items(), key=lambda x: x[1], reverse=True
+        ):
+            if remaining >= amount:
+                legs.append((vault, amount))
+                remaining -= amount
+            else:
+                legs.append((vault, remaining))
+                break
+
+    return RebalancePlan(legs, available_cash, cost, gains, method="greedy")
+
+
+def solve_allocation(caps, gains, budget, cost, time_budget=0.05):
+    # Fixed-charge knapsack: choose x_i in [0, caps_i] with sum(x) <= budget to
+    # maximise sum(gains_i * x_i) - cost * |{x_i > 0}|. For a chosen set the
+    # best fill goes in gain order, so every chosen leg is full except the
+    # lowest-gain one. Branch and bound walks the legs in gain order, deciding
+    # full legs and trying the best partial leg among the undecided ones.
+    # cost may also be one fixed charge per leg.
+    # Returns (amounts, optimal, nodes); optimal is False if time ran out.
+    caps = np.asarray(caps, dtype=float)
+    gains = np.asarray(gains, dtype=float)
+    costs = np.broadcast_to(np.asarray(cost, dtype=float), caps.shape)
+    amounts = np.zeros(len(caps))
+
+    useful = np.flatnonzero((caps > 0) & (caps * gains > costs))
+    if useful.size == 0 or budget <= 0:
+        return amounts, True, 0
+
+    items = useful[np.lexsort((-caps[useful], -gains[useful]))]
+    w = caps[items]
+    g = gains[items]
+    c = costs[items]
+    d = g - c / w  # value per unit when the leg is filled completely
+    by_density = np.argsort(-d, kind="stable")
+    n = len(items)
+
+    def bound(k, room):
+        # LP relaxation over the undecided legs k.. (Dantzig bound)
+        idx = by_density[by_density >= k]
+        filled = np.cumsum(w[idx])
+        full = np.searchsorted(filled, room, side="right")
+        value = np.dot(w[idx[:full]], d[idx[:full]])
+        if full < len(idx):
+            used = filled[full - 1] if full else 0
+            value += (room - used) * d[idx[full]]
+        return value
+
+    best_value, best_full, best_partial = 0.0, [], -1
+    deadline = time.perf_counter() + time_budget
+    nodes = 0
+    optimal = True
+    stack = [(0, budget, 0.0, [])]
+
+    while stack:
+        nodes += 1
+        if nodes % 64 == 0 and time.perf_counter() > deadline:
+            optimal = False
+            break
+
+        k, room, value, chosen = stack.pop()
+        if value > best_value:
+            best_value, best_full, best_partial = value, chosen, -1
+        if k == n:
+            continue
+
+        partial = np.minimum(w[k:], room) * g[k:] - c[k:]
+        j = int(np.argmax(partial))
+        if value + partial[j] > best_value:
+            best_value, best_full, best_partial = value + partial[j], chosen, k + j
+
+        if value + bound(k, room) <= best_value + 1e-12:
+            continue
+
+        stack.append((k + 1, room, value, chosen))
+        if w[k] <= room:
+            stack.append((k + 1, room - w[k], value + w[k] * d[k], chosen + [k]))
+
+    room = budget
+    for k in best_full:
+        amounts[items[k]] = w[k]
+        room -= w[k]
+    if best_partial >= 0:
+        amounts[items[best_partial]] = min(w[best_partial], room)
+
+    return amounts, optimal, nodes
+
+
+def optimal_plan(portal, cost=0, horizon=30, yields=None, time_budget=0.05):
+    available_cash, deltas, gains = _rebalance_inputs(portal, horizon, yields)
+
+    vaults = list(deltas)
+    caps = [min(max(deltas[vault], 0), available_cash) for vault in vaults]
+    # a cost model is charged at the full leg size, which for impact costs
+    # is an upper bound on a partial leg
+    costs = [leg_cost(cost, vault, cap) for vault, cap in zip(vaults, caps)]
+    amounts, optimal, nodes = solve_allocation(
+        caps, [gains[vault] for vault in vaults], available_cash, costs, time_budget
+    )
+
+    legs = [(vault, amount) for vault, amount in zip(vaults, amounts) if amount > 0]
+    legs.sort(key=lambda x: x[1], reverse=True)
+
+    plan = RebalancePlan(
+        legs, available_cash, cost, gains, optimal, nodes, method="optimal"
+    )
+
+    # the search starts from nothing, so keep the greedy plan if the time
+    # budget ran out before the search caught up with it
+    greedy = greedy_plan(portal, cost, horizon, yields)
+    if not optimal and greedy.objective < plan.objective:
+        greedy.optimal = False
+        greedy.nodes = nodes
+        return greedy
+
+    return plan
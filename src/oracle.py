@@ -0,0 +1,100 @@
+import numpy as np
+
+from src.costs import leg_cost
+
+
+##################   PRICE ORACLE   ##############
+##################################################
+
+# Prices of each deposit asset in a common unit (e.g. USD). Conversion rates
+# between assets are built once per price update as one numpy outer division
+# and kept as nested dicts, so valuing a position is a dict lookup rather than
+# an oracle call. Portals attached to the oracle are told which positions a
+# price update moved and revalue only those on their next update.
+
+
+class PriceOracle:
+    def __init__(self, prices, swap_cost=0):
+        self.assets = list(prices)
+        self.prices = np.array([prices[asset] for asset in self.assets], dtype=float)
+        self.swap_cost = swap_cost
+        self.swap_costs = {}  # total paid, per asset it was paid in
+        self.version = 0
+        self.portals = []
+        self._index = {asset: i for i, asset in enumerate(self.assets)}
+        self._table = None
+
+    def attach(self, portal):
+        # attach children before parents, update() revalues in that order
+        if portal.depositAsset not in self._index:
+            raise ValueError(f"No price for {portal.depositAsset}")
+        portal.oracle = self
+        if portal not in self.portals:
+            self.portals.append(portal)
+
+    def table(self):
+        # table[a][b] converts an amount of asset a into asset b
+        if self._table is None:
+            rates = self.prices[:, None] / self.prices[None, :]
+            self._table = {
+                a: dict(zip(self.assets, row))
+                for a, row in zip(self.assets, rates.tolist())
+            }
+        return self._table
+
+    def rate(self, source, target):
+        if source == target:
+            return 1.0
+        try:
+            return self.table()[source][target]
+        except KeyError:
+            raise ValueError(f"No price for {source} or {target}")
+
+    def convert(self, amount, source, target):
+        return amount * self.rate(source, target)
+
+    # Swap legs of invests into and liquidations out of a vault held in
+    # another asset. The swap cost (flat or a cost model) is charged in the
+    # portal's own asset, on the amount going in or the amount coming out,
+    # and added to the portal's cost_paid.
+
+    def swap_in(self, vault, amount, portal):
+        cost = self._charge(vault, amount, portal)
+        return (amount - cost) * self.rate(portal.depositAsset, vault.depositAsset)
+
+    def swap_out(self, vault, amount, portal):
+        amount *= self.rate(vault.depositAsset, portal.depositAsset)
+        return amount - self._charge(vault, amount, portal)
+
+    def _charge(self, vault, amount, portal):
+        cost = leg_cost(self.swap_cost, vault, amount)
+        home = portal.depositAsset
+        self.swap_costs[home] = self.swap_costs.get(home, 0) + cost
+        portal.cost_paid += cost
+        return cost
+
+    def update(self, prices, revalue=True):
+        changed = set()
+        for asset, price in prices.items():
+            if asset not in self._index:
+                self._index[asset] = len(self.assets)
+                self.assets.append(asset)
+                self.prices = np.append(self.prices, price)
+                changed.add(asset)
+            elif self.prices[self._index[asset]] != price:
+                self.prices[self._index[asset]] = price
+                changed.add(asset)
+        if not changed:
+            return changed
+
+        self._table = None
+        self.version += 1
+        for portal in self.portals:
+            base_moved = portal.depositAsset in changed
+            for vault in portal.sub_vaults:
+                asset = vault.depositAsset
+                if asset != portal.depositAsset and (base_moved or asset in changed):
+                    portal._dirty[vault] = None
+            if revalue:
+                portal.update_total_assets()
+        return changed
@@ -0,0 +1,140 @@
+import json
+import os
+
+import numpy as np
+
+FIELDS = ("totalAssets", "totalShares", "cash")
+
+
+##################   RECORDER   ##################
+##################################################
+
+# Buffers one row per step for each recorded field in preallocated arrays and
+# appends them in chunks to one raw float64 file per field (rows x entities),
+# described by meta.json. load_recording maps the files back without copying.
+#
+# Entities are Fund / Portal / ERC4626 objects, or plain names when rows come
+# from arrays (e.g. a VectorEngine). Like a Portal, the recorder keeps the
+# version of each object it last read and only rereads the objects whose
+# totals changed since.
+
+
+class Recorder:
+    def __init__(self, path, entities, fields=FIELDS, chunk_size=1024):
+        self.path = path
+        self.entities = list(entities)
+        self.names = [getattr(e, "name", e) for e in self.entities]
+        self.fields = list(fields)
+        self.chunk_size = chunk_size
+
+        n = len(self.entities)
+        self.buffers = {field: np.full((chunk_size, n), np.nan) for field in fields}
+        self.steps = np.zeros(chunk_size, dtype=np.int64)
+        self.count = 0
+        self.rows = 0
+
+        # version of each recorded object at its last read; None reads it first
+        self._versions = {
+            j: None for j, e in enumerate(self.entities) if hasattr(e, "_version")
+        }
+
+        os.makedirs(path, exist_ok=True)
+        for name in self.fields + ["steps"]:
+            open(self._file(name), "wb").close()
+        self._write_meta()
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _write_meta(self):
+        meta = {
+            "names": [str(name) for name in self.names],
+            "fields": self.fields,
+            "rows": self.rows,
+            "dtype": "<f8",
+        }
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def record(self, step, source=None):
+        row = self.count
+
+        if source is not None:
+            for field in self.fields:
+                self.buffers[field][row] = getattr(source, field)
+        else:
+            if row > 0:
+                for field in self.fields:
+                    self.buffers[field][row] = self.buffers[field][row - 1]
+
+            for j, version in self._versions.items():
+                entity = self.entities[j]
+                if entity._version == version:
+                    continue
+                for field in self.fields:
+                    self.buffers[field][row, j] = getattr(entity, field, np.nan)
+                self._versions[j] = entity._version
+
+        self.steps[row] = step
+        self.count += 1
+        if self.count == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.count == 0:
+            return
+
+        for field in self.fields:
+            with open(self._file(field), "ab") as f:
+                f.write(self.buffers[field][: self.count].astype("<f8").tobytes())
+        with open(self._file("steps"), "ab") as f:
+            f.write(self.steps[: self.count].astype("<i8").tobytes())
+
+        # row 0 carries the last row over, so unchanged entities keep their values
+        for field in self.fields:
+            self.buffers[field][0] = self.buffers[field][self.count - 1]
+        self.rows += self.count
+        self.count = 0
+        self._write_meta()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        self.names = meta["names"]
+        self.fields = meta["fields"]
+        self.rows = meta["rows"]
+        shape = (self.rows, len(self.names))
+
+        self.steps = self._map(os.path.join(path, "steps.bin"), "<i8", (self.rows,))
+        self.data = {
+            field: self._map(os.path.join(path, f"{field}.bin"), meta["dtype"], shape)
+            for field in self.fields
+        }
+
+    @staticmethod
+    def _map(filename, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(filename, dtype=dtype, mode="r", shape=shape)
+
+    def __getitem__(self, field):
+        return self.data[field]
+
+    def series(self, field, name):
+        return self.data[field][:, self.names.index(name)]
+
+
+def load_recording(path):
+    return Recording(path)
@@ -0,0 +1,355 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+from bisect import bisect_right
+
+import httpx
+import numpy as np
+
+from src.simulation import initialize_vaults
+
+TOTAL_ASSETS = "0x01e1d114"  # totalAssets()
+TOTAL_SUPPLY = "0x18160ddd"  # totalSupply()
+BLOCKS_PER_DAY = 7200  # 12 second blocks
+
+
+##################   RPC CLIENT   ################
+##################################################
+
+# JSON-RPC over one pooled httpx client. batch() packs calls into JSON-RPC
+# batches of batch_size and sends at most max_connections of them at a time,
+# so thousands of eth_calls are a handful of round trips and a huge batch
+# does not queue every request on the pool at once.
+
+
+class RpcClient:
+    def __init__(
+        self, url, transport=None, batch_size=100, max_connections=8, timeout=30.0
+    ):
+        self.url = url
+        self.transport = transport
+        self.batch_size = batch_size
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._client = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        self._client = httpx.AsyncClient(
+            transport=self.transport, limits=limits, timeout=self.timeout
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    async def _post(self, payload):
+        self.requests += 1
+        response = await self._client.post(self.url, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def batch(self, calls):
+        # calls are (method, params) pairs; results come back in the same order
+        requests = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in zip(self._ids, calls)
+        ]
+        chunks = [
+            requests[i : i + self.batch_size]
+            for i in range(0, len(requests), self.batch_size)
+        ]
+        slots = asyncio.Semaphore(self.max_connections)
+
+        async def post(chunk):
+            async with slots:
+                return await self._post(chunk)
+
+        replies = await asyncio.gather(*(post(chunk) for chunk in chunks))
+
+        by_id = {}
+        for reply in replies:
+            for item in reply if isinstance(reply, list) else [reply]:
+                by_id[item.get("id")] = item
+        results = []
+        for request in requests:
+            item = by_id.get(request["id"])
+            if item is None:
+                raise ValueError(f"No reply to {request['method']}")
+            if "error" in item:
+                raise ValueError(f"RPC error: {item['error'].get('message')}")
+            results.append(item["result"])
+        return results
+
+    async def call(self, method, params=()):
+        return (await self.batch([(method, list(params))]))[0]
+
+    async def block_number(self):
+        return int(await self.call("eth_blockNumber"), 16)
+
+
+##################   BLOCK CACHE   ###############
+##################################################
+
+# One .npz file per vault and fetched block range (<address>/<first>-<last>.npz)
+# holding the blocks and the vault's totals at each. Files are never
+# rewritten; a rerun reads every range it has and asks the node only for the
+# blocks that are missing, then stores those as a new range.
+
+
+class BlockCache:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _dir(self, address):
+        return os.path.join(self.path, address.lower())
+
+    def load(self, address):
+        states = {}
+        folder = self._dir(address)
+        if not os.path.isdir(folder):
+            return states
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".npz"):
+                with np.load(os.path.join(folder, name)) as data:
+                    for block, assets, shares in zip(
+                        data["blocks"].tolist(),
+                        data["assets"].tolist(),
+                        data["shares"].tolist(),
+                    ):
+                        states[block] = (assets, shares)
+        return states
+
+    def store(self, address, blocks, assets, shares):
+        if len(blocks) == 0:
+            return None
+        folder = self._dir(address)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{min(blocks)}-{max(blocks)}.npz")
+        np.savez(
+            path,
+            blocks=np.asarray(blocks, dtype=np.int64),
+            assets=np.asarray(assets, dtype=float),
+            shares=np.asarray(shares, dtype=float),
+        )
+        return path
+
+
+##################   HISTORY   ###################
+##################################################
+
+
+class History:
+    # totals of recorded vaults at each sampled block, (blocks, vaults)
+    def __init__(self, names, blocks, assets, shares):
+        self.names = list(names)
+        self.blocks = list(blocks)
+        self.assets = assets
+        self.shares = shares
+
+    def prices(self):
+        safe = np.where(self.shares > 0, self.shares, 1)
+        return np.where(self.shares > 0, self.assets / safe, 1.0)
+
+    def interest(self):
+        # percent per period, as earn_interest takes it; read from the price
+        # per share so other depositors' flows do not count as yield
+        prices = self.prices()
+        last = np.where(prices[:-1] > 0, prices[:-1], 1)
+        return (prices[1:] / last - 1) * 100
+
+    def balances(self, day=0):
+        return {
+            name: (assets, shares)
+            for name, assets, shares in zip(
+                self.names, self.assets[day].tolist(), self.shares[day].tolist()
+            )
+        }
+
+
+def sample_blocks(start, end, step=BLOCKS_PER_DAY):
+    # anchored at start, so a later end only adds blocks after the cached ones
+    return list(range(start, end + 1, step))
+
+
+async def fetch_history(client, vaults, blocks, cache=None):
+    # vaults are dicts with a name, an address, optional decimals of the
+    # asset (6) and of the shares (same as the asset)
+    blocks = list(blocks)
+    shape = (len(blocks), len(vaults))
+    assets, shares = np.zeros(shape), np.zeros(shape)
+
+    calls, slots = [], []
+    for j, vault in enumerate(vaults):
+        cached = {} if cache is None else cache.load(vault["address"])
+        for i, block in enumerate(blocks):
+            if block in cached:
+                assets[i, j], shares[i, j] = cached[block]
+                continue
+            to, tag = vault["address"], hex(block)
+            calls.append(("eth_call", [{"to": to, "data": TOTAL_ASSETS}, tag]))
+            calls.append(("eth_call", [{"to": to, "data": TOTAL_SUPPLY}, tag]))
+            slots.append((i, j))
+
+    results = await client.batch(calls) if calls else []
+    fetched = {}
+    for k, (i, j) in enumerate(slots):
+        decimals = vaults[j].get("decimals", 6)
+        share_decimals = vaults[j].get("share_decimals", decimals)
+        assets[i, j] = int(results[2 * k], 16) / 10**decimals
+        shares[i, j] = int(results[2 * k + 1], 16) / 10**share_decimals
+        fetched.setdefault(j, []).append(i)
+
+    if cache is not None:
+        for j, rows in fetched.items():
+            cache.store(
+                vaults[j]["address"],
+                [blocks[i] for i in rows],
+                assets[rows, j],
+                shares[rows, j],
+            )
+
+    return History([vault["name"] for vault in vaults], blocks, assets, shares)
+
+
+async def record(
+    url, vaults, start, end=None, step=BLOCKS_PER_DAY, cache_dir=None, transport=None
+):
+    cache = None if cache_dir is None else BlockCache(cache_dir)
+    async with RpcClient(url, transport) as client:
+        if end is None:
+            end = await client.block_number()
+        blocks = sample_blocks(start, end, step)
+        return await fetch_history(client, vaults, blocks, cache)
+
+
+def load_history(*args, **kwargs):
+    return asyncio.run(record(*args, **kwargs))
+
+
+##################   REPLAY   ####################
+##################################################
+
+
+def initialize_recorded_vaults(protocols, history, day=0, rng=random, **kwargs):
+    # vaults named in the history start from their recorded totals, the rest
+    # are seeded as usual
+    return initialize_vaults(protocols, rng, balances=history.balances(day), **kwargs)
+
+
+def run_replay(
+    funds,
+    strategies,
+    costs,
+    history,
+    rng=random,
+    deposit_range=(1_000, 100_000),
+    on_step=None,
+):
+    # run_simulation with the recorded yields of each vault in place of random
+    # draws; one day per sampled block interval
+    names = {name: j for j, name in enumerate(history.names)}
+    vaults, columns = [], []
+    for fund in funds:
+        for vault in fund.sub_vaults:
+            if vault.name in names and vault not in vaults:
+                vaults.append(vault)
+                columns.append(names[vault.name])
+    interest = history.interest()[:, columns].tolist()
+
+    for day, rates in enumerate(interest):
+        daily_deposit = rng.randint(*deposit_range)
+
+        for fund in funds:
+            fund.deposit(daily_deposit)
+
+        for fund, strategy, cost in zip(funds, strategies, costs):
+            getattr(fund, f"{strategy}_rebalance")(cost)
+
+        for vault, percent in zip(vaults, rates):
+            vault.earn_interest(percent)
+
+        if on_step is not None:
+            on_step(day)
+
+    return funds
+
+
+##################   LOCAL NODE   ################
+##################################################
+
+# A stand-in for an archive node, as an ASGI app: answers eth_blockNumber and
+# the totalAssets()/totalSupply() eth_calls of the vaults it is given, at any
+# block, from the last state set at or before that block. httpx can talk to
+# it in process with httpx.ASGITransport, or any ASGI server can expose it.
+
+
+class LocalNode:
+    def __init__(self, head=0):
+        self.head = head
+        self.states = {}  # address -> ([blocks], [(totalAssets, totalSupply)])
+        self.requests = 0
+        self.calls = 0
+
+    def set_state(self, address, block, assets, supply):
+        blocks, values = self.states.setdefault(address.lower(), ([], []))
+        i = bisect_right(blocks, block)
+        if i and blocks[i - 1] == block:
+            values[i - 1] = (int(assets), int(supply))
+        else:
+            blocks.insert(i, block)
+            values.insert(i, (int(assets), int(supply)))
+        self.head = max(self.head, block)
+
+    def handle(self, request):
+        self.calls += 1
+        method, params = request.get("method"), request.get("params", [])
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        if method == "eth_blockNumber":
+            reply["result"] = hex(self.head)
+            return reply
+        if method != "eth_call":
+            reply["error"] = {"code": -32601, "message": f"Unknown method {method}"}
+            return reply
+
+        call, tag = params[0], params[1] if len(params) > 1 else "latest"
+        block = self.head if tag == "latest" else int(tag, 16)
+        blocks, values = self.states.get(call["to"].lower(), ([], []))
+        i = bisect_right(blocks, block)
+        selector = call.get("data", "")[:10]
+        if block > self.head or i == 0 or selector not in (TOTAL_ASSETS, TOTAL_SUPPLY):
+            reply["error"] = {"code": -32000, "message": "execution reverted"}
+            return reply
+
+        value = values[i - 1][0 if selector == TOTAL_ASSETS else 1]
+        reply["result"] = "0x" + format(value, "064x")
+        return reply
+
+    async def __call__(self, scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        self.requests += 1
+        payload = json.loads(body)
+        if isinstance(payload, list):
+            reply = [self.handle(request) for request in payload]
+        else:
+            reply = self.handle(payload)
+
+        data = json.dumps(reply).encode()
+        headers = [(b"content-type", b"application/json")]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": data})
@@ -0,0 +1,255 @@
+import argparse
+import json
+import random
+
+import numpy as np
+import yaml
+
+from src.accrual import tree
+from src.components import Fund
+from src.engine import VectorEngine
+from src.simulation import USDC, create_portal, daily_draws, initialize_vaults
+
+FUND_DEFAULTS = {
+    "reserveRatio": 10,
+    "maxDelta": 1,
+    "strategy": "smart",
+    "cost": 0,
+    "deposit": 1000,
+}
+
+
+##################   LOADING   ###################
+##################################################
+
+# A scenario is a dict, usually from a JSON or YAML file:
+#
+#   seed, days           RNG seed and horizon in days
+#   protocols            as PROTOCOLS in simulation.py; vaults are named
+#                        "<protocol> Vault A", "<protocol> Vault B", ...
+#                        A protocol held by a fund becomes a portal that
+#                        rebalances with its optional strategy (simple) and
+#                        cost (0)
+#   funds                list of funds, each with a name, holdings as
+#                        [name, ratio] pairs naming a vault, a protocol (held
+#                        through a portal) or an earlier fund, and optional
+#                        reserveRatio, maxDelta, strategy, cost, deposit
+#   defaults             values applied to every fund that does not set them
+#   deposits             {"low", "high"} range of the daily deposit
+#   withdrawals          optional {"probability", "max_fraction"} of a daily
+#                        redemption of that fraction of every fund's shares
+#   interest             names of the vaults paid interest, by default every
+#                        vault under the funds, in order of first use
+#
+# A file holds one scenario or a list of them under "scenarios".
+
+
+def load_scenarios(path):
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    if isinstance(data, dict) and "scenarios" in data:
+        return data["scenarios"]
+    return data if isinstance(data, list) else [data]
+
+
+def load_scenario(path):
+    scenarios = load_scenarios(path)
+    if len(scenarios) != 1:
+        raise ValueError("File holds more than one scenario")
+    return scenarios[0]
+
+
+##################   COMPILER   ##################
+##################################################
+
+
+class Plan:
+    # Everything the day loop needs, resolved to objects, bound methods and
+    # preallocated arrays, so running it does no name lookups. Every portal
+    # in the fund trees rebalances each day, innermost first, so a portal
+    # invests the cash its parents put in on the day before.
+    def __init__(self, name, days, rng, vaults, funds, strategies, costs, portals=None):
+        self.name = name
+        self.days = days
+        self.rng = rng
+        self.vaults = vaults  # interest vaults, column order of self.interest
+        self.funds = funds
+        self.strategies = strategies
+        self.costs = costs
+        # (portal, strategy, cost) in rebalance order, by default the funds
+        if portals is None:
+            portals = list(zip(funds, strategies, costs))
+        self.portals = portals
+
+        self.deposits = np.zeros(days)
+        self.interest = np.zeros((days, len(vaults)))
+        self.withdrawals = None  # (days,) fraction of shares, if configured
+
+        self._deposit = [fund.deposit for fund in funds]
+        self._rebalance = [
+            (getattr(portal, f"{strategy}_rebalance"), cost)
+            for portal, strategy, cost in portals
+        ]
+        self._earn = [vault.earn_interest for vault in vaults]
+
+    def draw(self, deposit_range, withdrawals=None):
+        # same draws in the same order as run_simulation, taken up front
+        num_vaults = len(self.vaults)
+        for day in range(self.days):
+            deposit, interest = daily_draws(self.rng, num_vaults, deposit_range)
+            self.deposits[day] = deposit
+            self.interest[day] = interest
+
+        if withdrawals:
+            hit = [self.rng.random() for day in range(self.days)]
+            size = [self.rng.random() for day in range(self.days)]
+            self.withdrawals = np.where(
+                np.array(hit) < withdrawals["probability"],
+                np.array(size) * withdrawals["max_fraction"],
+                0.0,
+            )
+
+    def run(self, on_step=None):
+        deposits = self.deposits.tolist()
+        interest = self.interest.tolist()
+        withdrawals = None if self.withdrawals is None else self.withdrawals.tolist()
+        funds = self.funds
+
+        for day in range(self.days):
+            deposit = deposits[day]
+            for fund_deposit in self._deposit:
+                fund_deposit(deposit)
+
+            if withdrawals is not None and withdrawals[day] > 0:
+                for fund in funds:
+                    fund.withdraw(fund.totalShares * withdrawals[day])
+
+            for rebalance, cost in self._rebalance:
+                rebalance(cost)
+
+            for earn, percent in zip(self._earn, interest[day]):
+                earn(percent)
+
+            if on_step is not None:
+                on_step(day)
+
+        return funds
+
+    def run_vectorized(self, on_step=None):
+        # funds must hold vaults directly; syncs the results back to them
+        engine = VectorEngine.from_funds(self.funds, self.strategies, self.costs)
+        column = {vault: j for j, vault in enumerate(engine.vaults)}
+        interest = np.zeros((self.days, engine.num_vaults))
+        for k, vault in enumerate(self.vaults):
+            if vault in column:
+                interest[:, column[vault]] = self.interest[:, k]
+
+        for day in range(self.days):
+            engine.deposit(self.deposits[day])
+            if self.withdrawals is not None and self.withdrawals[day] > 0:
+                engine.withdraw(engine.totalShares * self.withdrawals[day])
+            engine.rebalance()
+            engine.earn_interest(interest[day])
+
+            if on_step is not None:
+                on_step(day)
+
+        engine.sync()
+        return self.funds
+
+
+def compile_scenario(scenario):
+    rng = random.Random(scenario.get("seed"))
+    protocols = scenario["protocols"]
+    vaults = initialize_vaults(protocols, rng)
+
+    holdable = {vault.name: vault for vault in vaults}
+    protocol_vaults = {}
+    for protocol in protocols:
+        count = protocol["vaults"]
+        protocol_vaults[protocol["name"]] = (vaults[:count], protocol)
+        vaults = vaults[count:]
+
+    defaults = dict(FUND_DEFAULTS, **scenario.get("defaults", {}))
+    funds, strategies, costs = [], [], []
+    rebalances = {}  # every portal -> (strategy, cost)
+    for spec in scenario["funds"]:
+        spec = dict(defaults, **spec)
+        fund = Fund(spec["name"], USDC, 0, 0, spec["reserveRatio"], spec["maxDelta"])
+        for name, ratio in spec["holdings"]:
+            if name not in holdable and name in protocol_vaults:
+                members, protocol = protocol_vaults[name]
+                holdable[name] = create_portal(members, name, protocol["ratios"])
+                rebalances[holdable[name]] = (
+                    protocol.get("strategy", "simple"),
+                    protocol.get("cost", 0),
+                )
+            if name not in holdable:
+                raise ValueError(f"Unknown holding {name!r} in {spec['name']!r}")
+            fund.add_vault(holdable[name], ratio)
+
+        if spec["name"] in holdable:
+            raise ValueError(f"Duplicate name {spec['name']!r}")
+        holdable[spec["name"]] = fund
+        fund.deposit(spec["deposit"])
+        fund.simple_rebalance()
+
+        funds.append(fund)
+        strategies.append(spec["strategy"])
+        costs.append(spec["cost"])
+        rebalances[fund] = (spec["strategy"], spec["cost"])
+
+    # post-order over every tree, so children rebalance before their parents
+    portals = {}
+    for fund in funds:
+        portals.update(dict.fromkeys(tree(fund)[0]))
+    portals = [(portal, *rebalances[portal]) for portal in portals]
+
+    if "interest" in scenario:
+        interest = [holdable[name] for name in scenario["interest"]]
+    else:
+        interest = []
+        for fund in funds:
+            interest += [vault for vault in tree(fund)[1] if vault not in interest]
+
+    plan = Plan(
+        scenario.get("name", "scenario"),
+        scenario["days"],
+        rng,
+        interest,
+        funds,
+        strategies,
+        costs,
+        portals,
+    )
+    deposits = scenario.get("deposits", {"low": 1_000, "high": 100_000})
+    plan.draw((deposits["low"], deposits["high"]), scenario.get("withdrawals"))
+    return plan
+
+
+def run_scenario(scenario, vectorized=False, on_step=None):
+    plan = compile_scenario(scenario)
+    if vectorized:
+        return plan.run_vectorized(on_step)
+    return plan.run(on_step)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run scenario files")
+    parser.add_argument("path", help="JSON or YAML scenario file")
+    parser.add_argument("--vectorized", action="store_true")
+    args = parser.parse_args(argv)
+
+    for scenario in load_scenarios(args.path):
+        funds = run_scenario(scenario, args.vectorized)
+        print(f"\n{scenario.get('name', 'scenario')}:")
+        for fund in sorted(funds, key=lambda x: x.totalAssets, reverse=True):
+            print(f"{fund.name}: {fund.totalAssets:,.2f} (cash {fund.cash:,.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import heapq
+import itertools
+
+import numpy as np
+
+# Events at the same time run in priority order, matching the main.py day:
+# deposits, withdrawals, then rebalances, then interest.
+DEPOSIT = 0
+WITHDRAWAL = 1
+REBALANCE = 2
+INTEREST = 3
+
+MINUTE = 1
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+
+##################   SCHEDULER   #################
+##################################################
+
+# Event queue keyed by (time, priority, sequence). The clock jumps straight to
+# the next event, so empty stretches cost nothing however fine the time unit.
+
+
+class Scheduler:
+    def __init__(self, start=0):
+        self.now = start
+        self.processed = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._triggers = []
+        self._advance_hooks = []
+        self._unbounded = 0  # recurring events with no end
+
+    def __len__(self):
+        return len(self._queue)
+
+    def at(self, time, action, priority=0):
+        if time < self.now:
+            raise ValueError("Cannot schedule an event in the past")
+        heapq.heappush(self._queue, (time, priority, next(self._sequence), action))
+
+    def every(self, interval, action, start=None, until=None, priority=0):
+        if interval <= 0:
+            raise ValueError("Interval must be positive")
+        if until is None:
+            self._unbounded += 1
+
+        def recurring(now):
+            action(now)
+            if until is None or now + interval <= until:
+                self.at(now + interval, recurring, priority)
+
+        self.at(self.now if start is None else start, recurring, priority)
+
+    def stream(self, events, action, priority=0):
+        # events is an iterable of (time, payload) in time order; only the next
+        # one is queued, so long or generated streams use constant memory
+        events = iter(events)
+
+        def push():
+            for time, payload in events:
+                self.at(time, lambda now: fire(now, payload), priority)
+                return
+
+        def fire(now, payload):
+            action(now, payload)
+            push()
+
+        push()
+
+    def on_advance(self, hook):
+        # hook(start, end) runs whenever the clock moves forward
+        self._advance_hooks.append(hook)
+
+    def _advance(self, time):
+        if time > self.now:
+            for hook in self._advance_hooks:
+                hook(self.now, time)
+            self.now = time
+
+    def when(self, condition, action, cooldown=0):
+        # checked after every event; fires at most once per cooldown
+        self._triggers.append([condition, action, cooldown, None])
+
+    def run(self, until=None):
+        if until is None and self._unbounded:
+            raise ValueError("Cannot run without until while an event repeats forever")
+        processed = 0
+        while self._queue and (until is None or self._queue[0][0] <= until):
+            time, priority, sequence, action = heapq.heappop(self._queue)
+            self._advance(time)
+            action(time)
+            processed += 1
+
+            for trigger in self._triggers:
+                condition, fire, cooldown, last = trigger
+                if last is not None and time - last < cooldown:
+                    continue
+                if condition():
+                    fire(time)
+                    trigger[3] = time
+
+        if until is not None:
+            self._advance(until)
+        self.processed += processed
+        return processed
+
+
+###############   EVENT SIMULATION   ###############
+##################################################
+
+
+class EventSimulation:
+    def __init__(self, fund, vaults=None, start=0):
+        self.fund = fund
+        self.vaults = list(fund.sub_vaults) if vaults is None else vaults
+        self.scheduler = Scheduler(start)
+        self.payouts = []  # (time, paid) for each withdrawal event
+
+    def deposits(self, events):
+        self.scheduler.stream(
+            events, lambda now, assets: self.fund.deposit(assets), DEPOSIT
+        )
+
+    def withdrawals(self, events, cost=0):
+        # payload is a share amount or a whole queue of them, redeemed in one
+        # pass
+        def redeem(now, shares):
+            if np.ndim(shares) == 0:
+                paid = self.fund.withdraw(shares, cost)
+            else:
+                paid = self.fund.process_withdrawals(shares, cost)
+            self.payouts.append((now, paid))
+
+        self.scheduler.stream(events, redeem, WITHDRAWAL)
+
+    def interest(self, interval, rates, start=None, until=None):
+        # rates(now) returns one percentage per vault for the elapsed interval
+        def accrue(now):
+            for vault, percent in zip(self.vaults, rates(now)):
+                vault.earn_interest(percent)
+
+        self.scheduler.every(interval, accrue, start, until, INTEREST)
+
+    def continuous_interest(self, percent, period=DAY):
+        # constant percent per period for each vault, accrued in closed form
+        # whenever the clock moves, so no interest events are queued at all
+        percent = np.broadcast_to(np.asarray(percent, dtype=float), len(self.vaults))
+
+        def accrue(start, end):
+            growth = (1 + percent / 100) ** ((end - start) / period)
+            for vault, factor in zip(self.vaults, growth.tolist()):
+                vault.totalAssets *= factor
+
+        self.scheduler.on_advance(accrue)
+
+    def rebalance(self, interval, method="smart_rebalance", cost=0, start=None):
+        rebalance = getattr(self.fund, method)
+        self.scheduler.every(
+            interval, lambda now: rebalance(cost), start, priority=REBALANCE
+        )
+
+    def rebalance_on_cash(self, band, method="smart_rebalance", cost=0, cooldown=0):
+        # rebalance once idle cash exceeds the reserve ratio by `band` percent
+        fund = self.fund
+        rebalance = getattr(fund, method)
+
+        def over_band():
+            limit = fund.totalAssets * (fund.reserveRatio + band) / 100
+            return fund.cash > limit
+
+        self.scheduler.when(over_band, lambda now: rebalance(cost), cooldown)
+
+    def run(self, until=None):
+        return self.scheduler.run(until)
@@ -1,9 +1,19 @@
+import random
+
 from src.components import ERC4626, Portal
 
 USDC = "USDC"
 
+PROTOCOLS = [
+    {"name": "Centrifuge", "vaults": 3, "ratios": [40, 30, 30]},
+    {"name": "Morpho", "vaults": 2, "ratios": [60, 40]},
+    {"name": "Yearn", "vaults": 2, "ratios": [50, 50]},
+]
+
 
-def initialize_vaults(protocols):
+def initialize_vaults(
+    protocols, rng=random, store=None, vault_cls=ERC4626, balances=None
+):
     vaults = []
     for protocol in protocols:
         protocol_name = protocol["name"]
@@ -11,8 +21,15 @@ def initialize_vaults(protocols):
 
         for i in range(num_vaults):
             vault_name = f"{protocol_name} Vault {chr(65 + i)}"  # A, B, C, ...
-            vault = ERC4626(vault_name, USDC, 0, 0)
-            vault.seed()
+            if store is None:
+                vault = vault_cls(vault_name, USDC, 0, 0)
+            else:
+                vault = store.vault(store.add(vault_name, USDC, 0, 0))
+            if balances is not None and vault_name in balances:
+                # recorded (totalAssets, totalShares), see src/replay.py
+                vault.totalAssets, vault.totalShares = balances[vault_name]
+            else:
+                vault.seed(rng)
             vaults.append(vault)
 
     return vaults
@@ -45,3 +62,30 @@ def create_portal(vaults, name, ratios):
         portal.add_vault(vault, ratio)
 
     return portal
+
+
+def daily_draws(rng, num_vaults, deposit_range=(1_000, 100_000)):
+    daily_deposit = rng.randint(*deposit_range)
+    daily_interest = [rng.randint(1, 10) / 365 / 10 for _ in range(num_vaults)]
+    return daily_deposit, daily_interest
+
+
+def run_simulation(funds, strategies, costs, days, rng=random, on_step=None):
+    vaults = list(funds[0].sub_vaults)
+
+    for day in range(days):
+        daily_deposit, daily_interest = daily_draws(rng, len(vaults))
+
+        for fund in funds:
+            fund.deposit(daily_deposit)
+
+        for fund, strategy, cost in zip(funds, strategies, costs):
+            getattr(fund, f"{strategy}_rebalance")(cost)
+
+        for vault, interest in zip(vaults, daily_interest):
+            vault.earn_interest(interest)
+
+        if on_step is not None:
+            on_step(day)
+
+    return funds
@@ -0,0 +1,204 @@
+import numpy as np
+
+from src.accrual import tree
+from src.components import ERC4626
+
+
+##################   LAYOUT   ####################
+##################################################
+
+# Flattens the state of one or more Fund trees into a float64 buffer:
+#   leaf vaults  totalAssets, totalShares
+#   portals      totalAssets, totalShares, cash, cached invested sum, cost_paid
+#   positions    shares, cached value, dirty flag (sub_vaults order)
+# The layout is computed once per tree, so capture and restore are a single
+# pass over the objects. Vaults shared between funds appear once. Horizon
+# planners do not fit a fixed buffer; each portal's planner, its day and its
+# current plan (never changed in place) are kept by reference beside it.
+
+
+class Layout:
+    def __init__(self, roots):
+        roots = [roots] if isinstance(roots, ERC4626) else list(roots)
+        self.portals, self.leaves, seen = [], [], set()
+        for root in roots:
+            portals, leaves = tree(root)
+            self.portals += [p for p in portals if p not in seen]
+            self.leaves += [v for v in leaves if v not in seen]
+            seen.update(portals, leaves)
+
+        self.positions = [len(portal.sub_vaults) for portal in self.portals]
+        self.size = (
+            2 * len(self.leaves) + 5 * len(self.portals) + 3 * sum(self.positions)
+        )
+
+    def _check(self):
+        for portal, count in zip(self.portals, self.positions):
+            if len(portal.sub_vaults) != count:
+                raise ValueError("Tree changed since the layout was built")
+
+    def capture(self, rng=None):
+        self._check()
+        values = []
+        for vault in self.leaves:
+            values += [vault.totalAssets, vault.totalShares]
+        for portal in self.portals:
+            values += [portal.totalAssets, portal.totalShares]
+            values += [portal.cash, portal._invested, portal.cost_paid]
+            for vault, data in portal.sub_vaults.items():
+                dirty = portal._stale(vault)
+                values += [data["shares"], portal._values[vault], dirty]
+
+        buffer = np.array(values, dtype=float)
+        return Snapshot(self, buffer, rng_state(rng), self.planners())
+
+    def planners(self):
+        return [
+            (
+                (p.planner, p.planner.day, p.planner.plan)
+                if p.planner is not None
+                else None
+            )
+            for p in self.portals
+        ]
+
+    def restore(self, snapshot, rng=None):
+        self._check()
+        if snapshot.layout is not self:
+            raise ValueError("Snapshot was taken with a different layout")
+
+        values = iter(snapshot.buffer.tolist())
+        for vault in self.leaves:
+            vault.totalAssets = next(values)
+            vault.totalShares = next(values)
+        for portal in self.portals:
+            portal.totalAssets = next(values)
+            portal.totalShares = next(values)
+            portal.cash = next(values)
+            portal._invested = next(values)
+            portal.cost_paid = next(values)
+            dirty = {}
+            for vault, data in portal.sub_vaults.items():
+                data["shares"] = next(values)
+                portal._values[vault] = next(values)
+                if next(values):
+                    dirty[vault] = None
+                else:
+                    vault._hold(portal)
+            portal._dirty = dirty
+
+        if snapshot.planners is not None:
+            for portal, state in zip(self.portals, snapshot.planners):
+                if state is None:
+                    portal.planner = None
+                    continue
+                planner, planner.day, planner.plan = state
+                portal.planner = planner
+        set_rng_state(rng, snapshot.rng_state)
+
+
+def rng_state(rng):
+    if rng is None:
+        return None
+    if isinstance(rng, np.random.Generator):
+        return rng.bit_generator.state
+    return rng.getstate()
+
+
+def set_rng_state(rng, state):
+    if rng is None or state is None:
+        return
+    if isinstance(rng, np.random.Generator):
+        rng.bit_generator.state = state
+    else:
+        rng.setstate(state)
+
+
+class Snapshot:
+    def __init__(self, layout, buffer, rng_state=None, planners=None):
+        self.layout = layout
+        self.buffer = buffer
+        self.rng_state = rng_state
+        self.planners = planners  # None leaves the planners as they are
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes
+
+    def to_bytes(self):
+        return self.buffer.astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, layout, data, rng_state=None, planners=None):
+        buffer = np.frombuffer(data, dtype="<f8").astype(float)
+        if len(buffer) != layout.size:
+            raise ValueError("Buffer does not match the layout")
+        return cls(layout, buffer, rng_state, planners)
+
+
+##################   BRANCHES   ##################
+##################################################
+
+# There is one set of live objects, so branches run one at a time from the
+# checkpoint: restore, run, and keep only the entries of the buffer that the
+# branch changed (or the whole buffer when that is smaller). Hundreds of
+# branches then cost their diffs, not a copy of the tree each, and any
+# branch's end state can be restored later.
+
+
+class Branch:
+    def __init__(self, name, indices, values, rng_state, planners, result=None):
+        self.name = name
+        self.indices = indices  # None when values is the whole buffer
+        self.values = values
+        self.rng_state = rng_state
+        self.planners = planners
+        self.result = result
+
+    @property
+    def nbytes(self):
+        indices = 0 if self.indices is None else self.indices.nbytes
+        return indices + self.values.nbytes
+
+
+class Checkpoint:
+    def __init__(self, roots, rng=None, layout=None):
+        self.layout = Layout(roots) if layout is None else layout
+        self.rng = rng
+        self.base = self.layout.capture(rng)
+        self.branches = {}
+
+    def restore(self, branch=None):
+        if isinstance(branch, str):
+            branch = self.branches[branch]
+        if branch is None:
+            self.layout.restore(self.base, self.rng)
+            return
+
+        if branch.indices is None:
+            buffer = branch.values
+        else:
+            buffer = self.base.buffer.copy()
+            buffer[branch.indices] = branch.values
+        snapshot = Snapshot(self.layout, buffer, branch.rng_state, branch.planners)
+        self.layout.restore(snapshot, self.rng)
+
+    def branch(self, name, run, *args):
+        # run(*args) advances the live objects; its return value is kept
+        self.restore()
+        result = run(*args)
+
+        end = self.layout.capture(self.rng)
+        changed = np.flatnonzero(end.buffer != self.base.buffer).astype(np.int32)
+        if changed.nbytes + 8 * len(changed) < end.nbytes:
+            indices, values = changed, end.buffer[changed]
+        else:
+            indices, values = None, end.buffer
+        branch = Branch(name, indices, values, end.rng_state, end.planners, result)
+        self.branches[name] = branch
+        self.restore()
+        return branch
+
+    @property
+    def nbytes(self):
+        return self.base.nbytes + sum(b.nbytes for b in self.branches.values())
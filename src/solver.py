@@ -0,0 +1,185 @@
+import numpy as np
+
+from src.components import Portal
+from src.costs import leg_cost
+
+
+##################   SETTLEMENT   ################
+##################################################
+
+
+class Settlement:
+    def __init__(
+        self, net, gross, legs, independent_legs, transaction_cost, independent_cost
+    ):
+        self.net = net  # {vault: net assets in (+) or out (-)}
+        self.gross = gross  # {vault: sum of |assets| over the funds' legs}
+        self.legs = legs
+        self.independent_legs = independent_legs
+        self.transaction_cost = transaction_cost
+        # what the funds would have paid executing their legs one by one
+        self.independent_cost = independent_cost
+
+    @property
+    def saved(self):
+        return self.independent_cost - self.transaction_cost
+
+    def __repr__(self):
+        return (
+            f"Settlement(legs={self.legs}, independent_legs={self.independent_legs}, "
+            f"saved={self.saved:,.2f})"
+        )
+
+
+###################   SOLVER   ###################
+##################################################
+
+# Collects the legs many funds plan for a step, nets them per vault and sends
+# only the net leg to each vault. Funds crossing in the same vault trade with
+# each other at the vault's share price, so the vault only sees the remainder.
+# Legs are kept as (fund id, vault id, assets) arrays and aggregated with
+# bincount, so netting is linear in the number of legs. Positions are settled
+# in the vault's own asset, so funds with a price oracle and nested portals,
+# which trade through swaps and Portal.withdraw, are not accepted.
+
+
+class Solver:
+    def __init__(self, cost=0, tolerance=1e-9):
+        self.cost = cost  # per net leg sent to a vault, flat or a cost model
+        self.tolerance = tolerance
+        self.funds = []
+        self.vaults = []
+        self._fund_index = {}
+        self._vault_index = {}
+        self._fund_ids = []
+        self._vault_ids = []
+        self._amounts = []
+
+    def __len__(self):
+        return len(self._amounts)
+
+    def _index(self, index, items, item):
+        if item not in index:
+            index[item] = len(items)
+            items.append(item)
+        return index[item]
+
+    def add(self, fund, vault, assets):
+        # assets > 0 invests cash into the vault, assets < 0 exits the position
+        if vault not in fund.sub_vaults:
+            raise ValueError("Vault not found in investments")
+        if fund.oracle is not None:
+            raise ValueError("Multi-asset funds are not supported by the solver")
+        if isinstance(vault, Portal):
+            raise ValueError("Nested portals are not supported by the solver")
+        self._fund_ids.append(self._index(self._fund_index, self.funds, fund))
+        self._vault_ids.append(self._index(self._vault_index, self.vaults, vault))
+        self._amounts.append(assets)
+
+    def plan(self, fund, method="smart_rebalance", *args, trim=True):
+        # runs the rebalance inside a batch that is never committed, so the
+        # legs are recorded without touching the fund or its vaults; the
+        # rebalances only invest cash, so with trim the over-weight positions
+        # are also sold back to their targets
+        batch = fund.batch()
+        try:
+            getattr(fund, method)(0, *args)
+        finally:
+            legs = batch.cancel()
+
+        for vault, (assets, cost) in legs.items():
+            self.add(fund, vault, assets)
+        if trim:
+            for vault, assets in self.overweight(fund).items():
+                self.add(fund, vault, -assets)
+        return legs
+
+    def plan_all(self, funds, method="smart_rebalance", *args, trim=True):
+        for fund in funds:
+            self.plan(fund, method, *args, trim=trim)
+
+    @staticmethod
+    def overweight(fund):
+        # assets above the target of each position that is over it by more
+        # than maxDelta percent of totalAssets, the band smart_rebalance uses
+        excess = {}
+        for vault, data in fund.sub_vaults.items():
+            target = fund.totalAssets * data["ratio"] / 100
+            delta = fund.value_position(vault) - target
+            if delta > 0 and delta > fund.totalAssets * fund.maxDelta / 100:
+                excess[vault] = delta
+        return excess
+
+    def clear(self):
+        self._fund_ids, self._vault_ids, self._amounts = [], [], []
+
+    def net(self):
+        vault_ids = np.asarray(self._vault_ids, dtype=np.int64)
+        amounts = np.asarray(self._amounts, dtype=float)
+        n = len(self.vaults)
+        net = np.bincount(vault_ids, weights=amounts, minlength=n)
+        gross = np.bincount(vault_ids, weights=np.abs(amounts), minlength=n)
+        return net, gross
+
+    def execute(self):
+        fund_ids = np.asarray(self._fund_ids, dtype=np.int64)
+        vault_ids = np.asarray(self._vault_ids, dtype=np.int64)
+        amounts = np.asarray(self._amounts, dtype=float)
+        net, gross = self.net()
+
+        # one leg per vault whose flows do not cancel out, its cost split over
+        # the funds trading in that vault by gross amount
+        trades = np.abs(net) > self.tolerance * np.maximum(gross, 1)
+        leg_costs = np.zeros(len(self.vaults))
+        for v in np.flatnonzero(trades).tolist():
+            leg_costs[v] = leg_cost(self.cost, self.vaults[v], abs(net[v]))
+        safe = np.where(gross > 0, gross, 1)
+        costs = leg_costs[vault_ids] * np.abs(amounts) / safe[vault_ids]
+
+        # merge repeated (fund, vault) legs into one position change each
+        pair_ids = fund_ids * len(self.vaults) + vault_ids
+        keys, inverse = np.unique(pair_ids, return_inverse=True)
+        assets = np.bincount(inverse, weights=amounts, minlength=len(keys))
+        charged = np.bincount(inverse, weights=costs, minlength=len(keys))
+        pairs = [divmod(int(key), len(self.vaults)) for key in keys.tolist()]
+
+        # price every leg before any vault moves, then check exits are covered
+        changes = []
+        independent_cost = 0
+        for (f, v), a, c in zip(pairs, assets.tolist(), charged.tolist()):
+            fund, vault = self.funds[f], self.vaults[v]
+            shares = vault.convert_to_shares(a - c)
+            if fund.sub_vaults[vault]["shares"] + shares < -self.tolerance:
+                raise ValueError("Insufficient shares")
+            changes.append((fund, vault, a, c, shares))
+            independent_cost += leg_cost(self.cost, vault, abs(a))
+
+        for v in np.flatnonzero(trades).tolist():
+            vault = self.vaults[v]
+            remainder = net[v] - leg_costs[v]
+            if remainder > 0:
+                vault.deposit(remainder)
+            elif remainder < 0:
+                vault.withdraw(vault.convert_to_shares(-remainder))
+
+        touched = {}
+        for fund, vault, a, c, shares in changes:
+            data = fund.sub_vaults[vault]
+            data["shares"] = max(0, data["shares"] + shares)
+            fund._dirty[vault] = None
+            fund.cash -= a
+            fund.cost_paid += c
+            touched[fund] = None
+        for fund in touched:
+            fund.update_total_assets()
+
+        settlement = Settlement(
+            {self.vaults[v]: net[v] for v in range(len(self.vaults))},
+            {self.vaults[v]: gross[v] for v in range(len(self.vaults))},
+            int(trades.sum()),
+            len(keys),
+            float(leg_costs.sum()),
+            independent_cost,
+        )
+        self.clear()
+        return settlement
@@ -0,0 +1,180 @@
+import numpy as np
+
+from src.components import ERC4626
+
+
+##################   VAULT STORE   ################
+##################################################
+
+# Struct-of-arrays registry for large vault universes. Totals live in float64
+# arrays indexed by integer vault id and names are packed into one byte buffer,
+# so a vault costs a few dozen bytes instead of a Python object. Portals and
+# Funds hold StoredVault views, created on demand, which behave like ERC4626.
+
+
+class VaultStore:
+    def __init__(self, capacity=1024):
+        capacity = max(1, capacity)
+        self.size = 0
+        self.totalAssets = np.zeros(capacity)
+        self.totalShares = np.zeros(capacity)
+        self.asset_codes = np.zeros(capacity, dtype=np.uint8)
+        self.versions = np.zeros(capacity, dtype=np.int64)  # see ERC4626._version
+        self.holders = {}  # vault id -> ERC4626._holders, for held vaults only
+        self.name_offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._names = bytearray()
+        self._assets = []
+        self._asset_index = {}
+        self._name_index = None
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self, needed):
+        capacity = len(self.totalAssets)
+        if needed <= capacity:
+            return
+
+        while capacity < needed:
+            capacity *= 2
+
+        for field in ["totalAssets", "totalShares", "asset_codes", "versions"]:
+            array = getattr(self, field)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[: self.size] = array[: self.size]
+            setattr(self, field, grown)
+
+        offsets = np.zeros(capacity + 1, dtype=np.int64)
+        offsets[: self.size + 1] = self.name_offsets[: self.size + 1]
+        self.name_offsets = offsets
+
+    def _asset_code(self, depositAsset):
+        if depositAsset not in self._asset_index:
+            if len(self._assets) == 256:
+                raise ValueError("Too many deposit assets")
+            self._asset_index[depositAsset] = len(self._assets)
+            self._assets.append(depositAsset)
+        return self._asset_index[depositAsset]
+
+    def add(self, name, depositAsset, totalShares, totalAssets):
+        ids = self.extend([name], depositAsset, [totalShares], [totalAssets])
+        return int(ids[0])
+
+    def extend(self, names, depositAsset, totalShares, totalAssets):
+        names = [name.encode() for name in names]
+        start, count = self.size, len(names)
+        self._grow(start + count)
+
+        ids = np.arange(start, start + count)
+        self.totalShares[ids] = totalShares
+        self.totalAssets[ids] = totalAssets
+        self.asset_codes[ids] = self._asset_code(depositAsset)
+
+        lengths = np.fromiter((len(name) for name in names), np.int64, count)
+        self.name_offsets[start + 1 : start + count + 1] = self.name_offsets[
+            start
+        ] + np.cumsum(lengths)
+        self._names += b"".join(names)
+
+        self.size += count
+        self._name_index = None
+        return ids
+
+    def name(self, vault_id):
+        start, end = self.name_offsets[vault_id], self.name_offsets[vault_id + 1]
+        return self._names[start:end].decode()
+
+    def deposit_asset(self, vault_id):
+        return self._assets[self.asset_codes[vault_id]]
+
+    def find(self, name):
+        # the name index is only built when a lookup needs it
+        if self._name_index is None:
+            self._name_index = {self.name(i): i for i in range(self.size)}
+        return self._name_index[name]
+
+    def vault(self, vault_id):
+        if not 0 <= vault_id < self.size:
+            raise IndexError("Vault id out of range")
+        return StoredVault(self, int(vault_id))
+
+    def vaults(self, ids=None):
+        ids = range(self.size) if ids is None else ids
+        return [self.vault(vault_id) for vault_id in ids]
+
+    def touch(self, ids):
+        self.versions[ids] += 1
+        if not self.holders:
+            return
+
+        if np.ndim(ids) == 0 and not isinstance(ids, slice):
+            changed = [int(ids)] if int(ids) in self.holders else []
+        else:
+            touched = np.zeros(self.size, dtype=bool)
+            touched[ids] = True
+            changed = [i for i in self.holders if touched[i]]
+
+        for vault_id in changed:
+            vault = StoredVault(self, vault_id)
+            for portal in self.holders.pop(vault_id):
+                portal._dirty[vault] = None
+
+    def earn_interest(self, percent, ids=None):
+        ids = slice(0, self.size) if ids is None else np.asarray(ids)
+        assets = self.totalAssets[ids]
+        self.totalAssets[ids] = assets + assets * np.asarray(percent) / 100
+        self.touch(ids)
+
+
+class StoredVault(ERC4626):
+    __slots__ = ("store", "id")
+
+    def __init__(self, store, vault_id):
+        self.store = store
+        self.id = vault_id
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, StoredVault)
+            and other.store is self.store
+            and other.id == self.id
+        )
+
+    def __hash__(self):
+        return hash((id(self.store), self.id))
+
+    def __repr__(self):
+        return f"StoredVault({self.id}, {self.name!r})"
+
+    @property
+    def name(self):
+        return self.store.name(self.id)
+
+    @property
+    def depositAsset(self):
+        return self.store.deposit_asset(self.id)
+
+    @property
+    def totalAssets(self):
+        return float(self.store.totalAssets[self.id])
+
+    @totalAssets.setter
+    def totalAssets(self, value):
+        self.store.totalAssets[self.id] = value
+        self.store.touch(self.id)
+
+    @property
+    def totalShares(self):
+        return float(self.store.totalShares[self.id])
+
+    @totalShares.setter
+    def totalShares(self, value):
+        self.store.totalShares[self.id] = value
+        self.store.touch(self.id)
+
+    @property
+    def _version(self):
+        return int(self.store.versions[self.id])
+
+    def _hold(self, portal):
+        self.store.holders.setdefault(self.id, {})[portal] = None
@@ -0,0 +1,179 @@
+import numpy as np
+
+
+##################   YIELD STATS   ###############
+##################################################
+
+# Exponentially weighted mean and variance of each vault's realised return
+# per update, read from the change in price per share (so deposits and
+# withdrawals do not count as yield). Each update is O(1) per vault and works
+# on arrays, so thousands of vaults cost one pass of numpy per step.
+
+
+class YieldStats:
+    def __init__(self, vaults, halflife=30, prices=None):
+        self.vaults = list(vaults)
+        self.halflife = halflife
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+        self.last = self.prices() if prices is None else np.asarray(prices, float)
+        self.mean = np.zeros(len(self.vaults))
+        self.var = np.zeros(len(self.vaults))
+        self.count = 0
+
+    def prices(self):
+        # price per share of every vault; pass arrays to update() instead when
+        # the totals already live in arrays (VaultStore, VectorEngine)
+        return np.array(
+            [
+                vault.totalAssets / vault.totalShares if vault.totalShares > 0 else 1.0
+                for vault in self.vaults
+            ]
+        )
+
+    def update(self, prices=None):
+        prices = self.prices() if prices is None else np.asarray(prices, float)
+        last = np.where(self.last > 0, self.last, 1)
+        returns = np.where(self.last > 0, prices / last - 1, 0)
+        self.last = prices
+
+        if self.count == 0:
+            self.mean = returns.astype(float)
+        else:
+            diff = returns - self.mean
+            self.mean = self.mean + self.alpha * diff
+            self.var = (1 - self.alpha) * (self.var + self.alpha * diff * diff)
+        self.count += 1
+        return returns
+
+    @property
+    def volatility(self):
+        return np.sqrt(self.var)
+
+    def sharpe(self, risk_free=0.0):
+        excess = self.mean - risk_free
+        vol = self.volatility
+        safe = np.where(vol > 0, vol, 1)
+        return np.where(vol > 0, excess / safe, np.sign(excess) * np.inf)
+
+
+###################   RULES   ####################
+##################################################
+
+# A rule turns the statistics into non-negative weights per vault; the
+# allocation scales them to the fund's ratio budget.
+
+
+class YieldWeighted:
+    def __init__(self, power=1.0):
+        self.power = power
+
+    def weights(self, stats):
+        return np.maximum(stats.mean, 0) ** self.power
+
+
+class SharpeWeighted:
+    def __init__(self, risk_free=0.0, cap=1e6):
+        self.risk_free = risk_free
+        self.cap = cap  # riskless vaults would otherwise take everything
+
+    def weights(self, stats):
+        return np.clip(stats.sharpe(self.risk_free), 0, self.cap)
+
+
+class InverseVariance:
+    def __init__(self, floor=1e-12):
+        self.floor = floor
+
+    def weights(self, stats):
+        return 1 / np.maximum(stats.var, self.floor)
+
+
+class TopK:
+    # equal weights on the k best vaults by another rule's weights
+    def __init__(self, k, rule=None):
+        self.k = k
+        self.rule = YieldWeighted() if rule is None else rule
+
+    def weights(self, stats):
+        scores = self.rule.weights(stats)
+        weights = np.zeros(len(scores))
+        best = np.argsort(-scores, kind="stable")[: self.k]
+        weights[best[scores[best] > 0]] = 1
+        return weights
+
+
+#################   ALLOCATION   #################
+##################################################
+
+
+def target_ratios(weights, total, min_ratio=0.0, current=None, max_change=None):
+    # scale weights to sum to `total`, keep every vault at min_ratio or more and
+    # move each ratio at most max_change from current
+    weights = np.asarray(weights, dtype=float)
+    n = len(weights)
+    if weights.sum() <= 0 or not np.all(np.isfinite(weights)):
+        return None
+
+    spare = total - min_ratio * n
+    if spare < 0:
+        raise ValueError("min_ratio is more than the ratio budget")
+    ratios = min_ratio + spare * weights / weights.sum()
+
+    if max_change is not None and current is not None:
+        current = np.asarray(current, dtype=float)
+        step = np.clip(ratios - current, -max_change, max_change)
+        # scale the moves so the ratios still add up to the same total
+        up, down = step[step > 0].sum(), -step[step < 0].sum()
+        if up > down:
+            step[step > 0] *= down / up
+        elif down > up:
+            step[step < 0] *= up / down
+        ratios = current + step
+    return ratios
+
+
+class DynamicAllocation:
+    # Recomputes a fund's target ratios from rolling yield statistics. Call
+    # update() once per step (e.g. as run_simulation's on_step); the fund's
+    # rebalances then steer cash towards the new targets.
+    def __init__(
+        self,
+        fund,
+        rule,
+        halflife=30,
+        min_periods=7,
+        every=1,
+        min_ratio=0.0,
+        max_change=None,
+    ):
+        self.fund = fund
+        self.rule = rule
+        self.vaults = list(fund.sub_vaults)
+        self.stats = YieldStats(self.vaults, halflife)
+        self.min_periods = min_periods
+        self.every = every
+        self.min_ratio = min_ratio
+        self.max_change = max_change
+        self.total = sum(data["ratio"] for data in fund.sub_vaults.values())
+
+    def ratios(self):
+        return np.array([self.fund.sub_vaults[v]["ratio"] for v in self.vaults])
+
+    def update(self, step=None, prices=None):
+        self.stats.update(prices)
+        if self.stats.count < self.min_periods or self.stats.count % self.every:
+            return None
+
+        ratios = target_ratios(
+            self.rule.weights(self.stats),
+            self.total,
+            self.min_ratio,
+            self.ratios(),
+            self.max_change,
+        )
+        if ratios is None:
+            return None
+
+        for vault, ratio in zip(self.vaults, ratios.tolist()):
+            self.fund.sub_vaults[vault]["ratio"] = ratio
+        return ratios
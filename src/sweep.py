@@ -0,0 +1,217 @@
+import argparse
+import csv
+import hashlib
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.components import Fund
+from src.engine import VectorEngine
+from src.simulation import PROTOCOLS, USDC, daily_draws, initialize_vaults
+from src.yieldstore import YieldStore
+
+FIELDS = [
+    "run",
+    "strategy",
+    "reserveRatio",
+    "maxDelta",
+    "transaction_cost",
+    "seed",
+    "totalAssets",
+    "cash_drag",
+    "cost_paid",
+]
+
+
+#################   PARAMETERS   #################
+##################################################
+
+
+def parse_range(text):
+    if ":" in text:
+        start, stop, step = (float(x) for x in text.split(":"))
+        if step <= 0:
+            raise ValueError("Range step must be positive")
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 12) for i in range(count)]
+
+    return [float(x) for x in text.split(",")]
+
+
+def run_key(strategy, reserve_ratio, max_delta, transaction_cost):
+    # repr keeps every digit, so distinct grid values never share a key or seed
+    values = (float(x) for x in (reserve_ratio, max_delta, transaction_cost))
+    return "{}-rr{!r}-md{!r}-tc{!r}".format(strategy, *values)
+
+
+def run_seed(base_seed, key):
+    # keyed on the run rather than the worker, so results do not depend on scheduling
+    digest = hashlib.sha256(f"{base_seed}:{key}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def grid(
+    reserve_ratios,
+    max_deltas,
+    transaction_costs,
+    strategies=("smart", "simple"),
+    base_seed=42,
+):
+    runs = []
+    for strategy, reserve_ratio, max_delta, transaction_cost in itertools.product(
+        strategies, reserve_ratios, max_deltas, transaction_costs
+    ):
+        key = run_key(strategy, reserve_ratio, max_delta, transaction_cost)
+        runs.append(
+            {
+                "run": key,
+                "strategy": strategy,
+                "reserveRatio": reserve_ratio,
+                "maxDelta": max_delta,
+                "transaction_cost": transaction_cost,
+                "seed": run_seed(base_seed, key),
+            }
+        )
+
+    return runs
+
+
+###################   RUNNER   ###################
+##################################################
+
+
+def run(params, days, protocols=PROTOCOLS, yields=None):
+    rng = random.Random(params["seed"])
+    vaults = initialize_vaults(protocols, rng)
+
+    fund = Fund(params["run"], USDC, 0, 0, params["reserveRatio"], params["maxDelta"])
+    for vault, ratio in zip(vaults, protocols[0]["ratios"]):
+        fund.add_vault(vault, ratio)
+    fund.deposit(1000)
+    fund.simple_rebalance()
+
+    engine = VectorEngine.from_funds(
+        [fund], [params["strategy"]], [params["transaction_cost"]]
+    )
+
+    if yields is not None:
+        # recorded rates from a YieldStore in place of the random draws
+        if yields.days < days:
+            raise ValueError(f"Yield store has {yields.days} days, need {days}")
+        # a run of adjacent columns is a view of the map; any other order is
+        # gathered once here rather than copied out of every day's row
+        columns = yields.ids([vault.name for vault in engine.vaults])
+        start, stop = columns[0], columns[0] + len(columns)
+        if columns == list(range(start, stop)):
+            rates = yields.matrix()[:days, start:stop]
+        else:
+            rates = yields.matrix()[:days, columns]
+
+    idle_cash = 0
+    for day in range(days):
+        daily_deposit, daily_interest = daily_draws(rng, engine.num_vaults)
+        if yields is not None:
+            daily_interest = rates[day]
+        engine.step(daily_deposit, daily_interest)
+        idle_cash += engine.cash[0] / engine.totalAssets[0]
+
+    row = dict(params)
+    row["totalAssets"] = float(engine.totalAssets[0])
+    row["cash_drag"] = idle_cash / days if days else 0
+    row["cost_paid"] = float(engine.cost_paid[0])
+    return row
+
+
+def run_shard(shard, days, protocols=PROTOCOLS, yields=None):
+    # workers get the store's path and map it read-only themselves
+    store = None if yields is None else YieldStore(yields)
+    return [run(params, days, protocols, store) for params in shard]
+
+
+def completed_runs(path):
+    if not os.path.exists(path):
+        return set()
+
+    # drop a partially written last line left behind by a crash
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    with open(path, newline="") as f:
+        return {row["run"] for row in csv.DictReader(f) if row.get("cost_paid")}
+
+
+def sweep(
+    runs,
+    days,
+    output,
+    workers=None,
+    shard_size=4,
+    protocols=PROTOCOLS,
+    yields=None,
+):
+    done = completed_runs(output)
+    pending = [params for params in runs if params["run"] not in done]
+    shards = [pending[i : i + shard_size] for i in range(0, len(pending), shard_size)]
+
+    new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+    with open(output, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if new_file:
+            writer.writeheader()
+            f.flush()
+
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [
+                pool.submit(run_shard, shard, days, protocols, yields)
+                for shard in shards
+            ]
+            for future in as_completed(futures):
+                writer.writerows(future.result())
+                f.flush()
+
+    return len(pending)
+
+
+#####################   CLI   ####################
+##################################################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sweep reserveRatio, maxDelta and transaction cost"
+    )
+    parser.add_argument("--reserve-ratio", type=parse_range, default=[10.0])
+    parser.add_argument("--max-delta", type=parse_range, default=[1.0])
+    parser.add_argument("--cost", type=parse_range, default=[0.005811])
+    parser.add_argument("--strategies", default="smart,simple")
+    parser.add_argument("--days", type=int, default=365 * 5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=4)
+    parser.add_argument("--output", default="sweep.csv")
+    parser.add_argument("--yields", help="YieldStore directory of recorded rates")
+    args = parser.parse_args(argv)
+
+    runs = grid(
+        args.reserve_ratio,
+        args.max_delta,
+        args.cost,
+        args.strategies.split(","),
+        args.seed,
+    )
+    count = sweep(
+        runs,
+        args.days,
+        args.output,
+        args.workers,
+        args.shard_size,
+        yields=args.yields,
+    )
+    print(f"{count} of {len(runs)} runs completed, results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
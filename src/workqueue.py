@@ -0,0 +1,405 @@
+import argparse
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import statistics
+import time
+import traceback
+
+from src.simulation import PROTOCOLS
+from src.sweep import FIELDS, grid, parse_range, run_seed, run_shard
+
+METRICS = ("totalAssets", "cash_drag", "cost_paid")
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE,
+    payload TEXT,
+    status TEXT DEFAULT 'pending',
+    attempts INTEGER DEFAULT 0,
+    worker TEXT,
+    leased_until REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run TEXT PRIMARY KEY,
+    task TEXT,
+    row TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+##################   TASKS   #####################
+##################################################
+
+
+def expand_paths(runs, paths, base_seed=42):
+    # one run per Monte Carlo path of each grid point, each with its own seed
+    if paths <= 1:
+        return [dict(params, config=params["run"], path=0) for params in runs]
+
+    expanded = []
+    for params in runs:
+        for path in range(paths):
+            key = f"{params['run']}-p{path}"
+            expanded.append(
+                dict(
+                    params,
+                    run=key,
+                    config=params["run"],
+                    path=path,
+                    seed=run_seed(base_seed, key),
+                )
+            )
+    return expanded
+
+
+def batches(runs, days, batch_size=8, yields=None):
+    # tasks are keyed on their runs, so resubmitting the same grid adds nothing
+    tasks = []
+    for i in range(0, len(runs), batch_size):
+        batch = runs[i : i + batch_size]
+        key = f"{batch[0]['run']}..{batch[-1]['run']}#{len(batch)}"
+        tasks.append((key, {"runs": batch, "days": days, "yields": yields}))
+    return tasks
+
+
+##################   QUEUE   #####################
+##################################################
+
+# A SQLite file is the whole coordinator: tasks are claimed under a lease,
+# so a worker that dies only delays its task until the lease runs out. A
+# task whose lease ran out max_attempts times is failed rather than handed
+# out again, and only the worker holding a task's lease can finish it.
+# Results are keyed by run, so a retried task writes each result once. Any
+# number of processes can share the file; hosts can share it on a file
+# system with working locks.
+
+
+class WorkQueue:
+    def __init__(self, path, lease=None, max_attempts=None, timeout=60.0):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.lease = self._setting("lease", lease, 600.0)
+        self.max_attempts = self._setting("max_attempts", max_attempts, 3)
+
+    def _setting(self, name, value, default):
+        # settings given once are kept in the file, so every worker uses them
+        if value is None:
+            return self.meta(name, default)
+        self.set_meta(name, value)
+        return value
+
+    def close(self):
+        self.db.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers never
+        # claim the same task; commits on exit, rolls back on an exception
+        self.db.execute("BEGIN IMMEDIATE")
+        with self.db:
+            yield self.db
+
+    def set_meta(self, name, value):
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, json.dumps(value))
+        )
+
+    def meta(self, name, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,))
+        row = row.fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def submit(self, tasks):
+        added = 0
+        with self._transaction() as db:
+            for key, payload in tasks:
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO tasks (key, payload) VALUES (?, ?)",
+                    (key, json.dumps(payload)),
+                )
+                added += cursor.rowcount
+        return added
+
+    def claim(self, worker):
+        now = time.time()
+        with self._transaction() as db:
+            # a task that keeps killing its workers is not handed out again
+            db.execute(
+                "UPDATE tasks SET status = 'failed', leased_until = NULL, "
+                "error = 'lease expired' WHERE status = 'running' "
+                "AND leased_until < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT id, key, payload FROM tasks WHERE status = 'pending' "
+                "OR (status = 'running' AND leased_until < ?) ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            db.execute(
+                "UPDATE tasks SET status = 'running', attempts = attempts + 1, "
+                "worker = ?, leased_until = ? WHERE id = ?",
+                (worker, now + self.lease, row[0]),
+            )
+        return row[0], row[1], json.loads(row[2])
+
+    def complete(self, task_id, rows, worker):
+        # False if another worker has taken the task over; its rows are dropped
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET status = 'done', leased_until = NULL, error = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (task_id, worker),
+            )
+            if cursor.rowcount == 0:
+                return False
+
+            key = db.execute("SELECT key FROM tasks WHERE id = ?", (task_id,))
+            key = key.fetchone()[0]
+            for row in rows:
+                db.execute(
+                    "INSERT OR IGNORE INTO results VALUES (?, ?, ?)",
+                    (row["run"], key, json.dumps(row)),
+                )
+        return True
+
+    def fail(self, task_id, error, worker):
+        # back to pending for another attempt, or failed for good; False if
+        # another worker has taken the task over
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' "
+                "ELSE 'pending' END, leased_until = NULL, error = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (self.max_attempts, error, task_id, worker),
+            )
+        return cursor.rowcount > 0
+
+    def retry_failed(self):
+        cursor = self.db.execute(
+            "UPDATE tasks SET status = 'pending', attempts = 0 WHERE status = 'failed'"
+        )
+        return cursor.rowcount
+
+    def progress(self):
+        counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+        for status, count in self.db.execute(
+            "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+        ):
+            counts[status] = count
+        counts["tasks"] = sum(counts.values())
+        results = self.db.execute("SELECT COUNT(*) FROM results").fetchone()
+        counts["results"] = results[0]
+        return counts
+
+    def finished(self):
+        counts = self.progress()
+        return counts["pending"] == 0 and counts["running"] == 0
+
+    def results(self):
+        rows = self.db.execute("SELECT row FROM results ORDER BY run")
+        return [json.loads(row[0]) for row in rows]
+
+    def errors(self):
+        return self.db.execute(
+            "SELECT key, attempts, error FROM tasks WHERE error IS NOT NULL"
+        ).fetchall()
+
+
+##################   WORKERS   ###################
+##################################################
+
+
+def run_task(payload, protocols=PROTOCOLS):
+    return run_shard(payload["runs"], payload["days"], protocols, payload["yields"])
+
+
+def work(path, worker=None, poll=1.0, max_tasks=None, task=run_task):
+    # pulls tasks until the queue has none left pending or running; returns
+    # the number of tasks this worker completed
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = WorkQueue(path)
+    protocols = queue.meta("protocols", PROTOCOLS)
+    done = 0
+    try:
+        while max_tasks is None or done < max_tasks:
+            claimed = queue.claim(worker)
+            if claimed is None:
+                if queue.finished():
+                    break
+                time.sleep(poll)  # other workers hold leases that may expire
+                continue
+
+            task_id, key, payload = claimed
+            try:
+                rows = task(payload, protocols)
+            except Exception:
+                queue.fail(task_id, traceback.format_exc(), worker)
+                continue
+            if queue.complete(task_id, rows, worker):
+                done += 1
+    finally:
+        queue.close()
+    return done
+
+
+def run_workers(path, workers=None, poll=1.0):
+    # local worker processes; workers on other hosts run `work` on the same file
+    workers = workers or os.cpu_count()
+    processes = [
+        multiprocessing.Process(target=work, args=(path, None, poll))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+##################   MERGE   #####################
+##################################################
+
+
+def summarize(rows):
+    # mean, spread and range of every metric over the paths of each grid point
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.get("config", row["run"]), []).append(row)
+
+    summary = []
+    for config, members in sorted(groups.items()):
+        first = members[0]
+        entry = {
+            "config": config,
+            "strategy": first["strategy"],
+            "reserveRatio": first["reserveRatio"],
+            "maxDelta": first["maxDelta"],
+            "transaction_cost": first["transaction_cost"],
+            "paths": len(members),
+        }
+        for metric in METRICS:
+            values = [float(member[metric]) for member in members]
+            entry[f"{metric}_mean"] = statistics.fmean(values)
+            entry[f"{metric}_std"] = statistics.pstdev(values)
+            entry[f"{metric}_min"] = min(values)
+            entry[f"{metric}_max"] = max(values)
+        summary.append(entry)
+    return summary
+
+
+def write_csv(path, rows, fields):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def merge(path, output=None, summary_output=None):
+    queue = WorkQueue(path)
+    try:
+        rows = queue.results()
+    finally:
+        queue.close()
+
+    summary = summarize(rows)
+    if output:
+        write_csv(output, rows, FIELDS + ["config", "path"])
+    if summary_output and summary:
+        write_csv(summary_output, summary, list(summary[0]))
+    return rows, summary
+
+
+def format_progress(counts):
+    return (
+        f"{counts['done']}/{counts['tasks']} tasks done, {counts['running']} "
+        f"running, {counts['pending']} pending, {counts['failed']} failed, "
+        f"{counts['results']} results"
+    )
+
+
+#####################   CLI   ####################
+##################################################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep through a SQLite work queue")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="split a grid into queued tasks")
+    submit.add_argument("queue")
+    submit.add_argument("--reserve-ratio", type=parse_range, default=[10.0])
+    submit.add_argument("--max-delta", type=parse_range, default=[1.0])
+    submit.add_argument("--cost", type=parse_range, default=[0.005811])
+    submit.add_argument("--strategies", default="smart,simple")
+    submit.add_argument("--paths", type=int, default=1)
+    submit.add_argument("--days", type=int, default=365 * 5)
+    submit.add_argument("--seed", type=int, default=42)
+    submit.add_argument("--batch-size", type=int, default=8)
+    submit.add_argument("--yields", help="YieldStore directory of recorded rates")
+
+    worker = commands.add_parser("work", help="run queued tasks")
+    worker.add_argument("queue")
+    worker.add_argument("--workers", type=int, default=None)
+    worker.add_argument("--poll", type=float, default=1.0)
+
+    status = commands.add_parser("status", help="show progress and errors")
+    status.add_argument("queue")
+    status.add_argument("--retry", action="store_true", help="requeue failed tasks")
+
+    merged = commands.add_parser("merge", help="write results and summary")
+    merged.add_argument("queue")
+    merged.add_argument("--output", default="sweep.csv")
+    merged.add_argument("--summary", default="summary.csv")
+    args = parser.parse_args(argv)
+
+    if args.command == "submit":
+        runs = grid(
+            args.reserve_ratio,
+            args.max_delta,
+            args.cost,
+            args.strategies.split(","),
+            args.seed,
+        )
+        runs = expand_paths(runs, args.paths, args.seed)
+        queue = WorkQueue(args.queue)
+        queue.set_meta("protocols", PROTOCOLS)
+        added = queue.submit(batches(runs, args.days, args.batch_size, args.yields))
+        print(f"{added} tasks added; {format_progress(queue.progress())}")
+        queue.close()
+
+    elif args.command == "work":
+        run_workers(args.queue, args.workers, args.poll)
+        queue = WorkQueue(args.queue)
+        print(format_progress(queue.progress()))
+        queue.close()
+
+    elif args.command == "status":
+        queue = WorkQueue(args.queue)
+        if args.retry:
+            print(f"{queue.retry_failed()} failed tasks requeued")
+        print(format_progress(queue.progress()))
+        for key, attempts, error in queue.errors():
+            print(f"\n{key} (attempt {attempts}):\n{error}")
+        queue.close()
+
+    else:
+        rows, summary = merge(args.queue, args.output, args.summary)
+        print(f"{len(rows)} results in {args.output}, {len(summary)} in {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
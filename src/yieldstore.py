@@ -0,0 +1,109 @@
+import json
+import numbers
+import os
+
+import numpy as np
+
+DTYPE = "<f8"
+
+
+##################   YIELD STORE   ###############
+##################################################
+
+# Per-vault yield histories (percent per day, as earn_interest takes them) in
+# one raw float64 file, one row per day and one column per vault:
+#
+#   <path>/yields.bin    days x vaults, row-major, appended a day at a time
+#   <path>/index.json    vault names in column order
+#
+# The number of days is read from the file size, so appending days only
+# writes the new rows and never touches the index or the rows before them.
+# Readers map the file read-only; rate(vault, day) is one lookup into the
+# map and day(d) a view of one row, so nothing is loaded up front and every
+# process reading the store shares the same pages.
+
+
+class YieldStore:
+    def __init__(self, path, mode="r"):
+        if mode not in ("r", "a"):
+            raise ValueError("mode must be 'r' or 'a'")
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, "index.json")) as f:
+            self.names = json.load(f)["names"]
+        self.index = {name: j for j, name in enumerate(self.names)}
+        self.num_vaults = len(self.names)
+        self.row_bytes = 8 * self.num_vaults
+
+        if mode == "a":
+            # drop a partial row left by an interrupted append
+            size = os.path.getsize(self._file())
+            if size % self.row_bytes:
+                with open(self._file(), "rb+") as f:
+                    f.truncate(size - size % self.row_bytes)
+        self._map = None
+        self.refresh()
+
+    @classmethod
+    def create(cls, path, names):
+        names = [str(name) for name in names]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate vault names")
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "index.json"), "w") as f:
+            json.dump({"names": names, "dtype": DTYPE}, f)
+        open(os.path.join(path, "yields.bin"), "wb").close()
+        return cls(path, "a")
+
+    def _file(self):
+        return os.path.join(self.path, "yields.bin")
+
+    def refresh(self):
+        # pick up days appended since the store was opened
+        self.days = os.path.getsize(self._file()) // self.row_bytes
+        if self.days == 0:
+            self._map = np.zeros((0, self.num_vaults))
+        elif self._map is None or len(self._map) != self.days:
+            shape = (self.days, self.num_vaults)
+            self._map = np.memmap(self._file(), dtype=DTYPE, mode="r", shape=shape)
+        return self.days
+
+    def append(self, rows):
+        if self.mode != "a":
+            raise ValueError("Store was opened read-only")
+        rows = np.asarray(rows, dtype=DTYPE)
+        if rows.ndim == 1:
+            rows = rows[None, :]
+        if rows.shape[1] != self.num_vaults:
+            raise ValueError("Row length does not match the number of vaults")
+
+        with open(self._file(), "ab") as f:
+            f.write(np.ascontiguousarray(rows).tobytes())
+        return self.refresh()
+
+    #### ACCESS ####
+
+    def column(self, vault):
+        # by name or by id, numpy integers included
+        if isinstance(vault, numbers.Integral):
+            return int(vault)
+        return self.index[vault]
+
+    def ids(self, vaults):
+        return [self.column(v) for v in vaults]
+
+    def matrix(self):
+        return self._map
+
+    def day(self, day):
+        return self._map[day]
+
+    def rate(self, vault, day):
+        return float(self._map[day, self.column(vault)])
+
+    def series(self, vault):
+        return self._map[:, self.column(vault)]
+
+
+def open_yields(path):
+    return YieldStore(path)
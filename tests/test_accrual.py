@@ -0,0 +1,94 @@
+import unittest
+import random
+import numpy as np
+from src.accrual import accrue_tree, tree
+from src.components import ERC4626, Portal, Fund
+from src.engine import VectorEngine
+from src.scheduler import DAY, EventSimulation
+from src.simulation import create_portals, initialize_vaults
+
+USDC = "USDC"
+
+
+class TestAccrual(unittest.TestCase):
+    def setUp(self):
+        self.protocols = [
+            {"name": "Centrifuge", "vaults": 3, "ratios": [40, 30, 30]},
+            {"name": "Morpho", "vaults": 2, "ratios": [60, 40]},
+        ]
+        self.vaults = initialize_vaults(self.protocols, random.Random(1))
+        self.portals = create_portals(self.vaults, self.protocols)
+
+        self.fund = Fund("Fund", USDC, 0, 0, 10)
+        self.fund.add_vault(self.portals["Centrifuge"], 50)
+        self.fund.add_vault(self.portals["Morpho"], 40)
+        self.fund.deposit(1000)
+        self.fund.simple_rebalance()
+        for portal in self.portals.values():
+            portal.simple_rebalance()
+
+    def test_constant_rate_matches_daily_loop(self):
+        vault = ERC4626("Vault", USDC, 100, 100)
+        reference = ERC4626("Vault", USDC, 100, 100)
+        for day in range(365 * 5):
+            reference.earn_interest(0.015)
+
+        vault.accrue(365 * 5, 0.015)
+        self.assertAlmostEqual(vault.totalAssets / reference.totalAssets, 1, places=12)
+
+    def test_schedule_matches_daily_loop(self):
+        rates = np.random.default_rng(0).uniform(0, 0.03, 1000)
+        vault = ERC4626("Vault", USDC, 100, 100)
+        reference = ERC4626("Vault", USDC, 100, 100)
+        for rate in rates:
+            reference.earn_interest(rate)
+
+        vault.accrue(len(rates), rates)
+        self.assertAlmostEqual(vault.totalAssets / reference.totalAssets, 1, places=12)
+
+        with self.assertRaises(ValueError):
+            vault.accrue(10, rates)
+
+    def test_accrue_tree(self):
+        portals, leaves = tree(self.fund)
+        self.assertEqual(leaves, self.vaults)
+        self.assertEqual(portals[-1], self.fund)
+
+        before = [vault.totalAssets for vault in self.vaults]
+        rates = np.tile(np.arange(1, 6) / 100, (30, 1))
+        accrue_tree(self.fund, 30, rates)
+
+        for vault, assets, rate in zip(self.vaults, before, np.arange(1, 6) / 100):
+            self.assertAlmostEqual(vault.totalAssets, assets * (1 + rate / 100) ** 30)
+
+        for portal in portals:
+            self.assertTrue(portal.verify_valuations())
+        self.assertGreater(self.fund.totalAssets, 1000)
+
+    def test_engine_accrue(self):
+        fund = Fund("Flat", USDC, 0, 0, 10)
+        for vault, ratio in zip(self.vaults[:3], [40, 30, 30]):
+            fund.add_vault(vault, ratio)
+        engine = VectorEngine.from_funds([fund], ["simple"], [0])
+        assets = engine.vault_assets.copy()
+
+        engine.accrue(10, np.full((10, 3), 0.1))
+        np.testing.assert_allclose(engine.vault_assets, assets * 1.001**10)
+
+    def test_continuous_interest_in_scheduler(self):
+        fund = Fund("Flat", USDC, 0, 0, 0)
+        vault = ERC4626("Vault", USDC, 100, 100)
+        fund.add_vault(vault, 100)
+
+        simulation = EventSimulation(fund)
+        simulation.continuous_interest(0.02)
+        simulation.deposits([(3 * DAY, 100), (400 * DAY + 7, 100)])
+        simulation.run(1000 * DAY)
+
+        self.assertEqual(simulation.scheduler.processed, 2)
+        self.assertAlmostEqual(vault.totalAssets, 100 * 1.0002**1000)
+        self.assertEqual(fund.cash, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from src.components import Portal
+from benchmarks.run import compare, run
+from benchmarks.trees import build_tree, even_ratios, portals
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_even_ratios(self):
+        for count in [1, 3, 7, 100]:
+            ratios = even_ratios(count)
+            self.assertEqual(len(ratios), count)
+            self.assertEqual(sum(ratios), 100)
+
+    def test_build_tree(self):
+        fund, vaults = build_tree(3, 1)
+        self.assertEqual(len(vaults), 3)
+        self.assertEqual(list(fund.sub_vaults), vaults)
+
+        fund, vaults = build_tree(4, 2)
+        self.assertEqual(len(vaults), 16)
+        self.assertEqual(len(fund.sub_vaults), 4)
+        self.assertEqual(len(portals(fund)), 5)
+
+        fund, vaults = build_tree(2, 4)
+        self.assertEqual(len(portals(fund)), 1 + 2 + 2 + 2)
+        for child in fund.sub_vaults:
+            self.assertIsInstance(child, Portal)
+
+        total = sum(data["ratio"] for data in fund.sub_vaults.values())
+        self.assertAlmostEqual(total, 100 - fund.reserveRatio)
+
+    def test_run_and_compare(self):
+        config = {"width": 2, "depth": 2, "repeat": 5, "days": 5}
+        results = run(config, ["portal_deposit", "day_loop"], rounds=1)
+
+        self.assertEqual(set(results["results"]), {"portal_deposit", "day_loop"})
+        for result in results["results"].values():
+            self.assertGreater(result["ops_per_sec"], 0)
+            self.assertGreaterEqual(result["peak_bytes"], 0)
+
+        slower = {"results": {}}
+        for name, result in results["results"].items():
+            slower["results"][name] = dict(
+                result, ops_per_sec=result["ops_per_sec"] / 2
+            )
+
+        self.assertEqual(compare(results, results), {})
+        self.assertEqual(
+            set(compare(results, slower, 0.1)), {"portal_deposit", "day_loop"}
+        )
+        self.assertEqual(compare(slower, results, 0.1), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 from src.components import ERC4626, Portal, Fund
+from src.costs import AMMCost, FlatCost
 import random
 
 random.seed(42)
@@ -228,5 +229,277 @@ class TestFund(unittest.TestCase):
         print(f"fund3 cash {self.fund3.cash}")
 
 
+class TestValuationCache(unittest.TestCase):
+    def setUp(self):
+        self.vaults = [ERC4626(f"Test Vault {i}", USDC, 0, 0) for i in range(6)]
+        for vault in self.vaults:
+            vault.seed()
+
+        self.portal_a = Portal("Test Portal A", USDC, 0, 0)
+        self.portal_b = Portal("Test Portal B", USDC, 0, 0)
+        for vault in self.vaults[:3]:
+            self.portal_a.add_vault(vault, 30)
+        for vault in self.vaults[3:]:
+            self.portal_b.add_vault(vault, 30)
+
+        self.fund = Fund("Test Fund", USDC, 0, 0, 10)
+        self.fund.add_vault(self.portal_a, 45)
+        self.fund.add_vault(self.portal_b, 45)
+
+    def test_cache_matches_full_recompute(self):
+        rng = random.Random(1)
+        portals = [self.portal_a, self.portal_b]
+
+        for day in range(50):
+            self.fund.deposit(rng.randint(1_000, 100_000))
+            self.fund.simple_rebalance(rng.choice([0, 0.5]))
+            for portal in portals:
+                portal.smart_rebalance()
+            for vault in self.vaults:
+                vault.earn_interest(rng.uniform(0, 1))
+
+            for portal in portals + [self.fund]:
+                portal.update_total_assets()
+                self.assertTrue(portal.verify_valuations())
+                self.assertAlmostEqual(
+                    portal.totalAssets,
+                    portal.value_portal_investments() + portal.cash,
+                    places=6,
+                )
+
+    def test_only_changed_positions_are_revalued(self):
+        self.fund.deposit(1000)
+        self.fund.simple_rebalance()
+        self.portal_a.simple_rebalance()
+        self.portal_b.simple_rebalance()
+        self.portal_a.update_total_assets()
+        self.portal_b.update_total_assets()
+        self.fund.update_total_assets()
+
+        calls = []
+        value_position = self.portal_a.value_position
+        self.portal_a.value_position = lambda vault: calls.append(vault) or (
+            value_position(vault)
+        )
+
+        self.portal_a.update_total_assets()
+        self.assertEqual(calls, [])
+
+        self.vaults[1].earn_interest(1)
+        self.portal_a.update_total_assets()
+        self.assertEqual(calls, [self.vaults[1]])
+        self.assertTrue(self.portal_a.verify_valuations())
+
+        # the fund only sees the change once portal A updates its totals
+        self.assertTrue(self.fund._stale(self.portal_a))
+        self.assertFalse(self.fund._stale(self.portal_b))
+
+    def test_funds_sharing_a_vault(self):
+        vault = self.vaults[0]
+        funds = [Fund(f"Fund {i}", USDC, 0, 0, 10) for i in range(20)]
+        for fund in funds:
+            fund.add_vault(vault, 90)
+            fund.deposit(1000)
+            fund.simple_rebalance()
+
+        vault.earn_interest(1)
+        for fund in funds:
+            self.assertTrue(fund._stale(vault))
+            fund.update_total_assets()
+            self.assertFalse(fund._stale(vault))
+            self.assertTrue(fund.verify_valuations())
+            self.assertAlmostEqual(
+                fund.totalAssets, fund.value_position(vault) + fund.cash
+            )
+
+    def test_stale_cache_detected(self):
+        self.fund.deposit(1000)
+        self.fund.simple_rebalance()
+
+        self.fund.sub_vaults[self.portal_a]["shares"] *= 2
+        self.assertFalse(self.fund.verify_valuations())
+
+        self.fund.invalidate_valuations()
+        self.fund.update_total_assets()
+        self.assertTrue(self.fund.verify_valuations())
+
+    def test_stale_positions_do_not_hide_errors(self):
+        self.fund.deposit(1000)
+        self.fund.simple_rebalance()
+        self.portal_a.simple_rebalance()
+        self.portal_a.update_total_assets()
+        self.assertTrue(self.fund._stale(self.portal_a))
+
+        self.fund._invested += 5
+        self.assertFalse(self.fund.verify_valuations())
+
+    def test_vaults_notify_holders_once(self):
+        vault = self.vaults[0]
+        self.fund.deposit(1000)
+        self.fund.simple_rebalance()
+        self.portal_a.simple_rebalance()
+        self.portal_a.update_total_assets()
+        self.assertEqual(list(vault._holders), [self.portal_a])
+
+        vault.earn_interest(1)
+        vault.earn_interest(1)
+        self.assertEqual(list(vault._holders), [])
+        self.assertEqual(list(self.portal_a._dirty), [vault])
+
+        self.portal_a.update_total_assets()
+        self.assertEqual(list(vault._holders), [self.portal_a])
+        self.assertTrue(self.portal_a.verify_valuations())
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.vaults = [ERC4626(f"Test Vault {i}", USDC, 0, 0) for i in range(3)]
+        self.fund = Fund("Test Fund", USDC, 0, 0, 10)
+        for vault, ratio in zip(self.vaults, [40, 30, 20]):
+            vault.seed()
+            self.fund.add_vault(vault, ratio)
+        self.fund.deposit(1000)
+
+    def test_batch_rebalance(self):
+        vault_assets = [vault.totalAssets for vault in self.vaults]
+        updates = []
+        update_total_assets = self.fund.update_total_assets
+        self.fund.update_total_assets = lambda: updates.append(1) or (
+            update_total_assets()
+        )
+
+        with self.fund.batch(fixed_cost=3, leg_cost=1) as batch:
+            self.fund.simple_rebalance()
+            self.assertEqual(self.fund.cash, 1000)
+            self.assertEqual(len(batch.legs), 3)
+
+        self.assertEqual(updates, [1])
+        self.assertEqual(batch.transaction_cost, 6)
+        self.assertAlmostEqual(self.fund.cash, 100)
+        self.assertAlmostEqual(self.fund.totalAssets, 1000 - 6)
+        self.assertTrue(self.fund.verify_valuations())
+
+        # the fixed cost is spread over the legs by amount
+        for vault, before, amount in zip(self.vaults, vault_assets, [400, 300, 200]):
+            expected = amount - 1 - 3 * amount / 900
+            self.assertAlmostEqual(vault.totalAssets - before, expected)
+
+    def test_fixed_cost_charged_for_empty_legs(self):
+        with self.fund.batch(fixed_cost=3, leg_cost=1) as batch:
+            self.fund.invest(self.vaults[0], 0)
+            self.fund.invest(self.vaults[1], 0)
+
+        self.assertEqual(batch.transaction_cost, 5)
+        self.assertEqual(self.fund.cost_paid, 5)
+        self.assertAlmostEqual(self.fund.cash, 1000 - 5)
+        self.assertAlmostEqual(self.fund.totalAssets, 1000 - 5)
+
+    def test_legs_to_one_vault_are_merged(self):
+        with self.fund.batch(leg_cost=1) as batch:
+            self.fund.invest(self.vaults[0], 100)
+            self.fund.invest(self.vaults[0], 50, cost=0.5)
+
+        self.assertEqual(batch.transaction_cost, 1.5)
+        self.assertAlmostEqual(self.fund.value_position(self.vaults[0]), 148.5)
+
+    def test_failed_batch_is_cancelled(self):
+        with self.assertRaises(ZeroDivisionError):
+            with self.fund.batch():
+                self.fund.invest(self.vaults[0], 100)
+                1 / 0
+
+        self.assertEqual(self.fund.cash, 1000)
+        self.assertEqual(self.fund.sub_vaults[self.vaults[0]]["shares"], 0)
+        self.assertIsNone(self.fund._batch)
+
+    def test_one_batch_at_a_time(self):
+        self.fund.batch()
+        with self.assertRaises(ValueError):
+            self.fund.batch()
+
+
+class TestWithdraw(unittest.TestCase):
+    def setUp(self):
+        self.vaults = [ERC4626(f"Test Vault {i}", USDC, 1000, 1000) for i in range(3)]
+        self.fund = Fund("Test Fund", USDC, 0, 0, 10)
+        for vault, ratio in zip(self.vaults, [50, 30, 10]):
+            self.fund.add_vault(vault, ratio)
+        self.fund.deposit(1000)
+        self.fund.simple_rebalance()
+
+    def test_cash_first(self):
+        paid = self.fund.withdraw(50)
+        self.assertAlmostEqual(paid, 50)
+        self.assertAlmostEqual(self.fund.cash, 50)
+        self.assertAlmostEqual(self.fund.totalAssets, 950)
+        self.assertAlmostEqual(self.fund.value_position(self.vaults[0]), 500)
+
+    def test_largest_positions_liquidated_first(self):
+        paid = self.fund.withdraw(700, cost=1)
+        # cash 100, then the 500 position in full (one leg) and 100 of the
+        # 300 position (second leg); the redeemer pays both legs
+        self.assertAlmostEqual(paid, 698)
+        self.assertEqual(self.fund.cash, 0)
+        self.assertEqual(self.fund.sub_vaults[self.vaults[0]]["shares"], 0)
+        self.assertAlmostEqual(self.fund.value_position(self.vaults[1]), 200)
+        self.assertAlmostEqual(self.fund.value_position(self.vaults[2]), 100)
+        self.assertAlmostEqual(self.vaults[0].totalAssets, 1000)
+        self.assertAlmostEqual(self.fund.convert_to_assets(1), 1)
+        self.assertTrue(self.fund.verify_valuations())
+
+        with self.assertRaises(ValueError):
+            self.fund.withdraw(301)
+
+    def test_cost_above_proceeds(self):
+        # cash 100, then 5 from the largest position, which cannot cover a
+        # leg cost of 10
+        paid = self.fund.withdraw(105, cost=10)
+        self.assertAlmostEqual(paid, 100)
+        self.assertAlmostEqual(self.fund.value_position(self.vaults[0]), 495)
+
+    def test_cost_models(self):
+        # cash 100, then the 500 and 300 positions, one leg each
+        paid = self.fund.withdraw(800, cost=FlatCost(1))
+        self.assertAlmostEqual(paid, 798)
+        self.assertAlmostEqual(self.fund.cost_paid, 2)
+
+        amm = AMMCost(1_000_000, fee=0.001)
+        paid = self.fund.withdraw(100, cost=amm)
+        self.assertAlmostEqual(paid, 100 - amm(self.vaults[2], 100))
+        self.assertAlmostEqual(self.fund.cost_paid, 2 + amm(self.vaults[2], 100))
+
+    def test_nested_portals(self):
+        portal = Portal("Test Portal", USDC, 0, 0)
+        for vault in self.vaults:
+            portal.add_vault(vault, 30)
+        fund = Fund("Parent Fund", USDC, 0, 0, 0)
+        fund.add_vault(portal, 100)
+        fund.deposit(900)
+        fund.simple_rebalance()
+        portal.simple_rebalance()
+
+        paid = fund.withdraw(450)
+        self.assertAlmostEqual(paid, 450)
+        self.assertAlmostEqual(portal.totalAssets, 450)
+        self.assertAlmostEqual(fund.totalAssets, 450)
+        self.assertTrue(portal.verify_valuations())
+
+    def test_queue_matches_one_by_one(self):
+        queue = [random.uniform(0, 0.5) for _ in range(1000)]
+        other = Fund("Other Fund", USDC, 0, 0, 10)
+        for vault, ratio in zip(self.vaults, [50, 30, 10]):
+            other.add_vault(vault, ratio)
+        other.deposit(1000)
+        other.simple_rebalance()
+
+        paid = self.fund.process_withdrawals(queue)
+        one_by_one = [other.withdraw(shares) for shares in queue]
+
+        for a, b in zip(paid, one_by_one):
+            self.assertAlmostEqual(a, b)
+        self.assertAlmostEqual(self.fund.totalAssets, other.totalAssets)
+        self.assertAlmostEqual(self.fund.totalShares, 1000 - sum(queue))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import numpy as np
+from src.components import ERC4626, Fund
+from src.costs import AMMCost, CachedCost, FlatCost, OrderBookCost, leg_cost
+from src.optimizer import optimal_plan
+from src.solver import Solver
+
+USDC = "USDC"
+
+
+class TestCostModels(unittest.TestCase):
+    def setUp(self):
+        self.vault = ERC4626("Vault", USDC, 1000, 1000)
+
+    def test_flat(self):
+        self.assertEqual(leg_cost(2, self.vault, 100), 2)
+        self.assertEqual(leg_cost(FlatCost(2), self.vault, 100), 2)
+
+    def test_amm_price_impact(self):
+        model = AMMCost({"Vault": 10_000}, fee=0.001, gas=1)
+        self.assertAlmostEqual(model(self.vault, 1000), 1000**2 / 11_000 + 1 + 1)
+        self.assertEqual(model(self.vault, 0), 0)
+        # impact grows faster than size
+        self.assertGreater(model(self.vault, 2000), 2 * model(self.vault, 1000))
+
+        unknown = ERC4626("Other", USDC, 0, 0)
+        self.assertAlmostEqual(model(unknown, 1000), 2)
+
+    def test_order_book_levels(self):
+        model = OrderBookCost([(100, 0.001), (400, 0.01), (1000, 0.05)], gas=0.5)
+        self.assertAlmostEqual(model(self.vault, 50), 0.05 + 0.5)
+        self.assertAlmostEqual(model(self.vault, 100), 0.1 + 0.5)
+        self.assertAlmostEqual(model(self.vault, 300), 0.1 + 2 + 0.5)
+        # past the book the last level keeps filling
+        self.assertAlmostEqual(model(self.vault, 2500), 0.1 + 4 + 50 + 50 + 0.5)
+
+    def test_curves_match_calls(self):
+        sizes = np.array([0, 1, 99.5, 100, 250, 1500, 5000])
+        for model in [
+            FlatCost(1),
+            AMMCost(5000, fee=0.002),
+            OrderBookCost([(100, 0.001), (400, 0.01), (1000, 0.05)], gas=0.5),
+        ]:
+            expected = [model(self.vault, size) for size in sizes[1:]]
+            np.testing.assert_allclose(model.curve(self.vault, sizes)[1:], expected)
+
+    def test_cached_cost(self):
+        model = AMMCost(10_000)
+        cached = CachedCost(model, step=10)
+        cached.precompute(self.vault, 1000)
+
+        # amounts round up to the next step, so the cached cost is never lower
+        self.assertAlmostEqual(cached(self.vault, 95), model(self.vault, 100))
+        self.assertGreaterEqual(cached(self.vault, 95), model(self.vault, 95))
+        self.assertEqual(cached.cache_info().currsize, 0)
+
+        cached(self.vault, 5000)
+        cached(self.vault, 4995)
+        info = cached.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+
+class TestCostModelsInPortal(unittest.TestCase):
+    def setUp(self):
+        self.vaults = [ERC4626(f"Vault {i}", USDC, 1000, 1000) for i in range(3)]
+        self.fund = Fund("Fund", USDC, 0, 0, 10)
+        for vault, ratio in zip(self.vaults, [40, 30, 20]):
+            self.fund.add_vault(vault, ratio)
+        self.fund.deposit(1000)
+
+    def test_invest_and_rebalance(self):
+        model = OrderBookCost([(300, 0.01), (1000, 0.02)])
+        self.fund.smart_rebalance(model)
+
+        self.assertAlmostEqual(self.fund.value_position(self.vaults[0]), 400 - 5)
+        self.assertAlmostEqual(self.fund.value_position(self.vaults[1]), 300 - 3)
+        self.assertAlmostEqual(self.fund.value_position(self.vaults[2]), 200 - 2)
+
+    def test_batch_records_model_cost(self):
+        with self.fund.batch() as batch:
+            self.fund.invest(self.vaults[0], 100, AMMCost(900, fee=0))
+        self.assertAlmostEqual(batch.transaction_cost, 10)
+
+    def test_optimizer_accounts_for_impact(self):
+        # a shallow pool in the first vault makes its leg too costly
+        model = AMMCost({"Vault 0": 100}, gas=0.01)
+        plan = optimal_plan(self.fund, model, horizon=365, yields=None)
+        self.assertNotIn(self.vaults[0], dict(plan.legs))
+        self.assertAlmostEqual(
+            plan.transaction_cost, sum(model(v, a) for v, a in plan.legs)
+        )
+
+    def test_solver_charges_model_on_net_leg(self):
+        other = Fund("Other", USDC, 0, 0, 10)
+        for vault, ratio in zip(self.vaults, [40, 30, 20]):
+            other.add_vault(vault, ratio)
+        other.deposit(1000)
+
+        model = AMMCost(10_000)
+        solver = Solver(model)
+        solver.add(self.fund, self.vaults[0], 400)
+        solver.add(other, self.vaults[0], 400)
+        settlement = solver.execute()
+
+        self.assertAlmostEqual(settlement.transaction_cost, model(self.vaults[0], 800))
+        self.assertAlmostEqual(
+            settlement.independent_cost, 2 * model(self.vaults[0], 400)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import random
+from src.components import Portal, Fund
+from src.simulation import initialize_vaults, run_simulation
+from src.engine import VectorEngine, run_vectorized
+from src.fixedpoint import FixedPointVault
+from src.oracle import PriceOracle
+
+USDC = "USDC"
+
+
+def build_funds(seed):
+    rng = random.Random(seed)
+    protocols = [{"name": "Centrifuge", "vaults": 4, "ratios": [25, 25, 25, 25]}]
+
+    random.seed(seed)
+    vaults = initialize_vaults(protocols)
+
+    funds = []
+    for i in range(6):
+        reserve_ratio = rng.choice([0, 5, 10])
+        fund = Fund(f"Fund {i}", USDC, 0, 0, reserve_ratio, rng.choice([0, 1]))
+        picked = rng.sample(vaults, 3)
+        for vault, ratio in zip(picked, [40, 30, 30]):
+            fund.add_vault(vault, ratio)
+        fund.deposit(1000)
+        fund.simple_rebalance()
+        funds.append(fund)
+
+    strategies = ["smart", "simple"] * 3
+    costs = [0.005811, 0.005811, 0, 0, 2.5, 2.5]
+    return funds, strategies, costs
+
+
+class TestVectorEngine(unittest.TestCase):
+    def test_matches_reference(self):
+        days = 200
+
+        funds, strategies, costs = build_funds(7)
+        engine_funds, _, _ = build_funds(7)
+        engine = VectorEngine.from_funds(engine_funds, strategies, costs)
+
+        run_simulation(funds, strategies, costs, days, random.Random(1))
+
+        # the funds hold different vaults, so some never earn interest
+        self.assertGreater(engine.num_vaults, len(engine_funds[0].sub_vaults))
+        run_vectorized(engine, days, random.Random(1))
+        engine.sync()
+
+        for fund, engine_fund in zip(funds, engine_funds):
+            self.assertAlmostEqual(
+                fund.totalAssets / engine_fund.totalAssets, 1, places=10
+            )
+            self.assertAlmostEqual(
+                (fund.cash - engine_fund.cash) / fund.totalAssets, 0, places=10
+            )
+            self.assertAlmostEqual(fund.totalShares, engine_fund.totalShares, places=4)
+
+    def test_run_vectorized_matches_main_loop(self):
+        protocols = [{"name": "Yearn", "vaults": 3, "ratios": [40, 30, 30]}]
+
+        results = []
+        for use_engine in [False, True]:
+            random.seed(3)
+            vaults = initialize_vaults(protocols)
+            funds = [Fund(f"Fund {i}", USDC, 0, 0, 10, 1) for i in range(4)]
+            for fund in funds:
+                for vault, ratio in zip(vaults, [40, 30, 30]):
+                    fund.add_vault(vault, ratio)
+                fund.deposit(1000)
+                fund.simple_rebalance()
+
+            strategies = ["smart", "simple", "smart", "simple"]
+            costs = [0.005811, 0.005811, 0, 0]
+            if use_engine:
+                engine = VectorEngine.from_funds(funds, strategies, costs)
+                run_vectorized(engine, 365, random.Random(5))
+                engine.sync()
+            else:
+                run_simulation(funds, strategies, costs, 365, random.Random(5))
+            results.append([fund.totalAssets for fund in funds])
+
+        for reference, vectorized in zip(*results):
+            self.assertAlmostEqual(reference / vectorized, 1, places=10)
+
+    def test_nested_portals_rejected(self):
+        fund = Fund("Fund", USDC, 0, 0, 10)
+        fund.add_vault(Portal("Portal", USDC, 0, 0), 90)
+
+        with self.assertRaises(ValueError):
+            VectorEngine.from_funds([fund], ["simple"], [0])
+
+    def test_unsupported_funds_rejected(self):
+        fixed = Fund("Fixed", USDC, 0, 0, 10)
+        fixed.add_vault(FixedPointVault("Vault", USDC, 100, 100), 90)
+        with self.assertRaises(ValueError):
+            VectorEngine.from_funds([fixed], ["simple"], [0])
+
+        priced = Fund("Priced", USDC, 0, 0, 10)
+        PriceOracle({USDC: 1.0}).attach(priced)
+        with self.assertRaises(ValueError):
+            VectorEngine.from_funds([priced], ["simple"], [0])
+
+    def test_independent_universes(self):
+        engine = VectorEngine(
+            [[100, 100], [100, 100]],
+            [[100, 100], [50, 50]],
+            [[50, 50], [50, 50]],
+            0,
+            0,
+            ["simple", "simple"],
+            0,
+            universe=[0, 1],
+        )
+        engine.deposit(100)
+        engine.rebalance()
+
+        self.assertEqual(list(engine.cash), [0, 0])
+        self.assertEqual(list(engine.shares[0]), [50, 50])
+        self.assertEqual(list(engine.shares[1]), [25, 25])
+
+        engine.earn_interest([[10, 0], [0, 0]])
+        engine.revalue()
+        self.assertAlmostEqual(engine.totalAssets[0], 105)
+        self.assertAlmostEqual(engine.totalAssets[1], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
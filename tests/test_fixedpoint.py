@@ -0,0 +1,83 @@
+import unittest
+import random
+from src.components import ERC4626, Fund
+from src.fixedpoint import FixedPointVault, mul_div
+from src.simulation import PROTOCOLS, initialize_vaults
+
+USDC = "USDC"
+
+
+class TestFixedPointVault(unittest.TestCase):
+    def setUp(self):
+        self.vault = FixedPointVault("Vault", USDC, 1000, 1500)
+
+    def test_units(self):
+        self.assertEqual(self.vault._totalAssets, 1_500_000_000)
+        self.assertEqual(self.vault.totalAssets, 1500)
+        self.assertEqual(self.vault.to_units(4.35), 4_350_000)
+        self.assertEqual(mul_div(7, 1, 2), 3)
+        self.assertEqual(mul_div(7, 1, 2, round_up=True), 4)
+
+    def test_rounding_favours_the_vault(self):
+        # 1 unit of assets is worth 2/3 of a share unit, minted rounded down
+        self.assertEqual(self.vault.preview_deposit(1), 0)
+        self.assertEqual(self.vault.preview_mint(1), 2)
+        self.assertEqual(self.vault.preview_withdraw(1), 1)
+        self.assertEqual(self.vault.preview_redeem(1), 1)
+
+        shares = self.vault.deposit(0.000001)
+        self.assertEqual(shares, 0)
+        self.assertEqual(self.vault._totalAssets, 1_500_000_001)
+
+    def test_round_trip_never_pays_out_more(self):
+        rng = random.Random(0)
+        for _ in range(1000):
+            assets = rng.uniform(0, 1000)
+            shares = self.vault.deposit(assets)
+            self.assertLessEqual(self.vault.withdraw(shares), assets)
+        self.assertGreaterEqual(self.vault.totalAssets, 1500)
+        self.assertGreaterEqual(
+            self.vault.convert_to_assets(self.vault.totalShares), 1500
+        )
+
+    def test_insufficient_shares(self):
+        with self.assertRaises(ValueError):
+            self.vault.withdraw(1000.000001)
+
+    def test_interest_in_whole_units(self):
+        self.vault.earn_interest(0.0000001)
+        self.assertEqual(self.vault._totalAssets, 1_500_000_001)
+        self.vault.accrue(10, 1)
+        self.assertEqual(self.vault._totalAssets, int(1_500_000_001 * 1.01**10))
+
+    def test_fund_tracks_float_path(self):
+        fixed = initialize_vaults(
+            PROTOCOLS, random.Random(4), vault_cls=FixedPointVault
+        )
+        floats = initialize_vaults(PROTOCOLS, random.Random(4))
+        self.assertIsInstance(fixed[0], FixedPointVault)
+
+        totals = []
+        for vaults in (fixed, floats):
+            fund = Fund("Fund", USDC, 0, 0, 10, 1)
+            for vault, ratio in zip(vaults, [40, 30, 30]):
+                fund.add_vault(vault, ratio)
+            rng = random.Random(5)
+            for day in range(200):
+                fund.deposit(rng.randint(1_000, 100_000))
+                fund.smart_rebalance(0.005811)
+                for vault in vaults:
+                    vault.earn_interest(rng.randint(1, 10) / 365 / 10)
+            fund.withdraw(fund.totalShares / 2)
+            self.assertTrue(fund.verify_valuations())
+            totals.append(fund.totalAssets)
+
+        self.assertAlmostEqual(totals[0] / totals[1], 1, places=7)
+
+    def test_float_vaults_by_default(self):
+        vaults = initialize_vaults(PROTOCOLS, random.Random(4))
+        self.assertIs(type(vaults[0]), ERC4626)
+
+
+if __name__ == "__main__":
+    unittest.main()
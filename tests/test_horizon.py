@@ -0,0 +1,128 @@
+import unittest
+import itertools
+import random
+import numpy as np
+from src.components import ERC4626, Fund
+from src.costs import AMMCost
+from src.horizon import HorizonPlanner
+from src.simulation import PROTOCOLS, USDC, initialize_vaults, run_simulation
+
+
+def brute_force(pool, flows, rates, setup):
+    # cheapest schedule of rebalance days by enumerating all of them
+    H = len(flows)
+    q = [pool] + list(flows[1:])
+    R = np.concatenate(([0.0], np.cumsum(rates)))
+    best = np.inf
+    for size in range(H + 1):
+        for days in itertools.combinations(range(H), size):
+            total, waiting = 0.0, []
+            for j in range(H):
+                waiting.append(j)
+                if j in days:
+                    amount = sum(q[k] for k in waiting)
+                    total += setup(amount) if amount > 0 else 0
+                    total += sum(q[k] * (R[j] - R[k]) for k in waiting)
+                    waiting = []
+            total += sum(q[k] * (R[H] - R[k]) for k in waiting)
+            best = min(best, total)
+    return best
+
+
+class TestHorizonPlanner(unittest.TestCase):
+    def setUp(self):
+        self.vaults = [ERC4626(f"Vault {i}", USDC, 1000, 1000) for i in range(3)]
+        self.fund = Fund("Fund", USDC, 0, 0, 10, 1)
+        for vault, ratio in zip(self.vaults, [40, 30, 20]):
+            self.fund.add_vault(vault, ratio)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(5)
+        for trial in range(30):
+            flows = [rng.uniform(0, 2_000) for _ in range(7)]
+            rates = [rng.uniform(0, 0.2) for _ in range(7)]
+            cost = rng.choice([0.5, 2, 10])
+            pool = rng.uniform(0, 3_000)
+
+            planner = HorizonPlanner(7, flows, rates)
+            self.fund.reserveRatio = 0
+            plan = planner.solve(self.fund, cost, pool)
+            rates = np.array(rates) / 100
+            expected = brute_force(pool, flows, rates, lambda amount: cost * 3)
+            self.assertAlmostEqual(plan.objective, expected, places=6)
+            self.assertLessEqual(plan.objective, plan.idle_cost + 1e-9)
+
+    def test_cost_model(self):
+        model = AMMCost(50_000, fee=0.001)
+        self.fund.reserveRatio = 0
+        planner = HorizonPlanner(6, 1_000, 0.05)
+        plan = planner.solve(self.fund, model, 800)
+
+        def setup(amount):
+            weights = [4 / 9, 3 / 9, 2 / 9]
+            return sum(model(v, amount * w) for v, w in zip(self.vaults, weights))
+
+        expected = brute_force(800, [1_000] * 6, np.full(6, 0.0005), setup)
+        self.assertAlmostEqual(plan.objective, expected, places=6)
+
+    def test_extremes(self):
+        planner = HorizonPlanner(10, 1_000, 0.05)
+        self.assertEqual(planner.solve(self.fund, 0, 500).days, list(range(10)))
+        never = planner.solve(self.fund, 1e6, 500)
+        self.assertEqual(never.days, [])
+        self.assertEqual(never.objective, never.idle_cost)
+
+        # more cash on hand makes rebalancing now worth it sooner
+        small = planner.solve(self.fund, 2, 100)
+        large = planner.solve(self.fund, 2, 100_000)
+        self.assertEqual(large.days[0], 0)
+        self.assertGreater(small.days[0], 0)
+
+    def test_decisions_reuse_plans(self):
+        planner = HorizonPlanner(30, 1_000, 0.05)
+        self.fund.planner = planner
+        rebalances = 0
+        for day in range(200):
+            self.fund.deposit(1_000)
+            before = self.fund.cash
+            self.fund.horizon_rebalance(2)
+            rebalances += self.fund.cash < before
+            for vault in self.vaults:
+                vault.earn_interest(0.05)
+
+        self.assertEqual(planner.day, 200)
+        self.assertGreater(rebalances, 10)
+        self.assertLess(rebalances, 200)
+        self.assertLess(planner.solves, 50)
+        self.assertEqual(planner.solves + planner.reused + planner.cache_hits, 200)
+
+    def test_decisions_take_the_day(self):
+        planner = HorizonPlanner(30, 1_000, 0.05)
+        self.fund.deposit(500)
+        first = [planner.decide(self.fund, 2, day) for day in [0, 0, 0]]
+        self.assertEqual(first, [first[0]] * 3)
+        self.assertEqual(planner.day, 1)
+
+        planner.decide(self.fund, 2, 7)
+        self.assertEqual(planner.day, 8)
+        self.fund.planner = planner
+        self.fund.horizon_rebalance(2)
+        self.assertEqual(planner.day, 9)
+
+    def test_beats_threshold_rule_with_leg_costs(self):
+        results = {}
+        for strategy in ["smart", "horizon"]:
+            rng = random.Random(42)
+            vaults = initialize_vaults(PROTOCOLS, rng)
+            fund = Fund("Fund", USDC, 0, 0, 10, 1)
+            for vault, ratio in zip(vaults, [40, 30, 30]):
+                fund.add_vault(vault, ratio)
+            fund.deposit(1000)
+            fund.simple_rebalance()
+            run_simulation([fund], [strategy], [50], 365, rng)
+            results[strategy] = fund.totalAssets
+        self.assertGreater(results["horizon"], results["smart"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import os
+import random
+import tempfile
+from src.components import ERC4626, Fund, Portal
+from src.instrument import Profiler, profile
+from src.simulation import PROTOCOLS, USDC, create_portals, initialize_vaults
+
+ORIGINALS = {
+    (cls, name): cls.__dict__[name]
+    for cls in (ERC4626, Portal)
+    for name in ("deposit", "invest", "convert_to_assets", "smart_rebalance")
+    if name in cls.__dict__
+}
+
+
+def nested_fund(seed=1):
+    vaults = initialize_vaults(PROTOCOLS, random.Random(seed))
+    portals = create_portals(vaults, PROTOCOLS)
+    fund = Fund("Fund", USDC, 0, 0, 10, 1)
+    for portal, ratio in zip(portals.values(), [40, 30, 20]):
+        fund.add_vault(portal, ratio)
+    return fund, portals
+
+
+class TestProfiler(unittest.TestCase):
+    def test_disabled_leaves_methods_untouched(self):
+        profiler = Profiler()
+        with profiler:
+            self.assertIsNot(Portal.__dict__["invest"], ORIGINALS[(Portal, "invest")])
+        for (cls, name), original in ORIGINALS.items():
+            self.assertIs(cls.__dict__[name], original)
+
+        fund, portals = nested_fund()
+        fund.deposit(1000)
+        self.assertEqual(profiler.calls, {})
+
+    def test_counts_and_decisions(self):
+        fund, portals = nested_fund()
+
+        def step():
+            fund.deposit(1000)
+            fund.smart_rebalance(0.5)
+            for portal in portals.values():
+                portal.simple_rebalance()
+
+        profiler, result = profile(step)
+
+        self.assertEqual(profiler.calls["Portal.smart_rebalance"][0], 1)
+        self.assertEqual(profiler.calls["Portal.simple_rebalance"][0], 3)
+        self.assertEqual(profiler.calls["Portal.invest"][0], 3 + 7)
+        self.assertEqual(profiler.entities[("Portal.invest", "Fund")][0], 3)
+        self.assertGreater(profiler.calls["ERC4626.convert_to_assets"][0], 0)
+
+        decisions = [d for d in profiler.decisions if d["portal"] == "Fund"]
+        self.assertEqual([d["method"] for d in decisions], ["smart_rebalance"] * 3)
+        self.assertEqual(decisions[0]["amount"], 400)
+        self.assertEqual(decisions[0]["delta"], 400)
+        self.assertEqual(sum(d["cost"] for d in decisions), 1.5)
+        self.assertIn("10 rebalance legs", profiler.report())
+
+    def test_horizon_rebalance(self):
+        fund, portals = nested_fund()
+        fund.deposit(1000)
+        profiler, result = profile(lambda: fund.horizon_rebalance())
+
+        self.assertEqual(profiler.calls["Portal.horizon_rebalance"][0], 1)
+        self.assertEqual(profiler.calls["Portal.invest"][0], 3)
+        self.assertIn(
+            "Portal.horizon_rebalance Fund;Portal.simple_rebalance Fund",
+            profiler.folded(),
+        )
+
+    def test_folded_stacks(self):
+        fund, portals = nested_fund()
+        fund.deposit(1000)
+        with Profiler() as profiler:
+            fund.simple_rebalance()
+
+        lines = profiler.folded().splitlines()
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+        self.assertIn(
+            "Portal.simple_rebalance Fund;Portal.invest Fund;Portal.deposit Centrifuge",
+            "\n".join(lines),
+        )
+
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, "stacks.folded")
+            profiler.write_folded(filename)
+            with open(filename) as f:
+                self.assertEqual(len(f.read().splitlines()), len(lines))
+
+        # self time of the stacks adds up to the time of the outermost call
+        total = sum(seconds for count, seconds in profiler.stacks.values())
+        self.assertAlmostEqual(total, profiler.calls["Portal.simple_rebalance"][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
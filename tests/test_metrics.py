@@ -0,0 +1,128 @@
+import unittest
+import random
+import numpy as np
+from src.components import ERC4626, Fund
+from src.engine import VectorEngine, run_vectorized
+from src.horizon import HorizonPlanner
+from src.metrics import Metrics
+from src.simulation import PROTOCOLS, USDC, initialize_vaults, run_simulation
+
+STRATEGIES = ["smart", "simple", "smart", "simple"]
+COSTS = [0.005811, 0.005811, 0, 0]
+
+
+def main_funds(seed=42):
+    rng = random.Random(seed)
+    vaults = initialize_vaults(PROTOCOLS, rng)
+    funds = [Fund(f"Fund {i}", USDC, 0, 0, 10, 1) for i in range(4)]
+    for fund in funds:
+        for vault, ratio in zip(vaults, [40, 30, 30]):
+            fund.add_vault(vault, ratio)
+        fund.deposit(1000)
+        fund.simple_rebalance()
+    return funds, rng
+
+
+class TestMetrics(unittest.TestCase):
+    def test_engine_and_funds_agree(self):
+        funds, rng = main_funds()
+        reference = Metrics.from_funds(funds).observe_funds(funds)
+        on_step = lambda day: reference.observe_funds(funds)
+        run_simulation(funds, STRATEGIES, COSTS, 100, rng, on_step)
+
+        funds, rng = main_funds()
+        engine = VectorEngine.from_funds(funds, STRATEGIES, COSTS)
+        vectorized = Metrics.from_engine(engine).observe_engine(engine)
+        run_vectorized(engine, 100, rng, lambda day: vectorized.observe_engine(engine))
+
+        self.assertEqual(vectorized.names, [fund.name for fund in funds])
+        self.assertEqual(vectorized.steps, 101)
+        for kpi, values in reference.summary().items():
+            np.testing.assert_allclose(vectorized.summary()[kpi], values, atol=1e-9)
+        np.testing.assert_array_equal(vectorized.cost_paid, engine.cost_paid)
+        self.assertGreater(reference.cost_paid[0], 0)
+        self.assertEqual(reference.cost_paid[2], 0)
+
+    def test_measuring_does_not_change_the_run(self):
+        funds, rng = main_funds()
+        engine = VectorEngine.from_funds(funds, STRATEGIES, COSTS)
+        run_vectorized(engine, 60, rng)
+
+        funds, rng = main_funds()
+        observed = VectorEngine.from_funds(funds, STRATEGIES, COSTS)
+        metrics = Metrics.from_engine(observed)
+        run_vectorized(observed, 60, rng, lambda day: metrics.observe_engine(observed))
+        np.testing.assert_array_equal(observed.totalAssets, engine.totalAssets)
+
+    def test_return_ignores_flows(self):
+        vault = ERC4626("Vault", USDC, 1000, 1000)
+        fund = Fund("Fund", USDC, 0, 0, 10)
+        fund.add_vault(vault, 90)
+        fund.deposit(1000)
+        fund.simple_rebalance()
+        metrics = Metrics.from_funds([fund]).observe_funds([fund])
+
+        for day in range(10):
+            fund.deposit(500)
+            fund.simple_rebalance()
+            vault.earn_interest(1)
+            metrics.observe_funds([fund])
+        fund.withdraw(fund.totalShares / 2)
+        metrics.observe_funds([fund])
+
+        # the cash reserve earns nothing, so the fund returns less than the vault
+        self.assertGreater(metrics.twr[0], 0.05)
+        self.assertLess(metrics.twr[0], 1.01**10 - 1)
+        self.assertAlmostEqual(metrics.twr[0], fund.convert_to_assets(1) - 1, places=9)
+        # interest and the withdrawal leave the cash just under the reserve
+        self.assertAlmostEqual(metrics.idle_cash[0], 0.1, delta=0.01)
+        self.assertEqual(metrics.excess_idle_cash[0], 0)
+
+    def test_cost_paid_matches_fees_charged(self):
+        # prices never move, so all the value a fund loses went on fees
+        for strategy in ["simple", "smart", "optimal", "horizon"]:
+            vaults = [ERC4626(f"Vault {i}", USDC, 1000, 1000) for i in range(3)]
+            fund = Fund(strategy, USDC, 0, 0, 10, 1)
+            fund.planner = HorizonPlanner(30, 1000, 0.05)
+            for vault, ratio in zip(vaults, [40, 30, 20]):
+                fund.add_vault(vault, ratio)
+            metrics = Metrics.from_funds([fund])
+
+            flows = 0
+            for day in range(30):
+                fund.deposit(1000)
+                flows += 1000
+                getattr(fund, f"{strategy}_rebalance")(0.5)
+                if day % 7 == 6:
+                    flows -= fund.withdraw(fund.totalShares / 2, cost=1)
+                metrics.observe_funds([fund])
+
+            self.assertGreater(metrics.cost_paid[0], 0)
+            self.assertAlmostEqual(metrics.cost_paid[0], flows - fund.totalAssets)
+
+    def test_drawdown_and_tracking(self):
+        vaults = [ERC4626(f"Vault {i}", USDC, 1000, 1000) for i in range(2)]
+        fund = Fund("Fund", USDC, 0, 0, 0)
+        fund.add_vault(vaults[0], 50)
+        fund.add_vault(vaults[1], 50)
+        fund.deposit(1000)
+        fund.simple_rebalance()
+        metrics = Metrics.from_funds([fund]).observe_funds([fund])
+        self.assertAlmostEqual(metrics.tracking[0], 0)
+
+        vaults[0].earn_interest(-20)
+        metrics.observe_funds([fund])
+        vaults[0].earn_interest(25)
+        metrics.observe_funds([fund])
+
+        self.assertAlmostEqual(metrics.max_drawdown[0], 0.1)
+        self.assertAlmostEqual(metrics.drawdown[0], 0)
+        # 40/50 of the portfolio after the fall: weights 4/9 and 5/9
+        expected = np.sqrt(2 * (5 / 9 - 0.5) ** 2) * 100
+        self.assertAlmostEqual(metrics.tracking_error[0], np.sqrt(expected**2 / 3))
+        self.assertAlmostEqual(metrics.twr[0], 0)
+        self.assertIn("Fund", metrics.report())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import numpy as np
+from src.components import ERC4626, Fund
+from src.costs import FlatCost
+from src.engine import VectorEngine
+from src.montecarlo import PathGenerator, Strategy, describe, run_chunk, run_monte_carlo
+
+USDC = "USDC"
+RATIOS = [40, 30, 30]
+
+
+class TestPathGenerator(unittest.TestCase):
+    def test_chunks_are_reproducible_and_independent(self):
+        generator = PathGenerator(7, 30, 3, chunk_size=4)
+        first = list(generator.chunks(10))
+        again = list(PathGenerator(7, 30, 3, chunk_size=4).chunks(10))
+
+        self.assertEqual([len(paths) for paths in first], [4, 4, 2])
+        self.assertEqual(list(first[2].index), [8, 9])
+        for a, b in zip(first, again):
+            np.testing.assert_array_equal(a.deposits, b.deposits)
+            np.testing.assert_array_equal(a.yields, b.yields)
+
+        self.assertFalse(np.array_equal(first[0].deposits, first[1].deposits))
+        np.testing.assert_array_equal(generator.chunk(1).deposits, first[1].deposits)
+
+        self.assertTrue(np.all(first[0].deposits >= 1_000))
+        self.assertTrue(np.all(first[0].deposits <= 100_000))
+        self.assertEqual(first[0].yields.shape, (4, 30, 3))
+
+    def test_paths_do_not_depend_on_chunking(self):
+        small = list(PathGenerator(7, 30, 3, chunk_size=4).chunks(10))
+        large = PathGenerator(7, 30, 3, chunk_size=16).chunk(0, 12)
+        for field in ["vault_assets", "deposits", "withdrawals", "yields"]:
+            drawn = np.concatenate([getattr(paths, field) for paths in small])
+            np.testing.assert_array_equal(drawn, getattr(large, field)[:10])
+
+    def test_withdrawal_paths(self):
+        generator = PathGenerator(1, 200, 3, withdrawal_probability=0.1)
+        paths = generator.chunk(0, 50)
+        hit = paths.withdrawals > 0
+        self.assertAlmostEqual(hit.mean(), 0.1, delta=0.02)
+        self.assertTrue(np.all(paths.withdrawals < 0.05))
+
+
+class TestMonteCarlo(unittest.TestCase):
+    def test_strategies_share_paths(self):
+        strategies = [
+            Strategy("smart", "smart", cost=0.005811),
+            Strategy("smart copy", "smart", cost=0.005811),
+            Strategy("simple", "simple"),
+        ]
+        generator = PathGenerator(3, 60, 3, withdrawal_probability=0.05, chunk_size=8)
+        result = run_monte_carlo(strategies, generator, 20, RATIOS)
+
+        self.assertEqual(result.final_assets.shape, (3, 20))
+        np.testing.assert_array_equal(result.final_assets[0], result.final_assets[1])
+        self.assertEqual(result.difference("smart copy")["mean"], 0)
+        self.assertTrue(np.all(result.cost_paid[0] > 0))
+        self.assertTrue(np.all(result.cost_paid[2] == 0))
+
+        summary = result.summary()["simple"]["cash_drag"]
+        self.assertLessEqual(summary["ci_low"], summary["mean"])
+        self.assertIn("20 paths", result.report())
+
+        again = run_monte_carlo(strategies, generator, 20, RATIOS)
+        np.testing.assert_array_equal(result.final_assets, again.final_assets)
+
+    def test_chunk_matches_object_path(self):
+        generator = PathGenerator(5, 40, 3)
+        paths = generator.chunk(0, 2)
+        assets, drag, cost = run_chunk(paths, [Strategy("simple", "simple")], RATIOS)
+
+        for p in range(2):
+            vaults = [
+                ERC4626(f"Vault {j}", USDC, x, x)
+                for j, x in enumerate(paths.vault_assets[p])
+            ]
+            fund = Fund("Fund", USDC, 0, 0, 10, 1)
+            for vault, ratio in zip(vaults, RATIOS):
+                fund.add_vault(vault, ratio)
+            fund.deposit(1000)
+            fund.simple_rebalance()
+
+            for day in range(40):
+                fund.deposit(paths.deposits[p, day])
+                fund.simple_rebalance()
+                for vault, interest in zip(vaults, paths.yields[p, day]):
+                    vault.earn_interest(interest)
+
+            self.assertAlmostEqual(assets[0, p] / fund.totalAssets, 1, places=10)
+
+    def test_engine_withdraw(self):
+        engine = VectorEngine(
+            [[100, 100]], [[100, 100]], [[50, 40]], 10, 0, ["simple"], 0
+        )
+        engine.deposit(100)
+        engine.rebalance()
+        self.assertAlmostEqual(engine.cash[0], 10)
+
+        paid = engine.withdraw(engine.totalShares * 0.5)
+        self.assertAlmostEqual(paid[0], 50)
+        self.assertAlmostEqual(engine.cash[0], 0)
+        self.assertAlmostEqual(engine.shares[0, 0], 10)
+        self.assertAlmostEqual(engine.totalAssets[0], 50)
+        self.assertAlmostEqual(engine.vault_assets[0, 0], 110)
+
+        with self.assertRaises(ValueError):
+            engine.withdraw(1_000)
+
+        # the rest comes out of both vaults, one leg cost each
+        paid = engine.withdraw(engine.totalShares, cost=1)
+        self.assertAlmostEqual(paid[0], 50 - 2)
+        self.assertAlmostEqual(engine.cost_paid[0], 2)
+        with self.assertRaises(ValueError):
+            engine.withdraw(0, cost=FlatCost(1))
+
+    def test_describe(self):
+        stats = describe(np.arange(101.0))
+        self.assertEqual(stats["mean"], 50)
+        self.assertEqual(stats["p50"], 50)
+        self.assertLess(stats["ci_low"], 50)
+        self.assertGreater(stats["ci_high"], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import itertools
+import unittest
+import random
+import numpy as np
+from src.components import ERC4626, Fund
+from src.optimizer import greedy_plan, optimal_plan, solve_allocation
+
+USDC = "USDC"
+
+
+def brute_force(caps, gains, budget, cost):
+    best = 0
+    order = sorted(range(len(caps)), key=lambda i: -gains[i])
+    for size in range(1, len(caps) + 1):
+        for chosen in itertools.combinations(order, size):
+            room, value = budget, -cost * size
+            for i in chosen:
+                amount = min(caps[i], room)
+                value += amount * gains[i]
+                room -= amount
+            best = max(best, value)
+    return best
+
+
+def value(amounts, gains, cost):
+    return float(np.dot(amounts, gains)) - cost * int(np.count_nonzero(amounts))
+
+
+class TestSolveAllocation(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        for trial in range(200):
+            count = rng.randint(1, 7)
+            caps = [rng.uniform(0, 100) for _ in range(count)]
+            gains = [
+                rng.choice([0.01, 0.02, rng.uniform(0, 0.05)]) for _ in range(count)
+            ]
+            budget = rng.uniform(0, 250)
+            cost = rng.uniform(0, 1.5)
+
+            amounts, optimal, nodes = solve_allocation(caps, gains, budget, cost, 1)
+            self.assertTrue(optimal)
+            self.assertLessEqual(amounts.sum(), budget + 1e-9)
+            self.assertTrue(np.all(amounts <= np.array(caps) + 1e-9))
+            self.assertAlmostEqual(
+                value(amounts, gains, cost), brute_force(caps, gains, budget, cost)
+            )
+
+    def test_skips_legs_that_do_not_pay_for_themselves(self):
+        amounts, optimal, nodes = solve_allocation([100, 1], [0.01, 0.01], 500, 0.5)
+        self.assertEqual(list(amounts), [100, 0])
+
+    def test_time_budget(self):
+        rng = np.random.default_rng(0)
+        caps = rng.uniform(0, 1_000, 500)
+        gains = rng.uniform(0, 0.05, 500)
+
+        amounts, optimal, nodes = solve_allocation(caps, gains, 20_000, 3, 0.02)
+        self.assertLessEqual(amounts.sum(), 20_000 + 1e-6)
+        self.assertGreater(nodes, 0)
+
+
+class TestOptimalRebalance(unittest.TestCase):
+    def setUp(self):
+        self.vaults = [ERC4626(f"Test Vault {i}", USDC, 0, 0) for i in range(20)]
+        self.fund = Fund("Test Fund", USDC, 0, 0, 10, 1)
+        for vault in self.vaults:
+            vault.seed(random.Random(1))
+            self.fund.add_vault(vault, 4.5)
+        self.fund.deposit(100_000)
+        self.fund.simple_rebalance()
+        self.fund.deposit(5_000)
+
+    def test_never_worse_than_greedy(self):
+        yields = {vault: 0.01 + 0.001 * i for i, vault in enumerate(self.vaults)}
+        for cost in [0, 1, 10, 50]:
+            greedy = greedy_plan(self.fund, cost, 30, yields)
+            plan = optimal_plan(self.fund, cost, 30, yields)
+            self.assertLessEqual(plan.objective, greedy.objective + 1e-9)
+            self.assertLessEqual(plan.invested, plan.available_cash + 1e-9)
+
+    def test_optimal_rebalance_executes_plan(self):
+        cash = self.fund.cash
+        plan = self.fund.optimal_rebalance(cost=0.01)
+
+        self.assertTrue(plan.optimal)
+        self.assertGreater(len(plan.legs), 0)
+        self.assertAlmostEqual(self.fund.cash, cash - plan.invested)
+        self.assertGreaterEqual(self.fund.cash, self.fund.totalAssets * 0.1 - 1e-6)
+        self.assertTrue(self.fund.verify_valuations())
+
+    def test_greedy_plan_mirrors_smart_rebalance(self):
+        plan = greedy_plan(self.fund)
+        expected = {vault: amount for vault, amount in plan.legs}
+        before = {vault: self.fund.value_position(vault) for vault in self.vaults}
+
+        self.fund.smart_rebalance()
+        for vault in self.vaults:
+            invested = self.fund.value_position(vault) - before[vault]
+            self.assertAlmostEqual(invested, expected.get(vault, 0), places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
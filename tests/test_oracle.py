@@ -0,0 +1,108 @@
+import unittest
+from src.components import ERC4626, Fund, Portal
+from src.costs import AMMCost
+from src.oracle import PriceOracle
+
+PRICES = {"USDC": 1.0, "DAI": 0.999, "ETH": 3000.0}
+
+
+class TestPriceOracle(unittest.TestCase):
+    def test_rates(self):
+        oracle = PriceOracle(PRICES)
+        self.assertEqual(oracle.rate("ETH", "ETH"), 1)
+        self.assertAlmostEqual(oracle.rate("ETH", "USDC"), 3000)
+        self.assertAlmostEqual(oracle.convert(3000, "USDC", "ETH"), 1)
+        self.assertAlmostEqual(oracle.rate("DAI", "ETH"), 0.999 / 3000)
+        with self.assertRaises(ValueError):
+            oracle.rate("BTC", "USDC")
+
+    def test_table_is_cached_per_update(self):
+        oracle = PriceOracle(PRICES)
+        table = oracle.table()
+        self.assertIs(oracle.table(), table)
+        self.assertEqual(oracle.update({"ETH": 3000.0}), set())
+        self.assertIs(oracle.table(), table)
+
+        self.assertEqual(
+            oracle.update({"ETH": 3300.0, "WBTC": 60_000}), {"ETH", "WBTC"}
+        )
+        self.assertIsNot(oracle.table(), table)
+        self.assertEqual(oracle.version, 1)
+        self.assertAlmostEqual(oracle.rate("WBTC", "ETH"), 60_000 / 3300)
+
+
+class TestMultiAssetFund(unittest.TestCase):
+    def setUp(self):
+        self.oracle = PriceOracle(PRICES, swap_cost=1)
+        self.usdc = ERC4626("USDC Vault", "USDC", 1000, 1000)
+        self.dai = ERC4626("DAI Vault", "DAI", 1000, 1000)
+        self.eth = ERC4626("ETH Vault", "ETH", 10, 10)
+
+        self.fund = Fund("Fund", "USDC", 0, 0, 10)
+        for vault, ratio in [(self.usdc, 30), (self.dai, 30), (self.eth, 30)]:
+            self.fund.add_vault(vault, ratio)
+        self.oracle.attach(self.fund)
+        self.fund.deposit(3000)
+
+    def test_invest_swaps_into_vault_asset(self):
+        self.fund.invest(self.eth, 901, cost=0)
+        # 1 USDC swap cost, then 900 USDC buys 0.3 ETH
+        self.assertAlmostEqual(self.eth.totalAssets, 10.3)
+        self.assertAlmostEqual(self.fund.value_position(self.eth), 900)
+        self.assertAlmostEqual(self.fund.totalAssets, 2999)
+        self.assertEqual(self.oracle.swap_costs, {"USDC": 1})
+        self.assertEqual(self.fund.cost_paid, 1)
+
+    def test_rebalance_and_price_moves(self):
+        self.fund.simple_rebalance()
+        self.assertAlmostEqual(self.fund.value_position(self.usdc), 900)
+        self.assertAlmostEqual(self.fund.value_position(self.dai), 899)
+        self.assertAlmostEqual(self.fund.value_position(self.eth), 898.7)
+        before = self.fund.totalAssets
+
+        self.oracle.update({"ETH": 3300.0})
+        self.assertEqual(list(self.fund._dirty), [])
+        self.assertAlmostEqual(self.fund.totalAssets, before + 89.87)
+        self.assertTrue(self.fund.verify_valuations())
+
+        # a move in the fund's own asset moves every foreign position
+        self.oracle.update({"USDC": 1.25}, revalue=False)
+        self.assertEqual(list(self.fund._dirty), [self.dai, self.eth])
+
+    def test_liquidation_swaps_back(self):
+        self.fund.simple_rebalance()
+        paid = self.fund.withdraw(self.fund.totalShares)
+        # two swaps in and two out of DAI and ETH, all paid in USDC
+        self.assertAlmostEqual(paid, 3000 - 4, places=6)
+        self.assertAlmostEqual(self.eth.totalAssets, 10, places=9)
+        self.assertEqual(self.oracle.swap_costs, {"USDC": 4})
+        self.assertAlmostEqual(self.fund.cost_paid, 4, places=6)
+
+    def test_batch_and_cost_models(self):
+        oracle = PriceOracle(PRICES, swap_cost=AMMCost(1_000_000, fee=0.0005))
+        oracle.attach(self.fund)
+        with self.fund.batch():
+            self.fund.invest(self.eth, 1000)
+            self.fund.invest(self.usdc, 1000)
+        swap = AMMCost(1_000_000, fee=0.0005)(self.eth, 1000)
+        self.assertAlmostEqual(self.fund.value_position(self.eth), 1000 - swap)
+        self.assertAlmostEqual(self.fund.value_position(self.usdc), 1000)
+
+    def test_nested_portal_in_other_asset(self):
+        portal = Portal("ETH Portal", "ETH", 0, 0)
+        portal.add_vault(self.eth, 100)
+        self.oracle.attach(portal)
+        self.fund.add_vault(portal, 10)
+        self.oracle.attach(self.fund)
+
+        self.fund.invest(portal, 301)
+        portal.simple_rebalance()
+        self.assertAlmostEqual(self.fund.value_position(portal), 300)
+
+        self.oracle.update({"ETH": 6000.0})
+        self.assertAlmostEqual(self.fund.value_position(portal), 600)
+        self.assertTrue(self.fund.verify_valuations())
+
+
+if __name__ == "__main__":
+    unittest.main()
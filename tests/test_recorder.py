@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+import random
+import numpy as np
+from src.components import ERC4626, Fund
+from src.engine import VectorEngine, run_vectorized
+from src.recorder import Recorder, load_recording
+from src.simulation import initialize_vaults, run_simulation
+
+USDC = "USDC"
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "run")
+
+        protocols = [{"name": "Yearn", "vaults": 3, "ratios": [40, 30, 30]}]
+        self.vaults = initialize_vaults(protocols, random.Random(1))
+        self.funds = [Fund(f"Fund {i}", USDC, 0, 0, 10, 1) for i in range(2)]
+        for fund in self.funds:
+            for vault, ratio in zip(self.vaults, [40, 30, 30]):
+                fund.add_vault(vault, ratio)
+            fund.deposit(1000)
+            fund.simple_rebalance()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_records_objects(self):
+        entities = self.funds + self.vaults
+        expected = []
+
+        def on_step(day):
+            recorder.record(day)
+            expected.append([e.totalAssets for e in entities])
+
+        with Recorder(self.path, entities, chunk_size=7) as recorder:
+            run_simulation(
+                self.funds, ["smart", "simple"], [0, 0], 30, random.Random(2), on_step
+            )
+
+        recording = load_recording(self.path)
+        self.assertEqual(recording.rows, 30)
+        self.assertEqual(list(recording.steps), list(range(30)))
+        self.assertEqual(recording.names[0], "Fund 0")
+        np.testing.assert_array_equal(recording["totalAssets"], expected)
+        np.testing.assert_array_equal(
+            recording.series("cash", "Fund 1")[-1], self.funds[1].cash
+        )
+        self.assertTrue(np.isnan(recording.series("cash", self.vaults[0].name)).all())
+
+    def test_unchanged_entities_carry_over(self):
+        idle = ERC4626("Idle Vault", USDC, 10, 10)
+        busy = ERC4626("Busy Vault", USDC, 10, 10)
+
+        with Recorder(
+            self.path, [idle, busy], ["totalAssets"], chunk_size=2
+        ) as recorder:
+            for day in range(5):
+                busy.earn_interest(10)
+                recorder.record(day)
+                self.assertEqual(recorder._versions[1], busy._version)
+
+        recording = load_recording(self.path)
+        self.assertEqual(list(recording.series("totalAssets", "Idle Vault")), [10] * 5)
+        np.testing.assert_allclose(
+            recording.series("totalAssets", "Busy Vault"), 10 * 1.1 ** np.arange(1, 6)
+        )
+
+    def test_records_engine_arrays(self):
+        engine = VectorEngine.from_funds(self.funds, ["smart", "simple"], [0, 0])
+        names = [fund.name for fund in self.funds]
+        fields = ["totalAssets", "cash", "cost_paid"]
+
+        with Recorder(self.path, names, fields, chunk_size=16) as recorder:
+            run_vectorized(
+                engine, 40, random.Random(2), lambda day: recorder.record(day, engine)
+            )
+
+        recording = load_recording(self.path)
+        self.assertEqual(recording["cash"].shape, (40, 2))
+        np.testing.assert_array_equal(recording["totalAssets"][-1], engine.totalAssets)
+
+
+if __name__ == "__main__":
+    unittest.main()
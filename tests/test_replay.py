@@ -0,0 +1,168 @@
+import unittest
+import asyncio
+import random
+import tempfile
+import httpx
+import numpy as np
+from src.components import Fund
+from src.replay import (
+    BlockCache,
+    LocalNode,
+    RpcClient,
+    fetch_history,
+    initialize_recorded_vaults,
+    load_history,
+    run_replay,
+    sample_blocks,
+)
+from src.simulation import PROTOCOLS, USDC
+
+URL = "http://node.local"
+STEP = 100
+VAULTS = [
+    {"name": "Morpho Vault A", "address": "0xAAA"},
+    {"name": "Morpho Vault B", "address": "0xBBB", "decimals": 18},
+]
+
+
+def make_node(days):
+    # Vault A grows 0.1% a day, B 0.2%; both take deposits that must not
+    # show up as yield
+    node = LocalNode()
+    for day in range(days):
+        block = 1000 + day * STEP
+        supply = 1_000_000 + 5_000 * day
+        node.set_state("0xAAA", block, supply * 1.001**day * 10**6, supply * 10**6)
+        node.set_state("0xBBB", block, supply * 1.002**day * 10**18, supply * 10**18)
+    return node
+
+
+def fetch(node, start, end, cache_dir=None, batch_size=100):
+    async def run():
+        transport = httpx.ASGITransport(app=node)
+        cache = None if cache_dir is None else BlockCache(cache_dir)
+        async with RpcClient(URL, transport, batch_size=batch_size) as client:
+            blocks = sample_blocks(start, end, STEP)
+            history = await fetch_history(client, VAULTS, blocks, cache)
+        return history, client.requests
+
+    return asyncio.run(run())
+
+
+class TestRpcClient(unittest.TestCase):
+    def test_batches_and_errors(self):
+        node = make_node(3)
+
+        async def run():
+            transport = httpx.ASGITransport(app=node)
+            async with RpcClient(URL, transport, batch_size=4) as client:
+                head = await client.block_number()
+                calls = [("eth_blockNumber", [])] * 10
+                results = await client.batch(calls)
+                with self.assertRaises(ValueError):
+                    await client.call("eth_getLogs", [{}])
+            return head, results, client.requests
+
+        head, results, requests = asyncio.run(run())
+        self.assertEqual(head, 1200)
+        self.assertEqual(results, [hex(1200)] * 10)
+        self.assertEqual(requests, 1 + 3 + 1)
+        self.assertEqual(node.calls, 1 + 10 + 1)
+
+    def test_concurrent_batches_are_bounded(self):
+        class Tracking(RpcClient):
+            active = peak = 0
+
+            async def _post(self, payload):
+                Tracking.active += 1
+                Tracking.peak = max(Tracking.peak, Tracking.active)
+                await asyncio.sleep(0.001)
+                try:
+                    return await super()._post(payload)
+                finally:
+                    Tracking.active -= 1
+
+        async def run():
+            transport = httpx.ASGITransport(app=make_node(3))
+            async with Tracking(URL, transport, 1, max_connections=2) as client:
+                return await client.batch([("eth_blockNumber", [])] * 10)
+
+        self.assertEqual(asyncio.run(run()), [hex(1200)] * 10)
+        self.assertEqual(Tracking.peak, 2)
+
+
+class TestHistory(unittest.TestCase):
+    def test_fetch_decodes_totals_and_yields(self):
+        history, requests = fetch(make_node(30), 1000, 3900, batch_size=25)
+        self.assertEqual(history.assets.shape, (30, 2))
+        self.assertEqual(requests, 120 // 25 + 1)
+        self.assertAlmostEqual(history.shares[10, 0], 1_050_000)
+        self.assertAlmostEqual(history.shares[10, 1], 1_050_000)
+
+        interest = history.interest()
+        self.assertEqual(interest.shape, (29, 2))
+        np.testing.assert_allclose(interest[:, 0], 0.1, rtol=1e-6)
+        np.testing.assert_allclose(interest[:, 1], 0.2, rtol=1e-6)
+
+    def test_share_decimals(self):
+        # a 6 decimal asset with 18 decimal shares, as many ERC4626 vaults have
+        node = LocalNode()
+        node.set_state("0xCCC", 1000, 2_000 * 10**6, 1_000 * 10**18)
+        vault = {"name": "Vault C", "address": "0xCCC", "share_decimals": 18}
+
+        async def run():
+            transport = httpx.ASGITransport(app=node)
+            async with RpcClient(URL, transport) as client:
+                return await fetch_history(client, [vault], [1000])
+
+        history = asyncio.run(run())
+        self.assertEqual(history.balances(), {"Vault C": (2_000, 1_000)})
+        self.assertEqual(history.prices()[0, 0], 2)
+
+    def test_cache_fetches_only_new_blocks(self):
+        node = make_node(40)
+        with tempfile.TemporaryDirectory() as path:
+            first, _ = fetch(node, 1000, 2900, path)
+            calls = node.calls
+            self.assertEqual(calls, 2 * 2 * 20)
+
+            again, requests = fetch(node, 1000, 2900, path)
+            self.assertEqual((node.calls, requests), (calls, 0))
+            np.testing.assert_array_equal(again.assets, first.assets)
+
+            longer, _ = fetch(node, 1000, 4900, path)
+            self.assertEqual(node.calls - calls, 2 * 2 * 20)
+            np.testing.assert_array_equal(longer.assets[:20], first.assets)
+            self.assertEqual(len(BlockCache(path).load("0xaaa")), 40)
+
+    def test_load_history_reads_head(self):
+        node = make_node(5)
+        history = load_history(
+            URL, VAULTS, 1000, step=STEP, transport=httpx.ASGITransport(app=node)
+        )
+        self.assertEqual(history.blocks, [1000, 1100, 1200, 1300, 1400])
+
+
+class TestReplay(unittest.TestCase):
+    def test_seed_and_replay_recorded_yields(self):
+        history, _ = fetch(make_node(31), 1000, 4000)
+        vaults = initialize_recorded_vaults(PROTOCOLS, history, rng=random.Random(1))
+        by_name = {vault.name: vault for vault in vaults}
+        self.assertEqual(by_name["Morpho Vault A"].totalShares, 1_000_000)
+        self.assertEqual(by_name["Morpho Vault B"].totalAssets, 1_000_000)
+
+        fund = Fund("Fund", USDC, 0, 0, 10, 1)
+        fund.add_vault(by_name["Morpho Vault A"], 45)
+        fund.add_vault(by_name["Morpho Vault B"], 45)
+        fund.deposit(1000)
+        fund.simple_rebalance()
+
+        run_replay([fund], ["simple"], [0], history, random.Random(2))
+        a = by_name["Morpho Vault A"]
+        b = by_name["Morpho Vault B"]
+        self.assertAlmostEqual(a.convert_to_assets(1), 1.001**30, places=9)
+        self.assertAlmostEqual(b.convert_to_assets(1), 1.002**30, places=9)
+
+
+if __name__ == "__main__":
+    unittest.main()
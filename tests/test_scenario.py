@@ -0,0 +1,123 @@
+import unittest
+import json
+import os
+import random
+import tempfile
+from src.components import Fund, Portal
+from src.scenario import compile_scenario, load_scenario, load_scenarios, run_scenario
+from src.simulation import PROTOCOLS, USDC, initialize_vaults, run_simulation
+
+MAIN = os.path.join(os.path.dirname(__file__), "..", "scenarios", "main.json")
+
+
+def reference_funds(days):
+    rng = random.Random(42)
+    vaults = initialize_vaults(PROTOCOLS, rng)
+    funds = [Fund(f"Fund {i}", USDC, 0, 0, 10, 1) for i in range(4)]
+    for fund in funds:
+        for vault, ratio in zip(vaults, [40, 30, 30]):
+            fund.add_vault(vault, ratio)
+        fund.deposit(1000)
+        fund.simple_rebalance()
+    strategies = ["smart", "simple", "smart", "simple"]
+    costs = [0.005811, 0.005811, 0, 0]
+    return run_simulation(funds, strategies, costs, days, rng)
+
+
+class TestScenario(unittest.TestCase):
+    def setUp(self):
+        self.scenario = dict(load_scenario(MAIN), days=200)
+
+    def test_main_scenario_matches_main(self):
+        plan = compile_scenario(self.scenario)
+        self.assertEqual(len(plan.vaults), 3)
+        self.assertEqual(plan.interest.shape, (200, 3))
+
+        funds = plan.run()
+        for fund, expected in zip(funds, reference_funds(200)):
+            self.assertEqual(fund.totalAssets, expected.totalAssets)
+            self.assertEqual(fund.cash, expected.cash)
+
+    def test_vectorized(self):
+        funds = run_scenario(self.scenario, vectorized=True)
+        for fund, expected in zip(funds, reference_funds(200)):
+            self.assertAlmostEqual(fund.totalAssets / expected.totalAssets, 1, places=9)
+
+    def test_fund_trees_and_withdrawals(self):
+        scenario = {
+            "seed": 1,
+            "days": 100,
+            "protocols": PROTOCOLS,
+            "funds": [
+                {"name": "Inner", "holdings": [["Morpho", 50], ["Yearn", 40]]},
+                {
+                    "name": "Outer",
+                    "strategy": "simple",
+                    "holdings": [["Inner", 60], ["Centrifuge Vault A", 30]],
+                },
+            ],
+            "withdrawals": {"probability": 0.2, "max_fraction": 0.05},
+        }
+        plan = compile_scenario(scenario)
+        inner, outer = plan.funds
+        self.assertIn(inner, outer.sub_vaults)
+        self.assertIsInstance(next(iter(inner.sub_vaults)), Portal)
+        self.assertEqual(
+            [vault.name for vault in plan.vaults],
+            ["Morpho Vault A", "Morpho Vault B", "Yearn Vault A", "Yearn Vault B"]
+            + ["Centrifuge Vault A"],
+        )
+        self.assertGreater((plan.withdrawals > 0).sum(), 0)
+
+        before = outer.totalShares
+        plan.run()
+        self.assertLess(outer.totalShares, before + plan.deposits.sum())
+        self.assertTrue(outer.verify_valuations())
+
+    def test_protocol_portals_invest(self):
+        scenario = {
+            "seed": 3,
+            "days": 30,
+            "protocols": [{"name": "Morpho", "vaults": 2, "ratios": [60, 40]}],
+            "funds": [{"name": "Fund", "holdings": [["Morpho", 90]]}],
+        }
+        plan = compile_scenario(scenario)
+        (fund,) = plan.funds
+        portal = next(iter(fund.sub_vaults))
+        self.assertEqual([p for p, strategy, cost in plan.portals], [portal, fund])
+
+        plan.run()
+        self.assertGreater(portal.value_portal_investments(), 0)
+        self.assertLess(portal.cash, 0.1 * portal.totalAssets)
+        self.assertGreater(fund.convert_to_assets(1), 1)
+
+    def test_errors(self):
+        scenario = dict(self.scenario, funds=[{"name": "F", "holdings": [["Nope", 1]]}])
+        with self.assertRaises(ValueError):
+            compile_scenario(scenario)
+
+        twice = dict(self.scenario, funds=[{"name": "F"}, {"name": "F"}])
+        with self.assertRaises(ValueError):
+            compile_scenario(twice)
+
+    def test_suite_files(self):
+        with tempfile.TemporaryDirectory() as path:
+            yaml_path = os.path.join(path, "suite.yaml")
+            with open(yaml_path, "w") as f:
+                f.write(
+                    "scenarios:\n"
+                    "  - name: a\n    days: 5\n"
+                    "  - name: b\n    days: 6\n"
+                )
+            self.assertEqual([s["name"] for s in load_scenarios(yaml_path)], ["a", "b"])
+            with self.assertRaises(ValueError):
+                load_scenario(yaml_path)
+
+            json_path = os.path.join(path, "suite.json")
+            with open(json_path, "w") as f:
+                json.dump([self.scenario, self.scenario], f)
+            self.assertEqual(len(load_scenarios(json_path)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import random
+from src.components import Fund
+from src.scheduler import DAY, EventSimulation, Scheduler
+from src.simulation import daily_draws, initialize_vaults, run_simulation
+
+USDC = "USDC"
+
+
+def build_fund(seed, reserve_ratio=10):
+    protocols = [{"name": "Yearn", "vaults": 3, "ratios": [40, 30, 30]}]
+    vaults = initialize_vaults(protocols, random.Random(seed))
+    fund = Fund("Fund", USDC, 0, 0, reserve_ratio, 1)
+    for vault, ratio in zip(vaults, [40, 30, 30]):
+        fund.add_vault(vault, ratio)
+    fund.deposit(1000)
+    fund.simple_rebalance()
+    return fund
+
+
+class TestScheduler(unittest.TestCase):
+    def test_order_and_priorities(self):
+        scheduler = Scheduler()
+        log = []
+        scheduler.at(5, lambda now: log.append(("b", now)), priority=1)
+        scheduler.at(5, lambda now: log.append(("a", now)), priority=0)
+        scheduler.at(2, lambda now: log.append(("c", now)))
+
+        self.assertEqual(scheduler.run(4), 1)
+        self.assertEqual(scheduler.now, 4)
+        scheduler.run()
+        self.assertEqual(log, [("c", 2), ("a", 5), ("b", 5)])
+
+        with self.assertRaises(ValueError):
+            scheduler.at(1, print)
+
+    def test_every_and_until(self):
+        scheduler = Scheduler()
+        times = []
+        scheduler.every(3, times.append, start=1, until=10)
+        scheduler.run()
+        self.assertEqual(times, [1, 4, 7, 10])
+
+    def test_endless_events_need_until(self):
+        scheduler = Scheduler()
+        times = []
+        scheduler.every(3, times.append)
+        with self.assertRaises(ValueError):
+            scheduler.run()
+        scheduler.run(until=6)
+        self.assertEqual(times, [0, 3, 6])
+
+    def test_sparse_stream_skips_idle_time(self):
+        scheduler = Scheduler()
+        seen = []
+        events = ((minute, minute * 2) for minute in range(0, 5 * 365 * DAY, 97 * DAY))
+        scheduler.stream(events, lambda now, payload: seen.append(payload))
+
+        self.assertEqual(len(scheduler), 1)
+        scheduler.run()
+        self.assertEqual(scheduler.processed, len(seen))
+        self.assertEqual(len(seen), len(range(0, 5 * 365 * DAY, 97 * DAY)))
+
+    def test_trigger_cooldown(self):
+        scheduler = Scheduler()
+        fired = []
+        scheduler.every(1, lambda now: None, start=0, until=10)
+        scheduler.when(lambda: True, fired.append, cooldown=4)
+        scheduler.run()
+        self.assertEqual(fired, [0, 4, 8])
+
+
+class TestEventSimulation(unittest.TestCase):
+    def test_daily_events_match_day_loop(self):
+        days = 120
+        reference = build_fund(1)
+        run_simulation([reference], ["smart"], [0.005811], days, random.Random(2))
+
+        fund = build_fund(1)
+        rng = random.Random(2)
+        draws = [daily_draws(rng, 3) for day in range(days)]
+
+        simulation = EventSimulation(fund)
+        simulation.deposits((day * DAY, draws[day][0]) for day in range(days))
+        simulation.rebalance(DAY, "smart_rebalance", 0.005811)
+        simulation.interest(
+            DAY, lambda now: draws[now // DAY][1], until=(days - 1) * DAY
+        )
+        simulation.run((days - 1) * DAY)
+
+        self.assertAlmostEqual(fund.totalAssets / reference.totalAssets, 1, places=10)
+        self.assertAlmostEqual(fund.cash / reference.cash, 1, places=10)
+
+    def test_rebalance_on_cash_band(self):
+        fund = build_fund(1)
+        simulation = EventSimulation(fund)
+        simulation.deposits((hour * 60, 50) for hour in range(24 * 30))
+        simulation.rebalance_on_cash(band=5, method="simple_rebalance")
+        simulation.run()
+
+        self.assertLessEqual(fund.cash, fund.totalAssets * 0.15 + 1e-6)
+        self.assertGreater(fund.cash, fund.totalAssets * 0.1 - 1e-6)
+
+    def test_withdrawals_before_rebalance(self):
+        fund = build_fund(2, reserve_ratio=0)
+        simulation = EventSimulation(fund)
+        simulation.withdrawals([(DAY, 100), (2 * DAY, [10] * 50)])
+        simulation.rebalance(DAY, "simple_rebalance", start=DAY)
+        simulation.run(until=2 * DAY)
+
+        self.assertEqual([time for time, paid in simulation.payouts], [DAY, 2 * DAY])
+        self.assertAlmostEqual(simulation.payouts[0][1], 100)
+        self.assertAlmostEqual(sum(simulation.payouts[1][1]), 500)
+        self.assertAlmostEqual(fund.totalAssets, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import unittest
+import copy
+import random
+import tracemalloc
+import numpy as np
+from src.components import Fund
+from src.simulation import PROTOCOLS, USDC, initialize_vaults, run_simulation
+from src.snapshot import Checkpoint, Layout, Snapshot
+
+STRATEGIES = ["smart", "simple", "smart", "simple"]
+COSTS = [0.005811, 0.005811, 0, 0]
+
+
+def main_funds(seed=42):
+    rng = random.Random(seed)
+    vaults = initialize_vaults(PROTOCOLS, rng)
+    funds = [Fund(f"Fund {i}", USDC, 0, 0, 10, 1) for i in range(4)]
+    for fund in funds:
+        for vault, ratio in zip(vaults, PROTOCOLS[0]["ratios"]):
+            fund.add_vault(vault, ratio)
+        fund.deposit(1000)
+        fund.simple_rebalance()
+    return funds, rng
+
+
+def totals(funds):
+    return [(fund.totalAssets, fund.cash) for fund in funds]
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_restore_continues_identically(self):
+        funds, rng = main_funds()
+        run_simulation(funds, STRATEGIES, COSTS, 30, rng)
+        layout = Layout(funds)
+        self.assertEqual(len(layout.leaves), 3)
+        self.assertEqual(len(layout.portals), 4)
+
+        snapshot = layout.capture(rng)
+        run_simulation(funds, STRATEGIES, COSTS, 30, rng)
+        expected = totals(funds)
+
+        layout.restore(snapshot, rng)
+        run_simulation(funds, STRATEGIES, COSTS, 30, rng)
+        self.assertEqual(totals(funds), expected)
+        for fund in funds:
+            self.assertTrue(fund.verify_valuations())
+
+    def test_bytes_round_trip(self):
+        funds, rng = main_funds()
+        layout = Layout(funds)
+        snapshot = layout.capture()
+        data = snapshot.to_bytes()
+        self.assertEqual(len(data), layout.size * 8)
+
+        funds[0].deposit(500)
+        layout.restore(Snapshot.from_bytes(layout, data))
+        np.testing.assert_array_equal(layout.capture().buffer, snapshot.buffer)
+
+        with self.assertRaises(ValueError):
+            Snapshot.from_bytes(layout, data[:-8])
+
+    def test_tree_changes_are_detected(self):
+        funds, rng = main_funds()
+        layout = Layout(funds[0])
+        vault = initialize_vaults(PROTOCOLS[1:2], rng)[0]
+        funds[0].add_vault(vault, 0)
+        with self.assertRaises(ValueError):
+            layout.capture()
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_branches(self):
+        funds, rng = main_funds()
+        run_simulation(funds, STRATEGIES, COSTS, 10, rng)
+        checkpoint = Checkpoint(funds, rng)
+        start = totals(funds)
+
+        def rebalance_after(days):
+            for fund, strategy, cost in zip(funds, STRATEGIES, COSTS):
+                fund.deposit(10_000)
+            run_simulation(funds, STRATEGIES, COSTS, days, rng)
+            return totals(funds)
+
+        for days in range(1, 60):
+            checkpoint.branch(days, rebalance_after, days)
+
+        # the live objects are back at the checkpoint
+        self.assertEqual(totals(funds), start)
+
+        checkpoint.restore(checkpoint.branches[50])
+        self.assertEqual(totals(funds), checkpoint.branches[50].result)
+        again = Checkpoint(funds)
+        checkpoint.restore()
+        self.assertEqual(totals(funds), start)
+
+        branch = checkpoint.branch("replay", rebalance_after, 50)
+        self.assertEqual(branch.result, checkpoint.branches[50].result)
+
+        self.assertLessEqual(again.base.nbytes, checkpoint.base.nbytes)
+
+    def test_costs_and_planners_are_restored(self):
+        funds, rng = main_funds()
+        strategies = ["horizon", "smart", "horizon", "simple"]
+        run_simulation(funds, strategies, COSTS, 10, rng)
+        checkpoint = Checkpoint(funds, rng)
+        start = [(fund.cost_paid, fund.planner) for fund in funds]
+        planner = funds[0].planner
+        day, plan = planner.day, planner.plan
+
+        def run(days):
+            for fund in funds:
+                fund.withdraw(fund.totalShares / 2, cost=1)
+            run_simulation(funds, strategies, COSTS, days, rng)
+            return [fund.cost_paid for fund in funds], totals(funds)
+
+        branch = checkpoint.branch("costly", run, 20)
+        self.assertTrue(all(cost > 1 for cost in branch.result[0]))
+        self.assertEqual([(fund.cost_paid, fund.planner) for fund in funds], start)
+        self.assertEqual((planner.day, planner.plan), (day, plan))
+
+        # continuing from a restored branch matches running straight on
+        checkpoint.restore("costly")
+        self.assertEqual([fund.cost_paid for fund in funds], branch.result[0])
+        self.assertEqual(planner.day, day + 20)
+        expected = run(15)
+        checkpoint.restore("costly")
+        self.assertEqual(run(15), expected)
+
+    def test_branches_store_diffs(self):
+        # a wide fund where each branch only touches a few vaults
+        rng = random.Random(1)
+        protocols = [{"name": "Protocol", "vaults": 500, "ratios": [0.2] * 500}]
+        vaults = initialize_vaults(protocols, rng)
+        fund = Fund("Fund", USDC, 0, 0, 10, 1)
+        for vault in vaults:
+            fund.add_vault(vault, 0.18)
+        fund.deposit(1_000_000)
+        fund.simple_rebalance()
+
+        def shock(i):
+            for vault in vaults[i : i + 5]:
+                vault.earn_interest(-10)
+            fund.update_total_assets()
+            return fund.totalAssets
+
+        tracemalloc.start()
+        checkpoint = Checkpoint(fund)
+        for i in range(100):
+            checkpoint.branch(i, shock, i)
+        forked = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        copies = [copy.deepcopy(fund) for i in range(10)]
+        deep_copied = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # 100 branches take less memory than two deep copies
+        self.assertEqual(len(copies), 10)
+        self.assertIsNotNone(checkpoint.branches[0].indices)
+        self.assertLess(forked * 5, deep_copied)
+
+        checkpoint.restore(checkpoint.branches[7])
+        self.assertEqual(fund.totalAssets, checkpoint.branches[7].result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+import random
+from src.components import ERC4626, Fund, Portal
+from src.oracle import PriceOracle
+from src.solver import Solver
+
+USDC = "USDC"
+
+
+def build_funds(vaults, count, reserve_ratio=10, deposit=1000):
+    funds = []
+    for i in range(count):
+        fund = Fund(f"Fund {i}", USDC, 0, 0, reserve_ratio, 1)
+        for vault, ratio in zip(vaults, [40, 30, 30]):
+            fund.add_vault(vault, ratio)
+        fund.deposit(deposit)
+        funds.append(fund)
+    return funds
+
+
+class TestSolver(unittest.TestCase):
+    def setUp(self):
+        self.vaults = [ERC4626(f"Vault {i}", USDC, 1000, 2000) for i in range(3)]
+
+    def test_planning_leaves_funds_untouched(self):
+        funds = build_funds(self.vaults, 2)
+        solver = Solver()
+        solver.plan_all(funds, "simple_rebalance")
+
+        self.assertEqual(len(solver), 6)
+        self.assertEqual(funds[0].cash, 1000)
+        self.assertIsNone(funds[0]._batch)
+        self.assertEqual(self.vaults[0].totalAssets, 2000)
+
+    def test_matches_independent_rebalance(self):
+        funds = build_funds(self.vaults, 3)
+        others = build_funds(
+            [ERC4626(f"Vault {i}", USDC, 1000, 2000) for i in range(3)], 3
+        )
+
+        solver = Solver()
+        solver.plan_all(funds, "smart_rebalance")
+        settlement = solver.execute()
+        for fund in others:
+            fund.smart_rebalance()
+
+        self.assertEqual(settlement.legs, 3)
+        self.assertEqual(settlement.independent_legs, 9)
+        for fund, other in zip(funds, others):
+            self.assertAlmostEqual(fund.cash, other.cash)
+            self.assertAlmostEqual(fund.totalAssets, other.totalAssets)
+            self.assertTrue(fund.verify_valuations())
+        for vault, other in zip(self.vaults, others[0].sub_vaults):
+            self.assertAlmostEqual(vault.totalAssets, other.totalAssets)
+            self.assertAlmostEqual(vault.totalShares, other.totalShares)
+
+    def test_rebalances_net_sells_against_buys(self):
+        heavy, fresh = build_funds(self.vaults, 2)
+        heavy.invest(self.vaults[0], 900)
+        vault_assets = self.vaults[0].totalAssets
+
+        solver = Solver(cost=1)
+        solver.plan_all([heavy, fresh], "smart_rebalance")
+        self.assertEqual(Solver.overweight(heavy), {self.vaults[0]: 500})
+        settlement = solver.execute()
+
+        # heavy sells 500 of vault 0 to fresh, which buys 400 of it
+        self.assertAlmostEqual(settlement.net[self.vaults[0]], -100)
+        self.assertAlmostEqual(settlement.gross[self.vaults[0]], 900)
+        self.assertEqual((settlement.legs, settlement.independent_legs), (3, 4))
+        self.assertEqual(settlement.saved, 1)
+        self.assertAlmostEqual(
+            heavy.cost_paid + fresh.cost_paid, settlement.transaction_cost
+        )
+        self.assertAlmostEqual(self.vaults[0].totalAssets, vault_assets - 101)
+        self.assertAlmostEqual(heavy.cash, 600)
+        self.assertAlmostEqual(heavy.value_position(self.vaults[0]), 400 - 5 / 9)
+        self.assertAlmostEqual(fresh.value_position(self.vaults[0]), 400 - 4 / 9)
+        self.assertEqual(Solver.overweight(heavy), {})
+        for fund in [heavy, fresh]:
+            self.assertTrue(fund.verify_valuations())
+
+    def test_opposing_flows_cross(self):
+        buyer, seller = build_funds(self.vaults, 2, reserve_ratio=0)
+        seller.invest(self.vaults[0], 500)
+        vault_assets = self.vaults[0].totalAssets
+
+        solver = Solver(cost=2)
+        solver.add(buyer, self.vaults[0], 300)
+        solver.add(seller, self.vaults[0], -200)
+        settlement = solver.execute()
+
+        # only the net 100 reaches the vault, less the single leg cost
+        self.assertEqual(settlement.legs, 1)
+        self.assertEqual(settlement.saved, 2)
+        self.assertAlmostEqual(self.vaults[0].totalAssets, vault_assets + 98)
+        self.assertAlmostEqual(buyer.value_position(self.vaults[0]), 300 - 1.2)
+        self.assertAlmostEqual(seller.value_position(self.vaults[0]), 300 - 0.8)
+        self.assertAlmostEqual(buyer.cash, 700)
+        self.assertAlmostEqual(seller.cash, 700)
+        self.assertEqual(len(solver), 0)
+
+    def test_flows_that_cancel_cost_nothing(self):
+        buyer, seller = build_funds(self.vaults, 2, reserve_ratio=0)
+        seller.invest(self.vaults[1], 500)
+        vault_assets = self.vaults[1].totalAssets
+
+        solver = Solver(cost=2)
+        solver.add(buyer, self.vaults[1], 250)
+        solver.add(seller, self.vaults[1], -250)
+        settlement = solver.execute()
+
+        self.assertEqual(settlement.legs, 0)
+        self.assertEqual(self.vaults[1].totalAssets, vault_assets)
+        self.assertAlmostEqual(buyer.value_position(self.vaults[1]), 250)
+        self.assertAlmostEqual(seller.totalAssets, 1000)
+
+    def test_insufficient_shares(self):
+        (fund,) = build_funds(self.vaults, 1)
+        solver = Solver()
+        solver.add(fund, self.vaults[0], -10)
+        with self.assertRaises(ValueError):
+            solver.execute()
+        self.assertEqual(fund.cash, 1000)
+
+    def test_rejects_multi_asset_funds(self):
+        (fund,) = build_funds(self.vaults, 1)
+        PriceOracle({USDC: 1.0}).attach(fund)
+        with self.assertRaises(ValueError):
+            Solver().add(fund, self.vaults[0], 10)
+
+    def test_rejects_nested_portals(self):
+        portal = Portal("Portal", USDC, 0, 0)
+        portal.add_vault(self.vaults[0], 100)
+        fund = Fund("Fund", USDC, 0, 0, 10)
+        fund.add_vault(portal, 90)
+        fund.deposit(1000)
+
+        solver = Solver()
+        with self.assertRaises(ValueError):
+            solver.add(fund, portal, 10)
+        with self.assertRaises(ValueError):
+            solver.plan(fund)
+        self.assertEqual(len(solver), 0)
+
+    def test_many_funds(self):
+        rng = random.Random(3)
+        funds = build_funds(self.vaults, 2000, deposit=500)
+        solver = Solver(cost=1)
+        for fund in funds:
+            for vault in self.vaults:
+                solver.add(fund, vault, rng.uniform(0, 100))
+        total = sum(solver._amounts)
+        settlement = solver.execute()
+
+        self.assertEqual(settlement.legs, 3)
+        self.assertEqual(settlement.saved, 6000 - 3)
+        invested = sum(vault.totalAssets for vault in self.vaults) - 6000
+        self.assertAlmostEqual(invested, total - 3, places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
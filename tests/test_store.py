@@ -0,0 +1,94 @@
+import unittest
+import random
+from src.components import ERC4626, Portal, Fund
+from src.simulation import initialize_vaults, create_portals
+from src.store import VaultStore, StoredVault
+
+USDC = "USDC"
+
+
+class TestVaultStore(unittest.TestCase):
+    def setUp(self):
+        self.store = VaultStore(capacity=2)
+
+    def test_add_and_grow(self):
+        ids = self.store.extend([f"Vault {i}" for i in range(5)], USDC, 0, 0)
+        dai = self.store.add("DAI Vault", "DAI", 10, 20)
+
+        self.assertEqual(list(ids), [0, 1, 2, 3, 4])
+        self.assertEqual(dai, 5)
+        self.assertEqual(len(self.store), 6)
+        self.assertEqual(self.store.name(3), "Vault 3")
+        self.assertEqual(self.store.find("DAI Vault"), 5)
+        self.assertEqual(self.store.deposit_asset(5), "DAI")
+        self.assertEqual(self.store.vault(5).totalAssets, 20)
+
+        with self.assertRaises(IndexError):
+            self.store.vault(6)
+
+    def test_view_matches_erc4626(self):
+        vault = ERC4626("Vault", USDC, 0, 0)
+        view = self.store.vault(self.store.add("Vault", USDC, 0, 0))
+
+        for v in [vault, view]:
+            v.seed(random.Random(3))
+            shares = v.deposit(100)
+            v.earn_interest(5)
+            v.withdraw(shares / 2)
+
+        self.assertEqual(view.name, vault.name)
+        self.assertEqual(view.depositAsset, vault.depositAsset)
+        self.assertAlmostEqual(view.totalAssets, vault.totalAssets)
+        self.assertAlmostEqual(view.totalShares, vault.totalShares)
+
+    def test_views_are_interchangeable(self):
+        vault_id = self.store.add("Vault", USDC, 0, 0)
+        other = VaultStore()
+        other.add("Vault", USDC, 0, 0)
+
+        view = self.store.vault(vault_id)
+        self.assertEqual(view, StoredVault(self.store, vault_id))
+        self.assertEqual(len({view, self.store.vault(vault_id)}), 1)
+        self.assertNotEqual(view, other.vault(vault_id))
+
+    def test_portals_reference_store(self):
+        protocols = [
+            {"name": "Centrifuge", "vaults": 3, "ratios": [40, 30, 30]},
+            {"name": "Morpho", "vaults": 2, "ratios": [60, 40]},
+        ]
+        vaults = initialize_vaults(protocols, random.Random(1), store=self.store)
+        portals = create_portals(vaults, protocols)
+
+        fund = Fund("Fund", USDC, 0, 0, 10)
+        fund.add_vault(portals["Centrifuge"], 50)
+        fund.add_vault(portals["Morpho"], 40)
+        fund.deposit(1000)
+        fund.simple_rebalance()
+        for portal in portals.values():
+            portal.simple_rebalance()
+            self.assertEqual(portal.cash, 0)
+
+        self.store.earn_interest(1)
+        for portal in portals.values():
+            portal.update_total_assets()
+            self.assertTrue(portal.verify_valuations())
+        fund.update_total_assets()
+        self.assertTrue(fund.verify_valuations())
+        self.assertAlmostEqual(fund.totalAssets, 100 + 900 * 1.01)
+
+    def test_earn_interest_subset(self):
+        ids = self.store.extend(["A", "B", "C"], USDC, [100] * 3, [100] * 3)
+        portal = Portal("Portal", USDC, 0, 0)
+        portal.add_vault(self.store.vault(2), 100)
+        portal.update_total_assets()
+
+        self.store.earn_interest([10, 20], ids=ids[:2])
+        self.assertEqual(list(self.store.totalAssets[:3]), [110, 120, 100])
+        self.assertFalse(portal._stale(self.store.vault(2)))
+
+        self.store.earn_interest(10, ids=[2])
+        self.assertTrue(portal._stale(self.store.vault(2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import numpy as np
+from src.components import ERC4626, Fund
+from src.simulation import USDC
+from src.strategies import (
+    DynamicAllocation,
+    InverseVariance,
+    SharpeWeighted,
+    TopK,
+    YieldStats,
+    YieldWeighted,
+    target_ratios,
+)
+
+
+class TestYieldStats(unittest.TestCase):
+    def test_incremental_matches_full_history(self):
+        rng = np.random.default_rng(0)
+        returns = rng.normal(0.001, 0.002, (200, 4))
+        prices = np.cumprod(1 + returns, axis=0)
+
+        stats = YieldStats(range(4), halflife=10, prices=np.ones(4))
+        for row in prices:
+            stats.update(row)
+
+        # recompute from the whole history with explicit weights
+        alpha = stats.alpha
+        mean, var = returns[0], np.zeros(4)
+        for r in returns[1:]:
+            diff = r - mean
+            mean = mean + alpha * diff
+            var = (1 - alpha) * (var + alpha * diff**2)
+
+        np.testing.assert_allclose(stats.mean, mean)
+        np.testing.assert_allclose(stats.var, var)
+        self.assertEqual(stats.count, 200)
+        self.assertTrue(np.all(stats.sharpe() > 0))
+
+    def test_reads_price_per_share(self):
+        vaults = [ERC4626(f"Vault {i}", USDC, 100, 100) for i in range(2)]
+        stats = YieldStats(vaults)
+        vaults[0].earn_interest(1)
+        vaults[1].deposit(50)  # deposits are not yield
+        returns = stats.update()
+        np.testing.assert_allclose(returns, [0.01, 0])
+
+
+class TestRules(unittest.TestCase):
+    def setUp(self):
+        self.stats = YieldStats(range(3), prices=np.ones(3))
+        self.stats.mean = np.array([0.002, 0.001, -0.001])
+        self.stats.var = np.array([4e-6, 1e-6, 1e-6])
+
+    def test_weights(self):
+        np.testing.assert_allclose(
+            YieldWeighted().weights(self.stats), [0.002, 0.001, 0]
+        )
+        np.testing.assert_allclose(SharpeWeighted().weights(self.stats), [1, 1, 0])
+        np.testing.assert_allclose(
+            InverseVariance().weights(self.stats), [2.5e5, 1e6, 1e6]
+        )
+        np.testing.assert_array_equal(TopK(1).weights(self.stats), [1, 0, 0])
+        np.testing.assert_array_equal(TopK(5).weights(self.stats), [1, 1, 0])
+
+    def test_target_ratios(self):
+        ratios = target_ratios([2, 1, 0], 90, min_ratio=5)
+        np.testing.assert_allclose(ratios, [55, 30, 5])
+
+        moved = target_ratios([2, 1, 0], 90, 5, current=[30, 30, 30], max_change=10)
+        np.testing.assert_allclose(moved, [40, 30, 20])
+        self.assertAlmostEqual(moved.sum(), 90)
+
+        self.assertIsNone(target_ratios([0, 0, 0], 90))
+        with self.assertRaises(ValueError):
+            target_ratios([1, 1, 1], 90, min_ratio=40)
+
+
+class TestDynamicAllocation(unittest.TestCase):
+    def test_moves_cash_to_better_vault(self):
+        vaults = [ERC4626(f"Vault {i}", USDC, 1000, 1000) for i in range(2)]
+        fund = Fund("Fund", USDC, 0, 0, 10)
+        for vault in vaults:
+            fund.add_vault(vault, 45)
+        allocation = DynamicAllocation(
+            fund, YieldWeighted(), halflife=5, min_periods=3, min_ratio=10
+        )
+
+        ratios = []
+        for day in range(30):
+            fund.deposit(1000)
+            fund.smart_rebalance()
+            vaults[0].earn_interest(0.03)
+            vaults[1].earn_interest(0.01)
+            result = allocation.update(day)
+            ratios.append(result)
+
+        self.assertIsNone(ratios[0])
+        self.assertAlmostEqual(fund.sub_vaults[vaults[0]]["ratio"], 10 + 70 * 0.75)
+        self.assertAlmostEqual(fund.sub_vaults[vaults[1]]["ratio"], 10 + 70 * 0.25)
+        self.assertGreater(
+            fund.value_position(vaults[0]), 2 * fund.value_position(vaults[1])
+        )
+
+    def test_many_vaults(self):
+        vaults = [ERC4626(f"Vault {i}", USDC, 1000, 1000) for i in range(2000)]
+        fund = Fund("Fund", USDC, 0, 0, 10)
+        for vault in vaults:
+            fund.add_vault(vault, 0.045)
+        allocation = DynamicAllocation(fund, SharpeWeighted(), min_periods=2)
+
+        rates = np.linspace(0.001, 0.02, 2000)
+        prices = np.ones(2000)
+        for day in range(10):
+            prices = prices * (1 + rates / 100 * (1 + 0.1 * np.sin(day)))
+            allocation.update(day, prices)
+
+        ratios = allocation.ratios()
+        self.assertAlmostEqual(ratios.sum(), 90)
+        self.assertTrue(np.all(ratios >= 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import csv
+import os
+import tempfile
+import unittest
+from src.sweep import grid, parse_range, run, run_key, run_seed, sweep
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "sweep.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_rows(self):
+        with open(self.output, newline="") as f:
+            return list(csv.DictReader(f))
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("5:20:5"), [5, 10, 15, 20])
+        self.assertEqual(parse_range("0,0.005811"), [0, 0.005811])
+        self.assertEqual(parse_range("0:0.3:0.1"), [0, 0.1, 0.2, 0.3])
+
+    def test_grid_seeds_are_deterministic(self):
+        runs = grid([5, 10], [0, 1], [0, 0.005811])
+        self.assertEqual(len(runs), 16)
+        self.assertEqual(len({params["run"] for params in runs}), 16)
+        self.assertEqual(runs, grid([5, 10], [0, 1], [0, 0.005811]))
+        self.assertNotEqual(run_seed(42, "a"), run_seed(43, "a"))
+
+    def test_run_keys_keep_full_precision(self):
+        self.assertEqual(run_key("smart", 10, 1, 0), run_key("smart", 10.0, 1.0, 0.0))
+        close = grid([10], [1], [0.0058111, 0.0058114])
+        self.assertNotEqual(close[0]["run"], close[1]["run"])
+        self.assertNotEqual(close[0]["seed"], close[1]["seed"])
+
+    def test_run_is_reproducible(self):
+        params = grid([10], [1], [0.005811], ["smart"])[0]
+        first = run(params, 30)
+        self.assertEqual(first, run(params, 30))
+        self.assertGreater(first["cost_paid"], 0)
+        self.assertAlmostEqual(first["cash_drag"], 0.1, places=2)
+
+    def test_sweep_resumes(self):
+        runs = grid([5, 10], [1], [0, 0.005811])
+
+        self.assertEqual(sweep(runs[:3], 20, self.output, workers=2), 3)
+        self.assertEqual(len(self.read_rows()), 3)
+
+        # simulate a crash in the middle of writing a row
+        with open(self.output, "a") as f:
+            f.write(runs[3]["run"] + ",smart,5")
+
+        self.assertEqual(sweep(runs, 20, self.output, workers=2), len(runs) - 3)
+        rows = self.read_rows()
+        self.assertEqual(
+            sorted(row["run"] for row in rows), sorted(p["run"] for p in runs)
+        )
+
+        self.assertEqual(sweep(runs, 20, self.output, workers=2), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
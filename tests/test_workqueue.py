@@ -0,0 +1,139 @@
+import unittest
+import csv
+import os
+import tempfile
+from src.sweep import grid, run
+from src.workqueue import (
+    WorkQueue,
+    batches,
+    expand_paths,
+    merge,
+    run_workers,
+    summarize,
+    work,
+)
+
+
+def flaky(payload, protocols):
+    raise RuntimeError("worker crashed")
+
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "queue.db")
+        self.runs = expand_paths(grid([5, 10], [1], [0.005811], ["smart"]), 3)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_paths_and_batches_are_deterministic(self):
+        self.assertEqual(len(self.runs), 6)
+        self.assertEqual(len({params["seed"] for params in self.runs}), 6)
+        again = expand_paths(grid([5, 10], [1], [0.005811], ["smart"]), 3)
+        self.assertEqual(self.runs, again)
+        self.assertEqual({params["path"] for params in self.runs}, {0, 1, 2})
+
+        tasks = batches(self.runs, 10, batch_size=4)
+        self.assertEqual([len(payload["runs"]) for key, payload in tasks], [4, 2])
+        queue = WorkQueue(self.path)
+        self.assertEqual(queue.submit(tasks), 2)
+        self.assertEqual(queue.submit(batches(self.runs, 10, batch_size=4)), 0)
+        self.assertEqual(queue.progress()["pending"], 2)
+        queue.close()
+
+    def test_leases_and_idempotent_results(self):
+        queue = WorkQueue(self.path, lease=0)
+        queue.submit(batches(self.runs[:2], 10))
+        task_id, key, payload = queue.claim("a")
+        self.assertEqual(queue.progress()["running"], 1)
+
+        # the lease ran out, so another worker takes the task over and only
+        # that worker can finish it
+        again = queue.claim("b")
+        self.assertEqual(again[0], task_id)
+        rows = [dict(params, totalAssets=1.0) for params in payload["runs"]]
+        late = [dict(row, totalAssets=2.0) for row in rows]
+        self.assertFalse(queue.complete(task_id, late, "a"))
+        self.assertFalse(queue.fail(task_id, "late", "a"))
+        self.assertTrue(queue.complete(task_id, rows, "b"))
+        self.assertFalse(queue.complete(task_id, late, "b"))
+
+        self.assertIsNone(queue.claim("c"))
+        self.assertTrue(queue.finished())
+        results = queue.results()
+        self.assertEqual(len(results), 2)
+        self.assertEqual({row["totalAssets"] for row in results}, {1.0})
+        queue.close()
+
+    def test_expired_leases_count_as_attempts(self):
+        queue = WorkQueue(self.path, lease=0, max_attempts=2)
+        queue.submit(batches(self.runs[:2], 10))
+        task_id = queue.claim("a")[0]
+        self.assertEqual(queue.claim("b")[0], task_id)
+
+        # both workers died holding the task, so it is not handed out again
+        self.assertIsNone(queue.claim("c"))
+        self.assertEqual(queue.progress()["failed"], 1)
+        key, attempts, error = queue.errors()[0]
+        self.assertEqual((attempts, error), (2, "lease expired"))
+        queue.close()
+
+    def test_errors_roll_back(self):
+        queue = WorkQueue(self.path)
+        queue.submit(batches(self.runs[:2], 10))
+        task_id = queue.claim("a")[0]
+        with self.assertRaises(KeyError):
+            queue.complete(task_id, [{"totalAssets": 1.0}], "a")
+
+        self.assertFalse(queue.db.in_transaction)
+        self.assertEqual(queue.progress()["running"], 1)
+        other = WorkQueue(self.path, timeout=0.1)
+        self.assertEqual(other.submit(batches(self.runs[2:], 10)), 1)
+        other.close()
+        queue.close()
+
+    def test_failed_tasks_are_retried(self):
+        queue = WorkQueue(self.path, max_attempts=2)
+        queue.submit(batches(self.runs, 10, batch_size=6))
+        queue.close()
+
+        self.assertEqual(work(self.path, "w", poll=0, task=flaky), 0)
+        queue = WorkQueue(self.path)
+        counts = queue.progress()
+        self.assertEqual((counts["failed"], counts["results"]), (1, 0))
+        key, attempts, error = queue.errors()[0]
+        self.assertEqual(attempts, 2)
+        self.assertIn("worker crashed", error)
+
+        self.assertEqual(queue.retry_failed(), 1)
+        queue.close()
+        self.assertEqual(work(self.path, "w", poll=0), 1)
+        self.assertEqual(len(WorkQueue(self.path).results()), 6)
+
+    def test_results_do_not_depend_on_workers(self):
+        queue = WorkQueue(self.path)
+        queue.submit(batches(self.runs, 10, batch_size=1))
+        queue.close()
+        run_workers(self.path, workers=3, poll=0.05)
+
+        output = os.path.join(self.tmp.name, "sweep.csv")
+        summary_output = os.path.join(self.tmp.name, "summary.csv")
+        rows, summary = merge(self.path, output, summary_output)
+        for row, params in zip(rows, sorted(self.runs, key=lambda p: p["run"])):
+            self.assertEqual(row, run(params, 10))
+
+        self.assertEqual(len(summary), 2)
+        self.assertEqual(summary[0]["paths"], 3)
+        self.assertEqual(summary, summarize(rows))
+        values = [row["totalAssets"] for row in rows[:3]]
+        self.assertEqual(summary[0]["totalAssets_max"], max(values))
+
+        with open(output, newline="") as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 6)
+        with open(summary_output, newline="") as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
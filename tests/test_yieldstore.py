@@ -0,0 +1,101 @@
+import unittest
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.sweep import grid, run
+from src.yieldstore import YieldStore
+
+NAMES = ["Centrifuge Vault A", "Centrifuge Vault B", "Centrifuge Vault C", "Other"]
+
+
+def read_rate(path, name, day):
+    return YieldStore(path).rate(name, day)
+
+
+class TestYieldStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+        self.rates = np.arange(40.0).reshape(10, 4) / 100
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_random_access_without_loading(self):
+        store = YieldStore.create(self.path, NAMES)
+        self.assertEqual(store.append(self.rates), 10)
+
+        reader = YieldStore(self.path)
+        self.assertIsInstance(reader.matrix(), np.memmap)
+        self.assertEqual(reader.rate("Centrifuge Vault C", 7), self.rates[7, 2])
+        self.assertEqual(reader.rate(3, 2), self.rates[2, 3])
+        np.testing.assert_array_equal(reader.day(4), self.rates[4])
+        np.testing.assert_array_equal(reader.series("Other"), self.rates[:, 3])
+        self.assertEqual(reader.ids(["Other", 0]), [3, 0])
+        self.assertEqual(reader.ids(np.arange(2)), [0, 1])
+        self.assertEqual(reader.rate(np.int64(1), 5), self.rates[5, 1])
+        np.testing.assert_array_equal(reader.series(np.int32(2)), self.rates[:, 2])
+        with self.assertRaises(ValueError):
+            reader.append(self.rates[0])
+
+    def test_append_keeps_existing_rows(self):
+        store = YieldStore.create(self.path, NAMES)
+        store.append(self.rates[:6])
+        reader = YieldStore(self.path)
+        size = os.path.getsize(os.path.join(self.path, "yields.bin"))
+
+        store.append(self.rates[6])
+        store.append(self.rates[7:])
+        self.assertEqual(store.days, 10)
+        self.assertEqual(reader.days, 6)
+        self.assertEqual(reader.refresh(), 10)
+        np.testing.assert_array_equal(reader.matrix(), self.rates)
+
+        with open(os.path.join(self.path, "yields.bin"), "rb") as f:
+            self.assertEqual(f.read(size), self.rates[:6].astype("<f8").tobytes())
+        with self.assertRaises(ValueError):
+            store.append([1.0, 2.0])
+
+    def test_partial_row_is_dropped_on_reopen(self):
+        store = YieldStore.create(self.path, NAMES)
+        store.append(self.rates[:3])
+        with open(os.path.join(self.path, "yields.bin"), "ab") as f:
+            f.write(b"\0" * 12)
+
+        self.assertEqual(YieldStore(self.path).days, 3)
+        store = YieldStore(self.path, "a")
+        store.append(self.rates[3])
+        np.testing.assert_array_equal(store.matrix(), self.rates[:4])
+
+    def test_shared_by_worker_processes(self):
+        YieldStore.create(self.path, NAMES).append(self.rates)
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            rates = list(pool.map(read_rate, [self.path] * 3, NAMES[:3], [1, 5, 9]))
+        self.assertEqual(rates, [self.rates[1, 0], self.rates[5, 1], self.rates[9, 2]])
+
+    def test_sweep_run_reads_recorded_rates(self):
+        store = YieldStore.create(self.path, NAMES)
+        store.append(np.full((30, 4), 0.05))
+        params = grid([10], [1], [0], ["smart"])[0]
+
+        recorded = run(params, 30, yields=YieldStore(self.path))
+        self.assertEqual(recorded, run(params, 30, yields=YieldStore(self.path)))
+        self.assertNotEqual(recorded["totalAssets"], run(params, 30)["totalAssets"])
+        with self.assertRaises(ValueError):
+            run(params, 31, yields=YieldStore(self.path))
+
+    def test_sweep_run_maps_columns_by_name(self):
+        rates = self.rates[:, :3] * 10
+        params = grid([10], [1], [0], ["smart"])[0]
+        results = []
+        for order in [[0, 1, 2], [2, 0, 1]]:
+            with tempfile.TemporaryDirectory() as path:
+                store = YieldStore.create(path, ["Other"] + [NAMES[j] for j in order])
+                store.append(np.column_stack([np.zeros(10), rates[:, order]]))
+                results.append(run(params, 10, yields=YieldStore(path)))
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == "__main__":
+    unittest.main()